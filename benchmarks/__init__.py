@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the invoice generator.
+
+Run a benchmark module with ``python -m benchmarks.<name>``; each one
+creates a throwaway test database so it never touches real data.
+"""
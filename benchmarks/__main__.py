@@ -0,0 +1,140 @@
+"""
+Run the benchmark suite against a throwaway test database.
+
+Usage:
+    python -m benchmarks [--users 5 --clients 5 --projects 3 --entries 200]
+                         [--only NAME ...] [--repeat 5] [--output results.json]
+                         [--keepdb] [--gateway-latency 0.0]
+
+--entries is per project, so the defaults create 15,000 time entries;
+e.g. --users 20 --clients 10 --projects 5 --entries 1000 creates one
+million. With --keepdb the test database and generated data are reused
+by the next run. Results are printed and, with --output, written as JSON
+that can be compared with ``python -m benchmarks.compare``. Payments go
+through the in-process FakeGateway, with --gateway-latency seconds of
+simulated latency per Stripe call.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invoice_generator.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from .fixtures import DatasetParams, existing_dataset, generate
+from .harness import BENCHMARKS, measure
+from . import suite
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the invoice generator benchmarks.')
+    parser.add_argument('--users', type=int, default=DatasetParams.users)
+    parser.add_argument('--clients', type=int, default=DatasetParams.clients, help='clients per user')
+    parser.add_argument('--projects', type=int, default=DatasetParams.projects, help='projects per client')
+    parser.add_argument('--entries', type=int, default=DatasetParams.entries, help='time entries per project')
+    parser.add_argument('--invoices', type=int, default=DatasetParams.invoices, help='invoices per client')
+    parser.add_argument('--seed', type=int, default=DatasetParams.seed)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--keepdb', action='store_true', help='reuse the test database and data')
+    parser.add_argument('--gateway-latency', type=float, default=0.0,
+                        help='simulated payment gateway latency per call, in seconds')
+    return parser.parse_args()
+
+
+def run(args):
+    params = DatasetParams(
+        users=args.users,
+        clients=args.clients,
+        projects=args.projects,
+        entries=args.entries,
+        invoices=args.invoices,
+        seed=args.seed,
+    )
+
+    dataset = existing_dataset(params) if args.keepdb else None
+    generation_time = None
+    if dataset is None:
+        start = time.perf_counter()
+        dataset = generate(params)
+        generation_time = time.perf_counter() - start
+        print(f'Generated {dataset.time_entries} time entries in {generation_time:.1f}s')
+
+    context = suite.BenchmarkContext(dataset)
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = measure(BENCHMARKS[name](context), args.repeat)
+        result = results[name]
+        print(f'{name:<36} median={result["wall_time"]["median"] * 1000:10.1f}ms '
+              f'queries={result["queries"]:6d} '
+              f'peak_mem={result["peak_memory_bytes"] / 1024 / 1024:8.1f}MB')
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': args.repeat,
+            'gateway_latency': args.gateway_latency,
+            'params': asdict(params),
+            'time_entries': dataset.time_entries,
+            'generation_time': generation_time,
+        },
+        'results': results,
+    }
+
+
+def main():
+    args = parse_args()
+    media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb, serialize=False)
+    try:
+        with override_settings(
+            MEDIA_ROOT=media_root,
+            METRICS_ENABLED=False,
+            PAYMENT_GATEWAY='stripe_integration.gateways.FakeGateway',
+            PAYMENT_GATEWAY_LATENCY=args.gateway_latency,
+            PAYMENT_GATEWAY_WEBHOOK_URL='',
+            STRIPE_WEBHOOK_SECRET='whsec_benchmark'
+        ):
+            report = run(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+        teardown_test_environment()
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'Wrote {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
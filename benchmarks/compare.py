@@ -0,0 +1,56 @@
+"""
+Compare two benchmark JSON reports.
+
+Usage: python -m benchmarks.compare BASELINE.json CURRENT.json [--threshold 10]
+
+Exits with status 1 when any benchmark's median wall time regressed by
+more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark reports.')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed slowdown in percent')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f'baseline: {baseline["meta"].get("commit")}  current: {current["meta"].get("commit")}')
+    regressions = []
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        old = baseline['results'].get(name)
+        new = current['results'].get(name)
+        if old is None or new is None:
+            print(f'{name:<36} only in {"current" if old is None else "baseline"}')
+            continue
+
+        time_change = change(old['wall_time']['median'], new['wall_time']['median'])
+        memory_change = change(old['peak_memory_bytes'], new['peak_memory_bytes'])
+        print(f'{name:<36} median {old["wall_time"]["median"] * 1000:9.1f}ms -> '
+              f'{new["wall_time"]["median"] * 1000:9.1f}ms ({time_change:+6.1f}%)  '
+              f'queries {old["queries"]} -> {new["queries"]}  '
+              f'peak_mem {memory_change:+6.1f}%')
+        if time_change > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f'Regressions over {args.threshold}%: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
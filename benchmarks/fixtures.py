@@ -0,0 +1,179 @@
+"""
+Synthetic multi-tenant data generator for benchmarks.
+
+Rows are written with bulk_create in bounded batches, so millions of time
+entries can be generated without holding them all in memory. The output
+is deterministic for a given seed.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+EMAIL_DOMAIN = 'bench.example.com'
+TAGS = ['design', 'development', 'meeting', 'research', 'support', 'review', 'testing', 'planning']
+
+
+@dataclass
+class DatasetParams:
+    users: int = 5
+    clients: int = 5
+    projects: int = 3
+    entries: int = 200
+    invoices: int = 20
+    seed: int = 42
+    batch_size: int = 5000
+
+
+@dataclass
+class Dataset:
+    params: DatasetParams
+    user_ids: list = field(default_factory=list)
+    time_entries: int = 0
+
+
+def existing_dataset(params):
+    """Return the dataset already in the database, if one was generated."""
+    from core.models import User
+    from time_entries.models import TimeEntry
+
+    user_ids = list(
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').order_by('pk').values_list('pk', flat=True)
+    )
+    if not user_ids:
+        return None
+    return Dataset(
+        params=params,
+        user_ids=user_ids,
+        time_entries=TimeEntry.objects.filter(user_id__in=user_ids).count()
+    )
+
+
+def generate(params):
+    """Create users, clients, projects, time entries and invoices."""
+    from core.models import User
+    from clients.models import Client
+    from projects.models import Project
+    from time_entries.models import TimeEntry, TimeEntryTag
+    from invoices.models import Invoice
+
+    rng = random.Random(params.seed)
+    today = date.today()
+
+    User.objects.bulk_create([
+        User(
+            email=f'user{u}@{EMAIL_DOMAIN}',
+            username=f'bench-user-{u}',
+            password='!',
+            first_name='Bench',
+            last_name=f'User {u}',
+            default_hourly_rate=Decimal('75.00'),
+        ) for u in range(params.users)
+    ])
+    users = list(User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').order_by('pk'))
+
+    Client.objects.bulk_create([
+        Client(
+            user=user,
+            name=f'Client {u}-{c}',
+            email=f'client{c}@user{u}.{EMAIL_DOMAIN}',
+            company_name=f'Company {u}-{c}',
+            default_hourly_rate=Decimal(rng.choice([60, 85, 120, 150])),
+            currency=rng.choice(['USD', 'USD', 'EUR', 'GBP']),
+        ) for u, user in enumerate(users) for c in range(params.clients)
+    ])
+    clients = list(Client.objects.filter(user__in=users).order_by('pk'))
+
+    Project.objects.bulk_create([
+        Project(
+            user_id=client.user_id,
+            client=client,
+            name=f'Project {client.pk}-{p}',
+            hourly_rate=client.default_hourly_rate + p * 10,
+            start_date=today - timedelta(days=365),
+        ) for client in clients for p in range(params.projects)
+    ])
+    projects = list(Project.objects.filter(user__in=users).order_by('pk'))
+
+    time_entries = 0
+    batch = []
+    for project in projects:
+        for i in range(params.entries):
+            start_hour = rng.randint(8, 15)
+            hours = Decimal(rng.randint(1, 16)) / 4
+            batch.append(TimeEntry(
+                user_id=project.user_id,
+                project=project,
+                date=today - timedelta(days=rng.randint(0, 364)),
+                hours=hours,
+                hourly_rate=project.hourly_rate,
+                description=f'Work item {i} on project {project.pk}',
+                start_time=time(start_hour, rng.choice([0, 15, 30, 45])),
+                end_time=time(min(start_hour + int(hours) + 1, 23), 0),
+                is_billable=rng.random() < 0.9,
+                tags=','.join(rng.sample(TAGS, rng.randint(0, 3))),
+            ))
+            if len(batch) >= params.batch_size:
+                TimeEntryTag.sync(TimeEntry.objects.bulk_create(batch))
+                time_entries += len(batch)
+                batch = []
+    if batch:
+        TimeEntryTag.sync(TimeEntry.objects.bulk_create(batch))
+        time_entries += len(batch)
+
+    invoices = []
+    for client in clients:
+        for i in range(params.invoices):
+            issue_date = today - timedelta(days=rng.randint(0, 364))
+            due_date = issue_date + timedelta(days=30)
+            subtotal = Decimal(rng.randint(500, 50000)) / 10
+            status = rng.choice(['draft', 'sent', 'sent', 'paid', 'paid'])
+            if status == 'sent' and due_date < today:
+                status = 'overdue'
+            invoices.append(Invoice(
+                user_id=client.user_id,
+                client=client,
+                invoice_number=f'INV-B{client.pk}-{i:05d}',
+                issue_date=issue_date,
+                due_date=due_date,
+                status=status,
+                subtotal=subtotal,
+                total_amount=subtotal,
+            ))
+    Invoice.objects.bulk_create(invoices, batch_size=params.batch_size)
+
+    return Dataset(params=params, user_ids=[user.pk for user in users], time_entries=time_entries)
+
+
+def detailed_client(user, lines=5000, batch_size=5000):
+    """
+    Return a client of ``user`` billed one line per time entry, with
+    ``lines`` billable time entries over the past year. Created on first
+    use.
+    """
+    from clients.models import Client
+    from projects.models import Project
+    from time_entries.models import TimeEntry
+
+    client, _ = Client.objects.get_or_create(
+        user=user,
+        email=f'detailed@user{user.pk}.{EMAIL_DOMAIN}',
+        defaults={'name': 'Detailed client', 'invoice_line_items': 'entry', 'default_hourly_rate': Decimal('90.00')}
+    )
+    project, _ = Project.objects.get_or_create(
+        user=user, client=client, name='Detailed project', defaults={'hourly_rate': Decimal('90.00')}
+    )
+
+    existing = TimeEntry.objects.filter(project=project).count()
+    today = date.today()
+    TimeEntry.objects.bulk_create([
+        TimeEntry(
+            user=user,
+            project=project,
+            date=today - timedelta(days=i % 365),
+            hours=Decimal(i % 8 + 1) / 4,
+            hourly_rate=project.hourly_rate,
+            description=f'Detailed work item {i}',
+        ) for i in range(existing, lines)
+    ], batch_size=batch_size)
+    return client
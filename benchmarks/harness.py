@@ -0,0 +1,76 @@
+"""
+Benchmark registry and measurement helpers.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from django.db import connections, transaction
+from core.middleware import QueryCounter
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a benchmark.
+
+    The decorated function receives the benchmark context, performs any
+    setup and returns the zero-argument callable that is measured.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connections['default'].execute_wrapper(counter):
+        yield counter
+
+
+def measure(func, repeat):
+    """
+    Time ``func`` ``repeat`` times after one warm-up call, then run it
+    once more under tracemalloc to record peak Python memory without
+    skewing timings.
+    """
+    func()
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        with count_queries() as counter:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time': {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'max': max(timings),
+        },
+        'queries': counter.count,
+        'sql_time': counter.duration,
+        'peak_memory_bytes': peak_memory,
+    }
@@ -0,0 +1,127 @@
+"""
+Compare the DRF list serializers against their values() fast path.
+
+Usage: python -m benchmarks.list_serializers [--rows 5000] [--repeat 5]
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invoice_generator.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+
+def create_data(rows):
+    from core.models import User
+    from clients.models import Client
+    from projects.models import Project
+    from time_entries.models import TimeEntry
+    from invoices.models import Invoice
+
+    user = User.objects.create_user(email='bench@example.com', username='bench', password='bench')
+    client = Client.objects.create(user=user, name='Bench Client', email='client@example.com')
+    project = Project.objects.create(user=user, client=client, name='Bench Project', hourly_rate=Decimal('85.50'))
+
+    today = date.today()
+    TimeEntry.objects.bulk_create([
+        TimeEntry(
+            user=user,
+            project=project,
+            date=today - timedelta(days=i % 365),
+            hours=Decimal('1.25') + Decimal(i % 7),
+            hourly_rate=Decimal('85.50'),
+            description=f'Task {i}',
+        ) for i in range(rows)
+    ], batch_size=1000)
+
+    Invoice.objects.bulk_create([
+        Invoice(
+            user=user,
+            client=client,
+            project=project if i % 2 else None,
+            invoice_number=f'INV-BENCH-{i:06d}',
+            issue_date=today - timedelta(days=i % 90 + 30),
+            due_date=today - timedelta(days=i % 90),
+            status=('draft', 'sent', 'paid')[i % 3],
+            subtotal=Decimal('100.00') + i,
+            total_amount=Decimal('100.00') + i,
+        ) for i in range(rows)
+    ], batch_size=1000)
+
+    return user
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(rows, repeat):
+    from time_entries.models import TimeEntry
+    from time_entries.serializers import TimeEntryListSerializer, TimeEntryListValuesSerializer
+    from invoices.models import Invoice
+    from invoices.serializers import InvoiceListSerializer, InvoiceListValuesSerializer
+
+    user = create_data(rows)
+    renderer = JSONRenderer()
+    cases = [
+        (
+            'time_entries',
+            TimeEntry.objects.filter(user=user).select_related('project', 'project__client'),
+            TimeEntryListSerializer,
+            TimeEntryListValuesSerializer,
+        ),
+        (
+            'invoices',
+            Invoice.objects.filter(user=user).select_related('client', 'project'),
+            InvoiceListSerializer,
+            InvoiceListValuesSerializer,
+        ),
+    ]
+
+    for name, queryset, serializer_class, values_serializer_class in cases:
+        drf_time, drf_output = timed(
+            lambda: renderer.render(serializer_class(queryset.all(), many=True).data),
+            repeat
+        )
+        fast_time, fast_output = timed(
+            lambda: renderer.render(values_serializer_class().to_representation(
+                values_serializer_class().get_queryset(queryset.all())
+            )),
+            repeat
+        )
+        if drf_output != fast_output:
+            raise AssertionError(f'{name}: fast path output differs from {serializer_class.__name__}')
+
+        print(f'{name:<14} rows={rows} drf={drf_time * 1000:.1f}ms '
+              f'values={fast_time * 1000:.1f}ms speedup={drf_time / fast_time:.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+    try:
+        run(args.rows, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
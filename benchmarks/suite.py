@@ -0,0 +1,210 @@
+"""
+Benchmarks for the invoice generator's hot paths.
+"""
+from datetime import timedelta
+from django.db.models import Count
+from django.utils import timezone
+from .harness import benchmark, rolled_back
+
+
+class BenchmarkContext:
+    """
+    Shared objects for benchmarks: the first generated user, their
+    busiest client and an authenticated API client.
+    """
+
+    def __init__(self, dataset):
+        from rest_framework.test import APIClient
+        from core.models import User
+        from clients.models import Client
+
+        self.dataset = dataset
+        self.today = timezone.now().date()
+        self.user = User.objects.get(pk=dataset.user_ids[0])
+        self.client = Client.objects.filter(user=self.user, invoice_line_items='project').annotate(
+            entry_count=Count('projects__time_entries')
+        ).order_by('-entry_count', 'pk').first()
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def get(self, path, **params):
+        response = self.api_client.get(path, params, secure=True)
+        if response.status_code != 200:
+            raise AssertionError(f'GET {path} returned {response.status_code}')
+        return response
+
+    def post(self, path, data):
+        response = self.api_client.post(path, data, format='json', secure=True)
+        if response.status_code >= 300:
+            raise AssertionError(f'POST {path} returned {response.status_code}')
+        return response
+    
+    def create_invoice(self, days, client=None):
+        """
+        Create an invoice for setup, then release its time entries so later
+        benchmarks still see them as unbilled.
+        """
+        from invoices.services.invoice_service import InvoiceService
+
+        invoice = InvoiceService.create_invoice_from_time_entries(self.user, self.invoice_data(days, client))
+        InvoiceService.release_time_entries([invoice.pk])
+        return invoice
+
+    def invoice_data(self, days=365, client=None):
+        return {
+            'client': client or self.client,
+            'start_date': self.today - timedelta(days=days),
+            'end_date': self.today,
+            'notes': 'Benchmark invoice',
+        }
+
+
+@benchmark('create_invoice_from_time_entries')
+def create_invoice_from_time_entries(context):
+    from invoices.services.invoice_service import InvoiceService
+
+    def run():
+        with rolled_back():
+            InvoiceService.create_invoice_from_time_entries(context.user, context.invoice_data())
+    return run
+
+
+@benchmark('render_invoice_pdf')
+def render_invoice_pdf(context):
+    from invoices.services.pdf_generator import InvoicePDFGenerator
+
+    invoice = context.create_invoice(days=90)
+
+    def run():
+        generator = InvoicePDFGenerator(invoice)
+        generator._convert_to_pdf(generator._generate_html())
+    return run
+
+
+@benchmark('create_invoice_detailed')
+def create_invoice_detailed(context):
+    """
+    Bill 5,000 time entries as one invoice item each.
+    """
+    from invoices.services.invoice_service import InvoiceService
+    from .fixtures import detailed_client
+
+    client = detailed_client(context.user)
+
+    def run():
+        with rolled_back():
+            InvoiceService.create_invoice_from_time_entries(context.user, context.invoice_data(client=client))
+    return run
+
+
+@benchmark('render_invoice_pdf_detailed')
+def render_invoice_pdf_detailed(context):
+    """
+    Render an invoice with 5,000 per-entry lines, grouped by week.
+    """
+    from invoices.services.pdf_generator import InvoicePDFGenerator
+    from .fixtures import detailed_client
+
+    invoice = context.create_invoice(days=365, client=detailed_client(context.user))
+
+    def run():
+        generator = InvoicePDFGenerator(invoice)
+        generator._convert_to_pdf(generator._generate_html())
+    return run
+
+
+@benchmark('list_time_entries')
+def list_time_entries(context):
+    return lambda: context.get('/api/time-entries/')
+
+
+@benchmark('list_time_entries_last_page')
+def list_time_entries_last_page(context):
+    from time_entries.models import TimeEntry
+
+    count = TimeEntry.objects.filter(user=context.user).count()
+    last_page = max((count + 19) // 20, 1)
+    return lambda: context.get('/api/time-entries/', page=last_page)
+
+
+@benchmark('list_invoices')
+def list_invoices(context):
+    return lambda: context.get('/api/invoices/')
+
+
+@benchmark('list_overdue_invoices')
+def list_overdue_invoices(context):
+    return lambda: context.get('/api/invoices/overdue/')
+
+
+@benchmark('time_entry_summary')
+def time_entry_summary(context):
+    return lambda: context.get('/api/time-entries/summary/', period='year')
+
+
+@benchmark('invoice_summary')
+def invoice_summary(context):
+    return lambda: context.get('/api/invoices/summary/', period='year')
+
+
+@benchmark('user_dashboard')
+def user_dashboard(context):
+    return lambda: context.get('/api/dashboard/')
+
+
+@benchmark('generate_recurring_invoices')
+def generate_recurring_invoices(context):
+    from clients.models import Client
+    from invoices.tasks import generate_recurring_invoices as task
+
+    def run():
+        with rolled_back():
+            Client.objects.filter(user=context.user).update(
+                recurring_invoice=True,
+                recurring_frequency='monthly',
+                next_invoice_date=context.today
+            )
+            task()
+    return run
+
+
+@benchmark('stripe_payment_flow')
+def stripe_payment_flow(context):
+    """
+    Create a payment intent through the API, pay it in the fake gateway,
+    deliver the signed webhook and process the queued event.
+    """
+    from stripe_integration.gateways import get_gateway
+    from stripe_integration.services import StripeService
+
+    invoice = context.create_invoice(days=30)
+
+    def run():
+        with rolled_back():
+            response = context.post('/api/stripe/create-payment-intent/', {'invoice_id': invoice.id})
+            get_gateway().confirm_payment_intent(response.data['payment_intent']['payment_intent_id'])
+            StripeService.process_pending_webhook_events()
+    return run
+
+
+@benchmark('reconcile_payments')
+def reconcile_payments(context):
+    """
+    Reconcile open payment intents for up to 50 unpaid invoices, half of
+    which were paid in the gateway without a webhook.
+    """
+    from invoices.models import Invoice
+    from stripe_integration.gateways import get_gateway
+    from stripe_integration.services import StripeService
+
+    gateway = get_gateway()
+    invoices = Invoice.objects.filter(user=context.user).exclude(status='paid').select_related('client')[:50]
+    for index, invoice in enumerate(invoices):
+        stripe_payment_intent = StripeService.create_payment_intent(invoice, context.user)
+        if index % 2:
+            gateway.payment_intents[stripe_payment_intent.payment_intent_id]['status'] = 'succeeded'
+
+    def run():
+        with rolled_back():
+            StripeService.reconcile_payment_intents()
+    return run
@@ -18,7 +18,7 @@ class ClientAdmin(admin.ModelAdmin):
             'fields': ('address', 'tax_id', 'notes')
         }),
         ('Invoice Settings', {
-            'fields': ('default_hourly_rate', 'payment_terms', 'currency')
+            'fields': ('default_hourly_rate', 'payment_terms', 'currency', 'invoice_line_items')
         }),
         ('Recurring Invoice', {
             'fields': ('recurring_invoice', 'recurring_frequency', 'next_invoice_date')
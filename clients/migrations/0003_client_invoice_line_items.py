@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='invoice_line_items',
+            field=models.CharField(choices=[('project', 'One line per project'), ('entry', 'One line per time entry')], default='project', max_length=20),
+        ),
+    ]
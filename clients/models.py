@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.validators import RegexValidator
 from core.models import BaseModel, User
+from core.rates import get_rate_card
 
 
 class Client(BaseModel):
@@ -25,6 +26,14 @@ class Client(BaseModel):
     default_hourly_rate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     payment_terms = models.CharField(max_length=100, default='Net 30')
     currency = models.CharField(max_length=3, default='USD')
+    invoice_line_items = models.CharField(
+        max_length=20,
+        choices=[
+            ('project', 'One line per project'),
+            ('entry', 'One line per time entry'),
+        ],
+        default='project'
+    )
     
     # Recurring invoice settings
     recurring_invoice = models.BooleanField(default=False)
@@ -49,5 +58,5 @@ class Client(BaseModel):
     def save(self, *args, **kwargs):
         # If no default hourly rate is set, use user's default
         if not self.default_hourly_rate:
-            self.default_hourly_rate = self.user.default_hourly_rate
+            self.default_hourly_rate = get_rate_card().for_client(self)
         super().save(*args, **kwargs) 
\ No newline at end of file
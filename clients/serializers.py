@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Client
 from django.db import models
+from invoices.models import Invoice
 
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import ExchangeRate, User
 
 
 @admin.register(User)
@@ -12,7 +12,7 @@ class CustomUserAdmin(UserAdmin):
     
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
-        ('Personal info', {'fields': ('username', 'first_name', 'last_name', 'phone_number', 'company_name', 'address', 'tax_id', 'default_hourly_rate')}),
+        ('Personal info', {'fields': ('username', 'first_name', 'last_name', 'phone_number', 'company_name', 'address', 'tax_id', 'default_hourly_rate', 'base_currency')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
@@ -22,4 +22,11 @@ class CustomUserAdmin(UserAdmin):
             'classes': ('wide',),
             'fields': ('email', 'username', 'password1', 'password2'),
         }),
-    ) 
\ No newline at end of file
+    )
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'date', 'rate')
+    list_filter = ('currency',)
+    date_hierarchy = 'date'
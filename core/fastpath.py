@@ -0,0 +1,84 @@
+from rest_framework.fields import ReadOnlyField
+from rest_framework.response import Response
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer that renders rows straight from ``values()``.
+
+    Reuses the fields of ``serializer_class`` so the output is identical,
+    but skips model instantiation and per-row serializer field resolution.
+    Model properties used by the serializer must be provided as SQL
+    expressions via ``annotations`` (or ``get_annotations()``).
+    """
+    serializer_class = None
+    annotations = {}
+
+    @classmethod
+    def get_field_map(cls):
+        """
+        Resolve (field name, values() lookup, converter, spans relation)
+        for every readable field once per class.
+        """
+        if '_field_map' not in cls.__dict__:
+            field_map = []
+            for field in cls.serializer_class()._readable_fields:
+                to_representation = field.to_representation
+                if isinstance(field, ReadOnlyField):
+                    to_representation = None
+                field_map.append((
+                    field.field_name,
+                    '__'.join(field.source_attrs),
+                    to_representation,
+                    len(field.source_attrs) > 1,
+                ))
+            cls._field_map = tuple(field_map)
+        return cls._field_map
+
+    def get_annotations(self):
+        return dict(self.annotations)
+
+    def get_queryset(self, queryset):
+        """
+        Annotate the queryset and narrow it to the rendered columns.
+        """
+        annotations = self.get_annotations()
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*[lookup for _, lookup, _, _ in self.get_field_map()])
+
+    def to_representation(self, rows):
+        field_map = self.get_field_map()
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, to_representation, spans_relation in field_map:
+                value = row[lookup]
+                if value is None:
+                    # DRF skips fields whose source crosses a null relation
+                    if not spans_relation:
+                        item[name] = None
+                elif to_representation is None:
+                    item[name] = value
+                else:
+                    item[name] = to_representation(value)
+            data.append(item)
+        return data
+
+
+class ValuesListMixin:
+    """
+    Mixin for list views that serves GET collections through a
+    ``ValuesSerializer`` instead of the regular serializer class.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class()
+        queryset = serializer.get_queryset(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+
+        return Response(serializer.to_representation(queryset))
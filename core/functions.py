@@ -0,0 +1,66 @@
+from django.db import models
+
+
+class DateDiff(models.Func):
+    """
+    Number of whole days between two date expressions (``lhs - rhs``).
+    """
+    arity = 2
+    output_field = models.IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL returns an integer day count when subtracting dates
+        return super().as_sql(
+            compiler, connection,
+            template='(%(expressions)s)',
+            arg_joiner=' - ',
+            **extra_context
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            function='DATEDIFF',
+            arg_joiner=', ',
+            **extra_context
+        )
+
+
+class TimeRangeOverlaps(models.Func):
+    """
+    Whether ``[start_time, end_time)`` on ``date`` overlaps
+    ``[other_start, other_end)`` on ``other_date``; arguments in that
+    order. On PostgreSQL this compares tsrange values with ``&&``, which a
+    GiST index on ``tsrange(date + start_time, date + end_time)`` serves.
+    Elsewhere only the times are compared, so callers also filter
+    ``date = other_date``.
+    """
+    arity = 6
+    output_field = models.BooleanField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        _, start, end, _, other_start, other_end = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        return (
+            f'({start[0]} < {other_end[0]} AND {other_start[0]} < {end[0]})',
+            (*start[1], *other_end[1], *other_start[1], *end[1])
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        date, start, end, other_date, other_start, other_end = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        return (
+            f'(tsrange({date[0]} + {start[0]}, {date[0]} + {end[0]}) && '
+            f'tsrange({other_date[0]} + {other_start[0]}, {other_date[0]} + {other_end[0]}))',
+            (*date[1], *start[1], *date[1], *end[1], *other_date[1], *other_start[1], *other_date[1], *other_end[1])
+        )
@@ -0,0 +1,204 @@
+"""
+Currency conversion against the ExchangeRate table.
+
+Rates are quoted against settings.FX_PIVOT_CURRENCY and looked up as the
+latest rate on or before a date, so weekends and holidays use the
+previous business day. get_rate() serves single lookups from a bounded
+per-process LRU cache; convert_expression() builds the same lookup as
+SQL so querysets can aggregate amounts in another currency without
+loading rows.
+"""
+import csv
+import threading
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import Round, Upper
+from django.db.models.lookups import Exact
+from .models import ExchangeRate
+
+# Rates carry 8 decimal places; whole-number rates would otherwise use
+# integer division on SQLite
+DECIMAL_ONE = Decimal('1.00000000')
+
+
+class RateCache:
+    """
+    Thread-safe LRU mapping of (currency, date) to rate.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._rates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            rate = self._rates.get(key)
+            if rate is not None:
+                self._rates.move_to_end(key)
+            return rate
+
+    def set(self, key, rate):
+        with self._lock:
+            self._rates[key] = rate
+            self._rates.move_to_end(key)
+            while len(self._rates) > self.maxsize:
+                self._rates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+
+    def __len__(self):
+        return len(self._rates)
+
+
+rate_cache = RateCache(settings.FX_RATE_CACHE_SIZE)
+
+
+def get_rate(currency, on_date):
+    """
+    Units of ``currency`` per pivot currency unit on ``on_date``.
+
+    Raises ExchangeRate.DoesNotExist when no rate is loaded on or before
+    the date. Only rates quoted for the requested date itself are cached:
+    a fallback to an earlier day would go stale once that day's rate is
+    loaded, and loading happens in another process.
+    """
+    currency = currency.upper()
+    if currency == settings.FX_PIVOT_CURRENCY:
+        return DECIMAL_ONE
+
+    key = (currency, on_date)
+    rate = rate_cache.get(key)
+    if rate is not None:
+        return rate
+
+    rate, rate_date = ExchangeRate.objects.filter(
+        currency=currency, date__lte=on_date
+    ).order_by('-date').values_list('rate', 'date').first() or (None, None)
+    if rate is None:
+        raise ExchangeRate.DoesNotExist(f"No {currency} exchange rate on or before {on_date}")
+    if rate_date == on_date:
+        rate_cache.set(key, rate)
+    return rate
+
+
+def convert(amount, from_currency, to_currency, on_date):
+    """
+    Convert ``amount`` between currencies at the rates for ``on_date``,
+    rounded to cents.
+    """
+    if from_currency.upper() == to_currency.upper():
+        return amount
+    converted = Decimal(amount) * get_rate(to_currency, on_date) / get_rate(from_currency, on_date)
+    return converted.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def parse_rates(lines):
+    """
+    Yield ExchangeRates from CSV text lines, either one rate per row with
+    date, currency and rate columns, or one row per date with a column
+    per currency (the layout of the ECB reference rate files). Blank and
+    N/A cells are skipped.
+    """
+    reader = csv.reader(lines)
+    header = [column.strip() for column in next(reader, [])]
+    lowered = [column.lower() for column in header]
+    if not header or lowered[0] != 'date':
+        raise ValueError("Rate files need a date column first.")
+    long_format = 'currency' in lowered and 'rate' in lowered
+
+    for number, row in enumerate(reader, start=2):
+        row = [value.strip() for value in row]
+        if not any(row):
+            continue
+        try:
+            rate_date = date.fromisoformat(row[0])
+            if long_format:
+                cells = [(row[lowered.index('currency')], row[lowered.index('rate')])]
+            else:
+                cells = zip(header[1:], row[1:])
+            for currency, value in cells:
+                if not currency or value in ('', 'N/A'):
+                    continue
+                currency = currency.upper()
+                if len(currency) != 3 or not currency.isalpha():
+                    raise ValueError(f"invalid currency {currency!r}")
+                yield ExchangeRate(currency=currency, date=rate_date, rate=Decimal(value))
+        except (ValueError, IndexError, InvalidOperation) as e:
+            raise ValueError(f"Line {number}: {e or 'invalid rate'}")
+
+
+def load_rates(lines, batch_size=1000):
+    """
+    Insert or update the rates in a CSV file (see parse_rates) and clear
+    this process's rate cache. Returns the number of rates loaded.
+    """
+    count = 0
+    batch = {}
+    for rate in parse_rates(lines):
+        # A repeated (currency, date) keeps the last value; an upsert may
+        # only touch each row once
+        batch[(rate.currency, rate.date)] = rate
+        if len(batch) >= batch_size:
+            count += _save_rates(batch.values())
+            batch = {}
+    if batch:
+        count += _save_rates(batch.values())
+    rate_cache.clear()
+    return count
+
+
+def _save_rates(rates):
+    rates = ExchangeRate.objects.bulk_create(
+        list(rates), update_conflicts=True, unique_fields=['currency', 'date'], update_fields=['rate']
+    )
+    return len(rates)
+
+
+def _rate_subquery(on_date, **currency_filter):
+    return models.Subquery(
+        ExchangeRate.objects.filter(
+            date__lte=models.OuterRef(on_date), **currency_filter
+        ).order_by('-date').values('rate')[:1],
+        output_field=models.DecimalField(max_digits=18, decimal_places=8)
+    )
+
+
+def convert_expression(amount, currency, on_date, to_currency):
+    """
+    SQL expression for ``amount`` in ``to_currency``. ``amount``,
+    ``currency`` and ``on_date`` name fields of the outer query, e.g.::
+
+        Invoice.objects.annotate(base_total=convert_expression(
+            'total_amount', 'client__currency', 'issue_date', 'GBP'
+        )).aggregate(Sum('base_total'))
+
+    Each row picks up its rates through the (currency, date) unique index
+    instead of being converted in Python. The result is NULL when a rate
+    is missing.
+    """
+    to_currency = to_currency.upper()
+    pivot = settings.FX_PIVOT_CURRENCY
+    decimal_field = models.DecimalField(max_digits=12, decimal_places=2)
+    # Rates are stored upper-cased; currencies entered as e.g. 'usd' match
+    from_currency = Upper(currency)
+
+    if to_currency == pivot:
+        to_rate = models.Value(DECIMAL_ONE)
+    else:
+        to_rate = _rate_subquery(on_date, currency=to_currency)
+    from_rate = models.Case(
+        models.When(Exact(from_currency, pivot), then=models.Value(DECIMAL_ONE)),
+        default=_rate_subquery(on_date, currency=Upper(models.OuterRef(currency)))
+    )
+
+    return models.Case(
+        models.When(Exact(from_currency, to_currency), then=models.F(amount)),
+        default=Round(models.F(amount) * DECIMAL_ONE * to_rate / from_rate, 2, output_field=decimal_field),
+        output_field=decimal_field
+    )
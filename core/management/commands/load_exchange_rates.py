@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.fx import load_rates
+
+
+class Command(BaseCommand):
+    help = (
+        'Load exchange rates from a local CSV file, quoted as units of currency '
+        'per FX_PIVOT_CURRENCY. Accepts date,currency,rate rows or one row per '
+        'date with a column per currency (e.g. the ECB eurofxref-hist.csv). '
+        'Existing rates for the same currency and date are replaced.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to load')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f, transaction.atomic():
+                count = load_rates(f, batch_size=options['batch_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f'Loaded {count} exchange rates.')
@@ -0,0 +1,247 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.metrics import percentile
+from stripe_integration.gateways import sign_webhook_payload
+
+DEFAULT_MIX = 'list_time_entries=40,paginate_time_entries=20,create_invoice=10,download_pdf=20,webhook=10'
+
+# Pause after a scenario that could not run, so a worker whose mix has
+# nothing to do yet does not spin on the CPU it is meant to measure
+SKIP_DELAY = 0.05
+
+
+class LoadTestSession:
+    """
+    Authenticated HTTP session against a running server, shared by all
+    worker threads.
+    """
+
+    def __init__(self, base_url, email, password, webhook_secret, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.webhook_secret = webhook_secret
+        self.timeout = timeout
+        self.token = None
+        status, data = self.request('POST', '/api/token/', {'email': email, 'password': password})
+        if status != 200:
+            raise CommandError(f'Authentication failed ({status})')
+        self.token = data['access']
+        self._lock = threading.Lock()
+        self.client_ids = []
+        self.invoice_ids = []
+        self.time_entry_pages = 1
+
+    def request(self, method, path, body=None, headers=None, raw=False):
+        """Return (status, parsed JSON or raw bytes)."""
+        data = body if raw else (json.dumps(body).encode() if body is not None else None)
+        request = urllib.request.Request(f'{self.base_url}{path}', data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        for key, value in (headers or {}).items():
+            request.add_header(key, value)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, content_type, content = response.status, response.headers.get_content_type(), response.read()
+        except urllib.error.HTTPError as e:
+            status, content_type, content = e.code, e.headers.get_content_type(), e.read()
+
+        if content_type == 'application/json':
+            return status, json.loads(content)
+        return status, content
+
+    def prepare(self):
+        """Discover clients, invoices and the number of time entry pages."""
+        status, data = self.request('GET', '/api/clients/')
+        if status != 200:
+            raise CommandError(f'Could not list clients ({status})')
+        self.client_ids = [client['id'] for client in data['results']]
+
+        status, data = self.request('GET', '/api/invoices/')
+        self.invoice_ids = [invoice['id'] for invoice in data['results']]
+
+        status, data = self.request('GET', '/api/time-entries/')
+        page_size = len(data['results']) or 1
+        self.time_entry_pages = max((data['count'] + page_size - 1) // page_size, 1)
+
+    def add_invoice(self, invoice_id):
+        with self._lock:
+            self.invoice_ids.append(invoice_id)
+
+
+class Scenarios:
+    """
+    Request scenarios; each returns the HTTP status of one request, or
+    None when it could not run (e.g. no invoices yet).
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def list_time_entries(self, rng):
+        return self.session.request('GET', '/api/time-entries/')[0]
+
+    def paginate_time_entries(self, rng):
+        page = rng.randint(1, self.session.time_entry_pages)
+        return self.session.request('GET', f'/api/time-entries/?page={page}')[0]
+
+    def create_invoice(self, rng):
+        if not self.session.client_ids:
+            return None
+        today = date.today()
+        status, data = self.session.request('POST', '/api/invoices/create-from-time-entries/', {
+            'client': rng.choice(self.session.client_ids),
+            'start_date': (today - timedelta(days=rng.choice([7, 30, 90]))).isoformat(),
+            'end_date': today.isoformat(),
+            'notes': 'Load test invoice',
+        })
+        if status == 201:
+            self.session.add_invoice(data['invoice']['id'])
+        return status
+
+    def download_pdf(self, rng):
+        if not self.session.invoice_ids:
+            return None
+        invoice_id = rng.choice(self.session.invoice_ids)
+        return self.session.request('GET', f'/api/invoices/{invoice_id}/pdf/')[0]
+
+    def webhook(self, rng):
+        payload = json.dumps({
+            'id': f'evt_load_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': 'payment_intent.created',
+            'data': {'object': {'id': f'pi_load_{uuid.uuid4().hex}', 'object': 'payment_intent'}},
+        })
+        return self.session.request(
+            'POST', '/api/stripe/webhook/', payload.encode(),
+            headers={'Stripe-Signature': sign_webhook_payload(payload, self.session.webhook_secret)},
+            raw=True
+        )[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the REST API of a running server with a weighted mix of requests '
+        'and report throughput and latency percentiles per endpoint. '
+        'Creates invoices and webhook events in the target database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--email', required=True, help='user to authenticate as')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+        parser.add_argument('--iterations', type=int, default=0,
+                            help='stop each worker after this many scenarios (0 runs for --duration)')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='comma separated scenario=weight pairs')
+        parser.add_argument('--webhook-secret', default=settings.STRIPE_WEBHOOK_SECRET)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='write results as JSON to this path')
+
+    def parse_mix(self, mix):
+        weights = {}
+        for part in mix.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if not hasattr(Scenarios, name) or name.startswith('_'):
+                raise CommandError(f'Unknown scenario: {name}')
+            weights[name] = float(weight or 1)
+        return weights
+
+    def handle(self, *args, **options):
+        weights = self.parse_mix(options['mix'])
+        session = LoadTestSession(
+            options['base_url'], options['email'], options['password'],
+            options['webhook_secret'], options['timeout']
+        )
+        session.prepare()
+        scenarios = Scenarios(session)
+
+        names = list(weights)
+        deadline = time.monotonic() + options['duration']
+        iterations = options['iterations']
+
+        def worker(index):
+            rng = random.Random(options['seed'] + index)
+            samples = []
+            iteration = 0
+            while time.monotonic() < deadline and not (iterations and iteration >= iterations):
+                iteration += 1
+                name = rng.choices(names, weights=[weights[n] for n in names])[0]
+                start = time.perf_counter()
+                try:
+                    status = getattr(scenarios, name)(rng)
+                except OSError:
+                    status = 0
+                if status is None:
+                    time.sleep(SKIP_DELAY)
+                else:
+                    samples.append((name, status, time.perf_counter() - start))
+            return samples
+
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            samples = [s for result in executor.map(worker, range(options['concurrency'])) for s in result]
+        elapsed = time.monotonic() - started_at
+
+        report = self.build_report(samples, elapsed, options)
+        self.print_report(report)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+    def build_report(self, samples, elapsed, options):
+        by_scenario = {}
+        for name, status, latency in samples:
+            by_scenario.setdefault(name, []).append((status, latency))
+
+        results = {}
+        for name, entries in sorted(by_scenario.items()):
+            latencies = sorted(latency for _, latency in entries)
+            results[name] = {
+                'requests': len(entries),
+                'errors': sum(1 for status, _ in entries if not 200 <= status < 300),
+                'throughput': len(entries) / elapsed,
+                'latency': {
+                    'p50': percentile(latencies, 0.5),
+                    'p90': percentile(latencies, 0.9),
+                    'p99': percentile(latencies, 0.99),
+                    'max': latencies[-1],
+                },
+            }
+
+        return {
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'duration': elapsed,
+            'requests': len(samples),
+            'throughput': len(samples) / elapsed,
+            'results': results,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{report["requests"]} requests in {report["duration"]:.1f}s '
+            f'({report["throughput"]:.1f} req/s, concurrency {report["concurrency"]})'
+        )
+        self.stdout.write(f'{"scenario":<24}{"reqs":>8}{"errors":>8}{"req/s":>9}'
+                          f'{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+        for name, result in report['results'].items():
+            latency = result['latency']
+            self.stdout.write(
+                f'{name:<24}{result["requests"]:>8}{result["errors"]:>8}{result["throughput"]:>9.1f}'
+                f'{latency["p50"] * 1000:>10.1f}{latency["p90"] * 1000:>10.1f}'
+                f'{latency["p99"] * 1000:>10.1f}{latency["max"] * 1000:>10.1f}'
+            )
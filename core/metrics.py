@@ -0,0 +1,279 @@
+"""
+Metrics registries and Prometheus text format rendering.
+
+Request metrics are kept in-process; counters and histograms for
+background work are stored in Redis so every web and worker process
+contributes to the same totals.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values, quantile):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(math.ceil(quantile * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Summary:
+    """
+    Count and sum of observations plus a sliding window of recent values
+    used to compute percentiles.
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.sum = 0.0
+        self.values = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.values.append(value)
+
+    def quantiles(self, quantiles):
+        values = sorted(self.values)
+        return {q: percentile(values, q) for q in quantiles}
+
+
+class RequestMetricsRegistry:
+    """
+    Per-view request metrics: response time, DB query count and SQL time.
+    """
+    QUANTILES = (0.5, 0.9, 0.99)
+    METRICS = (
+        ('http_request_duration_seconds', 'duration', 'Response time per view.'),
+        ('http_request_db_queries', 'queries', 'Database queries per request per view.'),
+        ('http_request_db_duration_seconds', 'sql_time', 'Time spent in SQL per request per view.'),
+    )
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, duration, queries, sql_time):
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = {
+                    key: Summary(self.window) for _, key, _ in self.METRICS
+                }
+            stats['duration'].observe(duration)
+            stats['queries'].observe(queries)
+            stats['sql_time'].observe(sql_time)
+
+    def snapshot(self):
+        """Return {view: {metric: {'count', 'sum', 'quantiles'}}}."""
+        with self._lock:
+            return {
+                view_name: {
+                    key: {
+                        'count': summary.count,
+                        'sum': summary.sum,
+                        'quantiles': summary.quantiles(self.QUANTILES),
+                    } for key, summary in stats.items()
+                } for view_name, stats in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Render the registry in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, key, help_text in self.METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} summary')
+            for view_name in sorted(snapshot):
+                data = snapshot[view_name][key]
+                for quantile, value in data['quantiles'].items():
+                    labels = format_labels({'view': view_name, 'quantile': quantile})
+                    lines.append(f'{name}{labels} {value}')
+                labels = format_labels({'view': view_name})
+                lines.append(f'{name}_sum{labels} {data["sum"]}')
+                lines.append(f'{name}_count{labels} {data["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetricsRegistry()
+
+
+class RedisMetricsRegistry:
+    """
+    Registry of counters and histograms aggregated through Redis.
+
+    Each metric is a Redis hash keyed by label set, so increments from
+    any process are atomic and the endpoint renders the combined totals.
+    Redis errors are logged and swallowed so metrics never break the
+    instrumented code; after a failure writes are skipped for
+    RETRY_INTERVAL seconds instead of waiting on every call.
+    """
+    KEY_PREFIX = 'metrics:'
+    RETRY_INTERVAL = 30
+
+    def __init__(self):
+        self._metrics = {}
+        self._client = None
+        self._retry_at = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                socket_timeout=1,
+                socket_connect_timeout=1
+            )
+        return self._client
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def execute(self, commands):
+        """Run (method, *args) commands in one pipeline."""
+        if not settings.METRICS_ENABLED or time.monotonic() < self._retry_at:
+            return None
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for method, *args in commands:
+                getattr(pipeline, method)(*args)
+            return pipeline.execute()
+        except Exception as e:
+            self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+            logger.warning("Metrics backend unavailable: %s", e)
+            return None
+
+    def render(self):
+        """Render every registered metric in the Prometheus text format."""
+        metrics = list(self._metrics.values())
+        results = self.execute([('hgetall', metric.key) for metric in metrics])
+        if results is None:
+            return ''
+
+        lines = []
+        for metric, values in zip(metrics, results):
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            values = {key.decode(): value.decode() for key, value in values.items()}
+            lines.extend(metric.render(values))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        self.execute([('delete', metric.key) for metric in self._metrics.values()])
+
+
+class RedisMetric:
+    type = None
+
+    def __init__(self, registry, name, help_text):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.key = f'{registry.KEY_PREFIX}{name}'
+        registry.register(self)
+
+    @staticmethod
+    def label_key(labels):
+        return json.dumps(sorted(labels.items()))
+
+
+class Counter(RedisMetric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.execute([('hincrbyfloat', self.key, self.label_key(labels), amount)])
+
+    def render(self, values):
+        for label_key in sorted(values):
+            labels = format_labels(dict(json.loads(label_key)))
+            yield f'{self.name}{labels} {float(values[label_key])}'
+
+
+class Histogram(RedisMetric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, help_text, buckets):
+        super().__init__(registry, name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        label_key = self.label_key(labels)
+        commands = [
+            ('hincrbyfloat', self.key, f'{label_key}|sum', value),
+            ('hincrby', self.key, f'{label_key}|count', 1),
+        ]
+        for bucket in self.buckets:
+            if value <= bucket:
+                commands.append(('hincrby', self.key, f'{label_key}|{bucket}', 1))
+        self.registry.execute(commands)
+
+    def render(self, values):
+        label_keys = sorted({field.rsplit('|', 1)[0] for field in values})
+        for label_key in label_keys:
+            labels = dict(json.loads(label_key))
+            count = int(values.get(f'{label_key}|count', 0))
+            for bucket in self.buckets:
+                bucket_labels = format_labels({**labels, 'le': bucket})
+                yield f'{self.name}_bucket{bucket_labels} {int(values.get(f"{label_key}|{bucket}", 0))}'
+            yield f'{self.name}_bucket{format_labels({**labels, "le": "+Inf"})} {count}'
+            yield f'{self.name}_sum{format_labels(labels)} {float(values.get(f"{label_key}|sum", 0))}'
+            yield f'{self.name}_count{format_labels(labels)} {count}'
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+metrics_registry = RedisMetricsRegistry()
+
+task_duration = Histogram(
+    metrics_registry, 'celery_task_duration_seconds',
+    'Celery task run time.', DURATION_BUCKETS
+)
+task_runs = Counter(
+    metrics_registry, 'celery_task_runs_total',
+    'Celery task runs by final state.'
+)
+pdf_render_duration = Histogram(
+    metrics_registry, 'invoice_pdf_render_seconds',
+    'Time to render an invoice PDF.', DURATION_BUCKETS
+)
+pdf_size = Histogram(
+    metrics_registry, 'invoice_pdf_bytes',
+    'Size of rendered invoice PDFs.', SIZE_BUCKETS
+)
+emails_sent = Counter(
+    metrics_registry, 'invoice_emails_sent_total',
+    'Invoice emails sent by recipient.'
+)
+recurring_invoices = Counter(
+    metrics_registry, 'recurring_invoices_generated_total',
+    'Recurring invoice runs by source and outcome.'
+)
+webhook_duration = Histogram(
+    metrics_registry, 'stripe_webhook_processing_seconds',
+    'Stripe webhook processing time by event type.', DURATION_BUCKETS
+)
@@ -0,0 +1,71 @@
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from .metrics import request_metrics
+from .rates import rate_card_scope
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryMetricsMiddleware:
+    """
+    Record response time, DB query count and SQL time per view.
+
+    Results are aggregated in core.metrics.request_metrics and, in debug
+    mode, returned to the client as a Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        duration = time.perf_counter() - start
+        resolver_match = getattr(request, 'resolver_match', None)
+        view_name = resolver_match.view_name if resolver_match else '<unresolved>'
+        request_metrics.record(view_name, duration, counter.count, counter.duration)
+
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'db;dur={counter.duration * 1000:.2f};desc="{counter.count} queries", '
+                f'total;dur={duration * 1000:.2f};desc="{view_name}"'
+            )
+
+        return response
+
+
+class RateCardMiddleware:
+    """
+    Share one RateCard (see core.rates) across the writes of a request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with rate_card_scope():
+            return self.get_response(request)
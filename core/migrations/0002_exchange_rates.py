@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'db_table': 'exchange_rate',
+                'ordering': ['currency', '-date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='base_currency',
+            field=models.CharField(default='USD', help_text='Currency summaries are reported in', max_length=3),
+        ),
+        migrations.AddConstraint(
+            model_name='exchangerate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='exchange_rate_currency_date_uniq'),
+        ),
+    ]
@@ -17,6 +17,7 @@ class User(AbstractUser):
     address = models.TextField(blank=True)
     tax_id = models.CharField(max_length=50, blank=True)
     default_hourly_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    base_currency = models.CharField(max_length=3, default='USD', help_text='Currency summaries are reported in')
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -37,4 +38,24 @@ class BaseModel(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        abstract = True 
\ No newline at end of file
+        abstract = True
+
+
+class ExchangeRate(models.Model):
+    """
+    Daily exchange rate: units of ``currency`` per one unit of
+    settings.FX_PIVOT_CURRENCY. The pivot itself has no rows.
+    """
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    
+    class Meta:
+        db_table = 'exchange_rate'
+        ordering = ['currency', '-date']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchange_rate_currency_date_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.currency} {self.rate} ({self.date})"
@@ -0,0 +1,151 @@
+"""
+Default hourly rate resolution: a time entry's own rate, else its
+project's, else the client's default, else the user's default.
+
+A RateCard caches resolved rates by user, client and project id so a
+request or task that writes many rows looks each one up once. The
+current card lives in a context variable: RateCardMiddleware opens one
+per request and the Celery task_prerun/task_postrun handlers one per
+task. Outside a scope get_rate_card() returns a fresh card. Saving a
+user, client or project clears the current card so later lookups see
+the change.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+_current_card = ContextVar('rate_card', default=None)
+
+
+def _cached_related(instance, field_name):
+    """Return the related object if it is already loaded, else None."""
+    field = instance._meta.get_field(field_name)
+    return field.get_cached_value(instance) if field.is_cached(instance) else None
+
+
+class RateCard:
+    """
+    Resolves and caches default hourly rates.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.clients = {}
+        self.projects = {}
+
+    def clear(self):
+        self.users.clear()
+        self.clients.clear()
+        self.projects.clear()
+
+    def user_rate(self, user_id):
+        """The user's default hourly rate."""
+        if user_id not in self.users:
+            from .models import User
+            self.users[user_id] = User.objects.values_list('default_hourly_rate', flat=True).get(pk=user_id)
+        return self.users[user_id]
+
+    def client_rate(self, client_id):
+        """The client's default hourly rate, falling back to the user's."""
+        if client_id not in self.clients:
+            from clients.models import Client
+            client_rate, user_id, user_rate = Client.objects.values_list(
+                'default_hourly_rate', 'user_id', 'user__default_hourly_rate'
+            ).get(pk=client_id)
+            self.users.setdefault(user_id, user_rate)
+            self.clients[client_id] = client_rate or user_rate
+        return self.clients[client_id]
+
+    def project_rate(self, project_id):
+        """The project's hourly rate, falling back to the client's."""
+        if project_id not in self.projects:
+            self.prime_projects([project_id])
+        return self.projects[project_id]
+
+    def prime_projects(self, project_ids):
+        """
+        Resolve the rates of many projects, with their clients and users,
+        in one query.
+        """
+        from projects.models import Project
+        missing = set(project_ids) - self.projects.keys()
+        if not missing:
+            return
+        for project_id, project_rate, client_id, client_rate, user_id, user_rate in Project.objects.filter(
+            pk__in=missing
+        ).values_list(
+            'pk', 'hourly_rate', 'client_id', 'client__default_hourly_rate', 'user_id', 'user__default_hourly_rate'
+        ):
+            self.users.setdefault(user_id, user_rate)
+            self.clients.setdefault(client_id, client_rate or user_rate)
+            self.projects[project_id] = project_rate or self.clients[client_id]
+
+    def for_client(self, client):
+        """Default rate for a (possibly unsaved) client."""
+        if client.default_hourly_rate:
+            return client.default_hourly_rate
+        user = _cached_related(client, 'user')
+        if user is not None:
+            self.users.setdefault(user.pk, user.default_hourly_rate)
+        return self.user_rate(client.user_id)
+
+    def for_project(self, project):
+        """Default rate for a (possibly unsaved) project."""
+        if project.hourly_rate:
+            return project.hourly_rate
+        client = _cached_related(project, 'client')
+        if client is not None and client.default_hourly_rate:
+            return client.default_hourly_rate
+        return self.client_rate(project.client_id)
+
+    def for_entry(self, entry):
+        """Default rate for a (possibly unsaved) time entry."""
+        if entry.hourly_rate:
+            return entry.hourly_rate
+        project = _cached_related(entry, 'project')
+        if project is not None and project.hourly_rate:
+            return project.hourly_rate
+        return self.project_rate(entry.project_id)
+
+
+def activate_rate_card():
+    """
+    Make a new RateCard current unless one already is; returns a token
+    for deactivate_rate_card, or None when an outer scope owns the card.
+    """
+    if _current_card.get() is not None:
+        return None
+    return _current_card.set(RateCard())
+
+
+def deactivate_rate_card(token):
+    if token is not None:
+        _current_card.reset(token)
+
+
+@contextmanager
+def rate_card_scope():
+    """
+    Share one RateCard for the duration of the block; nested scopes
+    reuse the outer card.
+    """
+    token = activate_rate_card()
+    try:
+        yield _current_card.get()
+    finally:
+        deactivate_rate_card(token)
+
+
+def get_rate_card():
+    """The current RateCard, or an uncached one outside any scope."""
+    return _current_card.get() or RateCard()
+
+
+@receiver(post_save, sender='core.User')
+@receiver(post_save, sender='clients.Client')
+@receiver(post_save, sender='projects.Project')
+def clear_rate_card(**kwargs):
+    card = _current_card.get()
+    if card is not None:
+        card.clear()
@@ -35,8 +35,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'username', 'first_name', 'last_name', 
-                 'phone_number', 'company_name', 'address', 'tax_id', 'default_hourly_rate')
+                 'phone_number', 'company_name', 'address', 'tax_id', 'default_hourly_rate', 'base_currency')
         read_only_fields = ('id', 'email')
+    
+    def validate_base_currency(self, value):
+        if len(value) != 3 or not value.isalpha():
+            raise serializers.ValidationError("Use a three-letter ISO 4217 currency code.")
+        return value.upper()
 
 
 class ChangePasswordSerializer(serializers.Serializer):
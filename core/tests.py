@@ -1,4 +1,8 @@
-from django.test import TestCase
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -112,4 +116,361 @@ class UserAPITest(APITestCase):
     def test_user_dashboard_unauthenticated(self):
         """Test accessing user dashboard when not authenticated."""
         response = self.client.get(self.dashboard_url)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) 
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) 
+
+class RequestMetricsTest(APITestCase):
+    """Test cases for the query metrics middleware and metrics endpoint."""
+    
+    def setUp(self):
+        from .metrics import request_metrics
+        self.registry = request_metrics
+        self.registry.reset()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+    
+    def test_request_metrics_recorded_per_view(self):
+        """Test response time and query count are recorded per view."""
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse('user-dashboard'))
+        
+        snapshot = self.registry.snapshot()
+        self.assertIn('user-dashboard', snapshot)
+        self.assertEqual(snapshot['user-dashboard']['duration']['count'], 1)
+        self.assertGreater(snapshot['user-dashboard']['queries']['sum'], 0)
+    
+    def test_metrics_endpoint_requires_staff(self):
+        """Test the metrics endpoint is only exposed to staff users."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # Debug mode does not open it up
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'http_request_duration_seconds', response.content)
+
+
+class FakeRedisPipeline:
+    """Stands in for a Redis pipeline, keeping hashes in a dict."""
+    
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.commands = []
+    
+    def __getattr__(self, method):
+        return lambda *args: self.commands.append((method, args))
+    
+    def execute(self):
+        results = []
+        for method, (key, *args) in self.commands:
+            values = self.hashes.setdefault(key, {})
+            if method in ('hincrby', 'hincrbyfloat'):
+                field, amount = args
+                values[field] = values.get(field, 0) + amount
+                results.append(values[field])
+            elif method == 'hgetall':
+                results.append({field.encode(): str(value).encode() for field, value in values.items()})
+            elif method == 'delete':
+                results.append(int(bool(self.hashes.pop(key))))
+        return results
+
+
+@override_settings(METRICS_ENABLED=True)
+class RedisMetricsTest(TestCase):
+    """Test cases for the Redis-aggregated counters and histograms."""
+    
+    def setUp(self):
+        from unittest import mock
+        from .metrics import Counter, Histogram, RedisMetricsRegistry
+        self.hashes = {}
+        self.registry = RedisMetricsRegistry()
+        self.registry._client = mock.Mock()
+        self.registry._client.pipeline.side_effect = lambda **kwargs: FakeRedisPipeline(self.hashes)
+        self.runs = Counter(self.registry, 'task_runs_total', 'Task runs.')
+        self.duration = Histogram(self.registry, 'task_duration_seconds', 'Task run time.', (1, 0.1, 10))
+    
+    def test_metrics_are_stored_as_hashes_per_label_set(self):
+        """Test counters and histogram buckets are hash fields keyed by labels."""
+        self.runs.inc(task='send', state='SUCCESS')
+        self.runs.inc(2, task='send', state='SUCCESS')
+        self.duration.observe(0.5, task='send')
+        
+        label_key = '[["state", "SUCCESS"], ["task", "send"]]'
+        self.assertEqual(self.hashes['metrics:task_runs_total'], {label_key: 3})
+        self.assertEqual(self.hashes['metrics:task_duration_seconds'], {
+            '[["task", "send"]]|sum': 0.5,
+            '[["task", "send"]]|count': 1,
+            '[["task", "send"]]|1': 1,
+            '[["task", "send"]]|10': 1,
+        })
+    
+    def test_render_prometheus_text(self):
+        """Test histograms render cumulative buckets, +Inf, sum and count."""
+        self.duration.observe(0.05, task='send')
+        self.duration.observe(5, task='send')
+        self.runs.inc(task='send', state='SUCCESS')
+        
+        self.assertEqual(self.registry.render().splitlines(), [
+            '# HELP task_runs_total Task runs.',
+            '# TYPE task_runs_total counter',
+            'task_runs_total{state="SUCCESS",task="send"} 1.0',
+            '# HELP task_duration_seconds Task run time.',
+            '# TYPE task_duration_seconds histogram',
+            'task_duration_seconds_bucket{task="send",le="0.1"} 1',
+            'task_duration_seconds_bucket{task="send",le="1"} 1',
+            'task_duration_seconds_bucket{task="send",le="10"} 2',
+            'task_duration_seconds_bucket{task="send",le="+Inf"} 2',
+            'task_duration_seconds_sum{task="send"} 5.05',
+            'task_duration_seconds_count{task="send"} 2',
+        ])
+    
+    def test_unavailable_redis_is_skipped(self):
+        """Test Redis errors are swallowed and writes paused for the retry interval."""
+        import redis
+        self.registry._client.pipeline.side_effect = redis.ConnectionError('down')
+        
+        with self.assertLogs('core.metrics', 'WARNING'):
+            self.runs.inc(task='send', state='SUCCESS')
+        self.runs.inc(task='send', state='SUCCESS')
+        self.assertEqual(self.registry.render(), '')
+        self.assertEqual(self.registry._client.pipeline.call_count, 1)
+    
+    def test_celery_signals_time_tasks(self):
+        """Test task_prerun and task_postrun record duration and final state."""
+        from unittest import mock
+        from celery.signals import task_postrun, task_prerun
+        import invoice_generator.celery  # noqa: F401 (connects the signal handlers)
+        task = mock.Mock()
+        task.name = 'invoices.tasks.send_invoice'
+        
+        with mock.patch('core.metrics.task_duration.observe') as observe, \
+                mock.patch('core.metrics.task_runs.inc') as inc:
+            task_prerun.send(sender=task, task_id='task-1', task=task)
+            task_postrun.send(sender=task, task_id='task-1', task=task, state='SUCCESS')
+        
+        duration, = observe.call_args.args
+        self.assertGreaterEqual(duration, 0)
+        self.assertEqual(observe.call_args.kwargs, {'task': 'invoices.tasks.send_invoice'})
+        inc.assert_called_once_with(task='invoices.tasks.send_invoice', state='SUCCESS')
+
+
+class ExchangeRateTest(TestCase):
+    """Test cases for loading exchange rates and converting summaries."""
+    
+    def setUp(self):
+        from .fx import rate_cache
+        rate_cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            base_currency='GBP'
+        )
+    
+    def load(self, text):
+        from .fx import load_rates
+        return load_rates(io.StringIO(text))
+    
+    def test_load_rates_in_either_layout(self):
+        """Test long and wide CSV files load and replace existing rates."""
+        from .models import ExchangeRate
+        self.assertEqual(self.load('date,currency,rate\n2025-01-02,usd,1.25\n2025-01-02,GBP,0.8\n'), 2)
+        self.assertEqual(self.load('Date,USD,GBP,JPY\n2025-01-02,1.10,0.85,N/A\n2025-01-03,1.11,0.86,160\n'), 5)
+        
+        self.assertEqual(ExchangeRate.objects.count(), 5)
+        self.assertEqual(ExchangeRate.objects.get(currency='USD', date=date(2025, 1, 2)).rate, Decimal('1.1'))
+        with self.assertRaisesMessage(ValueError, 'Line 2'):
+            self.load('date,currency,rate\n2025-01-02,USD,abc\n')
+    
+    @override_settings(FX_PIVOT_CURRENCY='EUR')
+    def test_get_rate_falls_back_and_caches_exact_dates(self):
+        """Test lookups use the latest earlier rate and only cache exact dates."""
+        from .fx import convert, get_rate, rate_cache
+        from .models import ExchangeRate
+        self.load('Date,USD,GBP\n2025-01-03,1.20,0.80\n')
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(get_rate('USD', date(2025, 1, 3)), Decimal('1.2'))
+            self.assertEqual(get_rate('USD', date(2025, 1, 3)), Decimal('1.2'))
+        self.assertEqual(get_rate('USD', date(2025, 1, 5)), Decimal('1.2'))
+        self.assertEqual(len(rate_cache), 1)
+        self.assertEqual(get_rate('EUR', date(2025, 1, 5)), Decimal('1'))
+        self.assertEqual(convert(Decimal('100.00'), 'USD', 'GBP', date(2025, 1, 4)), Decimal('66.67'))
+        with self.assertRaises(ExchangeRate.DoesNotExist):
+            get_rate('USD', date(2025, 1, 1))
+    
+    @override_settings(FX_PIVOT_CURRENCY='EUR')
+    def test_invoice_summary_converts_to_base_currency(self):
+        """Test summary totals are converted per issue date in SQL."""
+        from clients.models import Client
+        from invoices.models import Invoice
+        from invoices.services.invoice_service import InvoiceService
+        today = timezone.now().date()
+        self.load(f'Date,USD,GBP\n{today - timedelta(days=10)},1.25,0.50\n{today - timedelta(days=2)},2.00,0.50\n')
+        
+        for number, (currency, amount, days_ago, invoice_status) in enumerate((
+            ('GBP', '10.00', 1, 'paid'),
+            ('USD', '100.00', 5, 'sent'),
+            ('USD', '100.00', 1, 'overdue'),
+            ('eur', '30.00', 3, 'paid'),
+            ('JPY', '500.00', 1, 'sent'),
+            # Overdue from before the period and the first loaded rate
+            ('USD', '70.00', 60, 'overdue'),
+        )):
+            client = Client.objects.create(user=self.user, name=currency, email=f'{number}@example.com', currency=currency)
+            Invoice.objects.create(
+                user=self.user, client=client, status=invoice_status,
+                issue_date=today - timedelta(days=days_ago), due_date=today,
+                subtotal=Decimal(amount), tax_rate=Decimal('0.00'), discount_rate=Decimal('0.00')
+            )
+        
+        with self.assertNumQueries(1):
+            summary = InvoiceService.get_invoice_summary(self.user, 'month')
+        
+        self.assertEqual(summary['currency'], 'GBP')
+        self.assertEqual(summary['total_invoices'], 5)
+        self.assertEqual(summary['total_amount'], 10 + 40 + 25 + 15)
+        self.assertEqual(summary['paid_amount'], 10 + 15)
+        self.assertEqual(summary['overdue_amount'], 25)
+        self.assertEqual(summary['unconverted_invoices'], 1)
+        self.assertEqual(summary['unconverted_overdue_invoices'], 1)
+
+
+class RateCardTest(TestCase):
+    """Test cases for default hourly rate resolution."""
+    
+    def setUp(self):
+        from clients.models import Client
+        from projects.models import Project
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            default_hourly_rate=Decimal('50.00')
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(user=self.user, client=self.client_obj, name='Website')
+        self.other_project = Project.objects.create(
+            user=self.user, client=self.client_obj, name='Support', hourly_rate=Decimal('80.00')
+        )
+    
+    def test_defaults_cascade_from_user_to_entry(self):
+        """Test clients, projects and entries inherit the nearest rate."""
+        from clients.models import Client
+        from projects.models import Project
+        from .rates import RateCard
+        self.assertEqual(self.client_obj.default_hourly_rate, Decimal('50.00'))
+        self.assertEqual(self.project.hourly_rate, Decimal('50.00'))
+        
+        Project.objects.filter(pk=self.project.pk).update(hourly_rate=None)
+        Client.objects.filter(pk=self.client_obj.pk).update(default_hourly_rate=Decimal('65.00'))
+        rate_card = RateCard()
+        rate_card.prime_projects([self.project.pk, self.other_project.pk])
+        self.assertEqual(rate_card.projects, {self.project.pk: Decimal('65.00'), self.other_project.pk: Decimal('80.00')})
+        self.assertEqual(rate_card.users, {self.user.pk: Decimal('50.00')})
+    
+    def test_scope_resolves_each_project_once(self):
+        """Test a rate card scope amortizes lookups and sees saved changes."""
+        from time_entries.models import TimeEntry
+        from .rates import rate_card_scope
+        with rate_card_scope() as rate_card:
+            with self.assertNumQueries(4):
+                entries = [
+                    TimeEntry.objects.create(user=self.user, project_id=self.project.pk, date=date(2025, 1, day), hours=1)
+                    for day in (1, 2, 3)
+                ]
+            self.assertEqual({entry.hourly_rate for entry in entries}, {Decimal('50.00')})
+            
+            self.project.hourly_rate = Decimal('70.00')
+            self.project.save()
+            self.assertEqual(rate_card.projects, {})
+            entry = TimeEntry.objects.create(user=self.user, project_id=self.project.pk, date=date(2025, 1, 4), hours=1)
+            self.assertEqual(entry.hourly_rate, Decimal('70.00'))
+    
+    def test_bulk_create_resolves_missing_rates(self):
+        """Test bulk created entries use the project rate unless given one."""
+        from rest_framework.test import APIClient
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        response = api_client.post(reverse('time-entry-bulk-create'), {'time_entries': [
+            {'project': self.project.pk, 'date': '2025-01-01', 'hours': '2.00', 'description': 'Design'},
+            {'project': self.other_project.pk, 'date': '2025-01-01', 'hours': '1.00', 'description': 'Calls'},
+            {'project': self.other_project.pk, 'date': '2025-01-02', 'hours': '1.00', 'description': 'Calls', 'hourly_rate': '90.00'},
+        ]}, format='json', secure=True)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [entry['hourly_rate'] for entry in response.json()['time_entries']],
+            ['50.00', '80.00', '90.00']
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LoadTestCommandTest(LiveServerTestCase):
+    """Test cases for the loadtest management command."""
+    
+    def setUp(self):
+        from clients.models import Client
+        from projects.models import Project
+        from time_entries.models import TimeEntry
+        self.user = User.objects.create_user(
+            email='bench@example.com',
+            username='bench',
+            password='testpass123'
+        )
+        client = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        project = Project.objects.create(
+            user=self.user, client=client, name='Website', hourly_rate=Decimal('100.00')
+        )
+        for days in range(3):
+            TimeEntry.objects.create(
+                user=self.user,
+                project=project,
+                date=timezone.now().date() - timedelta(days=days),
+                hours=Decimal('2.00'),
+                description='Work'
+            )
+    
+    def run_loadtest(self, mix, iterations):
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'load.json')
+            call_command(
+                'loadtest', '--base-url', self.live_server_url, '--email', 'bench@example.com',
+                '--password', 'testpass123', '--concurrency', '1', '--duration', '30',
+                '--iterations', str(iterations), '--mix', mix, '--output', output,
+                stdout=io.StringIO()
+            )
+            with open(output) as f:
+                return json.load(f)
+    
+    def test_runs_scenarios_for_given_iterations(self):
+        """Test a short run makes the requested number of requests without errors."""
+        from invoices.models import Invoice
+        report = self.run_loadtest('list_time_entries=1,paginate_time_entries=1,create_invoice=1', 6)
+        
+        self.assertEqual(report['requests'], 6)
+        self.assertLess(report['duration'], 30)
+        for name in ('list_time_entries', 'paginate_time_entries'):
+            self.assertEqual(report['results'][name]['errors'], 0)
+        # Only the first invoice finds unbilled time entries
+        self.assertEqual(Invoice.objects.filter(user=self.user).count(), 1)
+    
+    def test_scenarios_that_cannot_run_are_skipped(self):
+        """Test scenarios without data are not counted and the run still ends."""
+        report = self.run_loadtest('download_pdf=1', 3)
+        
+        self.assertEqual(report['requests'], 0)
+        self.assertEqual(report['results'], {})
+        self.assertLess(report['duration'], 30)
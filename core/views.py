@@ -8,6 +8,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from django.shortcuts import render, redirect
+from django.http import HttpResponse
+from django.conf import settings
 from django.db.models import Sum, Count
 from django.utils import timezone
 from datetime import timedelta
@@ -17,6 +19,7 @@ from .serializers import (
     ChangePasswordSerializer
 )
 from .forms import CustomUserCreationForm
+from .metrics import metrics_registry, request_metrics
 from clients.models import Client
 from projects.models import Project
 from time_entries.models import TimeEntry
@@ -210,4 +213,21 @@ def login_view(request):
 def logout_view(request):
     logout(request)
     messages.info(request, "You have successfully logged out.")
-    return redirect('home') 
\ No newline at end of file
+    return redirect('home') 
+
+
+def metrics_view(request):
+    """
+    Expose request metrics and the Redis-aggregated task metrics in the
+    Prometheus text format.
+    """
+    token = settings.METRICS_TOKEN
+    authorized = (
+        request.user.is_staff
+        or (token and request.headers.get('Authorization') == f'Bearer {token}')
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    
+    content = request_metrics.render() + metrics_registry.render()
+    return HttpResponse(content, content_type='text/plain; version=0.0.4; charset=utf-8')
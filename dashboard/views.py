@@ -9,6 +9,7 @@ from clients.models import Client
 from projects.models import Project
 from time_entries.models import TimeEntry
 from invoices.models import Invoice
+from core.rates import get_rate_card
 
 @login_required
 def dashboard_view(request):
@@ -159,18 +160,26 @@ def time_entries_view(request):
         
         project = get_object_or_404(Project, id=project_id, user=user)
         
+        # A blank rate falls back to the project's default in TimeEntry.save
         TimeEntry.objects.create(
             user=user,
             project=project,
             date=date,
             hours=float(hours),
             description=description,
-            hourly_rate=float(hourly_rate)
+            hourly_rate=float(hourly_rate) if hourly_rate else None
         )
         
         messages.success(request, 'Time entry added successfully')
         return redirect('dashboard:time_entries')
     
+    # Prefill the rate field with each project's default rate
+    projects = list(projects)
+    rate_card = get_rate_card()
+    rate_card.prime_projects(project.pk for project in projects)
+    for project in projects:
+        project.default_rate = rate_card.project_rate(project.pk)
+    
     context = {
         'time_entries': time_entries,
         'projects': projects,
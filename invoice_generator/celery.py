@@ -3,7 +3,9 @@ Celery configuration for invoice_generator project.
 """
 
 import os
+import time
 from celery import Celery
+from celery.signals import task_prerun, task_postrun
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invoice_generator.settings')
@@ -20,4 +22,41 @@ app.autodiscover_tasks()
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}') 
\ No newline at end of file
+    print(f'Request: {self.request!r}') 
+
+
+# Task metrics: start times keyed by task id within this worker process
+_task_started_at = {}
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_end(task_id=None, task=None, state=None, **kwargs):
+    from core.metrics import task_duration, task_runs
+    
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        task_duration.observe(time.perf_counter() - started_at, task=task.name)
+    task_runs.inc(task=task.name, state=state or 'UNKNOWN')
+
+
+# Default hourly rates are cached per task (see core.rates)
+_task_rate_cards = {}
+
+
+@task_prerun.connect
+def activate_task_rate_card(task_id=None, **kwargs):
+    from core.rates import activate_rate_card
+    
+    _task_rate_cards[task_id] = activate_rate_card()
+
+
+@task_postrun.connect
+def deactivate_task_rate_card(task_id=None, **kwargs):
+    from core.rates import deactivate_rate_card
+    
+    deactivate_rate_card(_task_rate_cards.pop(task_id, None))
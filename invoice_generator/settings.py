@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryMetricsMiddleware',
+    'core.middleware.RateCardMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -182,11 +184,73 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Redis (shared metrics and live timers)
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+from celery.schedules import crontab
+CELERY_BEAT_SCHEDULE = {
+    'mark-overdue-invoices': {
+        'task': 'invoices.tasks.mark_overdue_invoices',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'process-stripe-webhook-events': {
+        'task': 'stripe_integration.tasks.process_webhook_events',
+        'schedule': 60.0,
+    },
+    'refresh-payment-intent-statuses': {
+        'task': 'stripe_integration.tasks.refresh_payment_intent_statuses',
+        'schedule': crontab(minute='*/5'),
+    },
+    'reconcile-payments': {
+        'task': 'stripe_integration.tasks.reconcile_payments',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'sweep-abandoned-timers': {
+        'task': 'time_entries.tasks.sweep_abandoned_timers',
+        'schedule': crontab(minute='*/5'),
+    },
+}
+
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
 
+# Payment gateway used by StripeService. stripe_integration.gateways.FakeGateway
+# simulates Stripe in-process with PAYMENT_GATEWAY_LATENCY seconds per API call and
+# delivers signed webhooks to PAYMENT_GATEWAY_WEBHOOK_URL (or this process).
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='stripe_integration.gateways.StripeGateway')
+PAYMENT_GATEWAY_LATENCY = config('PAYMENT_GATEWAY_LATENCY', default=0.0, cast=float)
+PAYMENT_GATEWAY_WEBHOOK_URL = config('PAYMENT_GATEWAY_WEBHOOK_URL', default='')
+
+# Seconds a non-terminal payment intent status is served from the database
+# before it is fetched from Stripe again
+PAYMENT_INTENT_STATUS_TTL = config('PAYMENT_INTENT_STATUS_TTL', default=60, cast=int)
+
+# The nightly reconciliation only checks open payment intents created in the
+# last PAYMENT_RECONCILE_MAX_AGE_DAYS days; older ones are treated as abandoned
+PAYMENT_RECONCILE_MAX_AGE_DAYS = config('PAYMENT_RECONCILE_MAX_AGE_DAYS', default=90, cast=int)
+
+# Repricing more unbilled time entries than this runs as a background task,
+# updating TIME_ENTRY_REPRICE_BATCH_SIZE entries per transaction
+TIME_ENTRY_REPRICE_SYNC_LIMIT = config('TIME_ENTRY_REPRICE_SYNC_LIMIT', default=5000, cast=int)
+TIME_ENTRY_REPRICE_BATCH_SIZE = config('TIME_ENTRY_REPRICE_BATCH_SIZE', default=2000, cast=int)
+
+# Live timers without a heartbeat for TIMER_HEARTBEAT_TIMEOUT seconds are
+# saved as time entries by the sweeper, TIMER_SWEEP_BATCH_SIZE at a time
+TIMER_HEARTBEAT_TIMEOUT = config('TIMER_HEARTBEAT_TIMEOUT', default=900, cast=int)
+TIMER_SWEEP_BATCH_SIZE = config('TIMER_SWEEP_BATCH_SIZE', default=500, cast=int)
+
+# Exchange rates (core.ExchangeRate) are quoted as units of currency per one
+# FX_PIVOT_CURRENCY; FX_RATE_CACHE_SIZE bounds the per-process rate cache
+FX_PIVOT_CURRENCY = config('FX_PIVOT_CURRENCY', default='EUR')
+FX_RATE_CACHE_SIZE = config('FX_RATE_CACHE_SIZE', default=4096, cast=int)
+
+# Metrics endpoint (/metrics/) bearer token; staff users are always allowed
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Task, PDF, email and webhook metrics aggregated in Redis
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+
 # Custom user model
 AUTH_USER_MODEL = 'core.User'
 
@@ -52,6 +52,7 @@ urlpatterns = [
     path('logout/', core_views.logout_view, name='logout'),
     path('register/', core_views.register_view, name='register'),
     path('api-docs/', api_docs_view, name='api-docs'),
+    path('metrics/', core_views.metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     
     # JWT Authentication
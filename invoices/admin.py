@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, InvoiceTax, TaxRate
 
 
 class InvoiceItemInline(admin.TabularInline):
@@ -8,6 +8,17 @@ class InvoiceItemInline(admin.TabularInline):
     fields = ('description', 'quantity', 'unit_price', 'total')
 
 
+class InvoiceTaxInline(admin.TabularInline):
+    model = InvoiceTax
+    extra = 0
+    fields = ('name', 'rate', 'compound', 'taxable_amount', 'amount')
+    readonly_fields = fields
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
     list_display = ('invoice_number', 'client', 'user', 'issue_date', 'due_date', 'total_amount', 'status', 'is_overdue')
@@ -16,7 +27,7 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_editable = ('status',)
     readonly_fields = ('created_at', 'updated_at', 'is_overdue', 'days_overdue')
     date_hierarchy = 'issue_date'
-    inlines = [InvoiceItemInline]
+    inlines = [InvoiceItemInline, InvoiceTaxInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -48,7 +59,15 @@ class InvoiceAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('client', 'user', 'project')
+        return super().get_queryset(request).select_related('client', 'user', 'project').with_overdue()
+    
+    @admin.display(boolean=True, ordering='is_overdue')
+    def is_overdue(self, obj):
+        return obj.is_overdue
+    
+    @admin.display(ordering='days_overdue')
+    def days_overdue(self, obj):
+        return obj.days_overdue
 
 
 @admin.register(InvoiceItem)
@@ -59,4 +78,18 @@ class InvoiceItemAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('invoice', 'time_entry') 
\ No newline at end of file
+        return super().get_queryset(request).select_related('invoice', 'time_entry') 
+
+@admin.register(TaxRate)
+class TaxRateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'rate', 'compound', 'is_default')
+    list_filter = ('compound', 'is_default', 'user')
+    search_fields = ('name', 'user__email')
+    readonly_fields = ('created_at', 'updated_at')
+    
+    def save_model(self, request, obj, form, change):
+        from .services.tax_service import TaxService
+        
+        super().save_model(request, obj, form, change)
+        if change:
+            TaxService.update_tax_rate(obj)
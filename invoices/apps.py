@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class InvoicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'invoices' 
\ No newline at end of file
+    name = 'invoices'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,14 @@
+import django_filters
+from .models import Invoice
+
+
+class InvoiceFilter(django_filters.FilterSet):
+    """
+    Filters for invoice lists, including the with_overdue() annotations.
+    """
+    is_overdue = django_filters.BooleanFilter(field_name='is_overdue')
+    min_days_overdue = django_filters.NumberFilter(field_name='days_overdue', lookup_expr='gte')
+
+    class Meta:
+        model = Invoice
+        fields = ['status', 'client', 'project', 'issue_date']
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from invoices.models import Invoice
+from invoices.services.invoice_service import InvoiceService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute subtotal, tax, discount and total from the line items of '
+        'invoices, repairing totals that have drifted from their items.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoice-id', type=int, action='append', dest='invoice_ids',
+                            help='only this invoice (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='report changes without writing')
+
+    def handle(self, *args, **options):
+        queryset = None
+        if options['invoice_ids']:
+            queryset = Invoice.objects.filter(pk__in=options['invoice_ids'])
+
+        report = InvoiceService.recalculate_totals(
+            queryset=queryset,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+
+        action = 'Would change' if options['dry_run'] else 'Changed'
+        self.stdout.write(f"Checked {report['checked']} invoices. {action} totals of {len(report['changed'])}")
+        if options['verbosity'] > 1:
+            for invoice_number in report['changed']:
+                self.stdout.write(f'  {invoice_number}')
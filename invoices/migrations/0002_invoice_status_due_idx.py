@@ -0,0 +1,21 @@
+# Generated by Django 5.0.2 on 2026-10-19 07:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_initial'),
+        ('invoices', '0001_initial'),
+        ('projects', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+        ),
+    ]
@@ -1,11 +1,91 @@
+from decimal import Decimal
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from core.functions import DateDiff
 from core.models import BaseModel, User
 from clients.models import Client
 from projects.models import Project
 
 
+class InvoiceQuerySet(models.QuerySet):
+    """
+    QuerySet for invoices with database-computed overdue information.
+    """
+    
+    def with_overdue(self):
+        """Annotate is_overdue and days_overdue computed in SQL."""
+        if 'is_overdue' in self.query.annotations:
+            return self
+        
+        today = timezone.now().date()
+        overdue = models.Q(status='overdue') | models.Q(status='sent', due_date__lt=today)
+        return self.annotate(
+            is_overdue=models.Case(
+                models.When(overdue, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField()
+            ),
+            days_overdue=models.Case(
+                models.When(overdue, then=DateDiff(models.Value(today), models.F('due_date'))),
+                default=models.Value(0),
+                output_field=models.IntegerField()
+            ),
+        )
+    
+    def overdue(self):
+        """
+        Filter to invoices in the overdue status, which is maintained
+        nightly by the mark_overdue_invoices task.
+        """
+        return self.filter(status='overdue')
+    
+    def recalculate_totals(self):
+        """
+        Recompute the tax lines, subtotal, tax, discount and total of every
+        invoice in the queryset from its line items.
+        
+        Tax lines are aggregated in one query and replaced in bulk; the
+        invoices are then updated with a single UPDATE. Invoices without
+        items get a zero subtotal, and invoices without tax lines are
+        taxed at their flat tax_rate. Returns the number of invoices updated.
+        """
+        invoice_ids = list(self.values_list('pk', flat=True))
+        InvoiceTax.objects.filter(invoice_id__in=invoice_ids).delete()
+        InvoiceTax.objects.bulk_create(InvoiceTax.from_item_taxes(invoice_ids))
+        
+        subtotal = Coalesce(
+            models.Subquery(
+                InvoiceItem.objects.filter(invoice=models.OuterRef('pk')).order_by().values(
+                    'invoice'
+                ).annotate(total=models.Sum('total')).values('total')
+            ),
+            models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+        # Multiplying by 0.01 rather than dividing by 100 avoids integer
+        # division on SQLite, which stores whole decimals as integers
+        percent = models.Value(Decimal('0.01'))
+        tax_amount = Coalesce(
+            models.Subquery(
+                InvoiceTax.objects.filter(invoice=models.OuterRef('pk')).order_by().values(
+                    'invoice'
+                ).annotate(total=models.Sum('amount')).values('total')
+            ),
+            subtotal * models.F('tax_rate') * percent,
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+        discount_amount = subtotal * models.F('discount_rate') * percent
+        return Invoice.objects.filter(pk__in=invoice_ids).update(
+            subtotal=subtotal,
+            tax_amount=tax_amount,
+            discount_amount=discount_amount,
+            total_amount=subtotal + tax_amount - discount_amount,
+            updated_at=timezone.now()
+        )
+
+
 class Invoice(BaseModel):
     """
     Model for storing invoice information.
@@ -48,8 +128,13 @@ class Invoice(BaseModel):
     payment_method = models.CharField(max_length=50, blank=True)
     stripe_payment_intent_id = models.CharField(max_length=255, blank=True)
     
+    objects = InvoiceQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-issue_date', '-created_at']
+        indexes = [
+            models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+        ]
     
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.client.name}"
@@ -89,8 +174,19 @@ class Invoice(BaseModel):
     
     def calculate_amounts(self):
         """Calculate invoice amounts."""
-        # Calculate tax amount
-        self.tax_amount = self.subtotal * (self.tax_rate / 100)
+        # Field defaults and serializer defaults may still be floats
+        self.subtotal = Decimal(str(self.subtotal))
+        self.tax_rate = Decimal(str(self.tax_rate))
+        self.discount_rate = Decimal(str(self.discount_rate))
+        
+        # Calculate tax amount, from the tax lines when the items are taxed
+        tax_lines_total = None
+        if self.pk:
+            tax_lines_total = self.tax_lines.aggregate(total=models.Sum('amount'))['total']
+        if tax_lines_total is not None:
+            self.tax_amount = tax_lines_total
+        else:
+            self.tax_amount = self.subtotal * (self.tax_rate / 100)
         
         # Calculate discount amount
         self.discount_amount = self.subtotal * (self.discount_rate / 100)
@@ -101,14 +197,29 @@ class Invoice(BaseModel):
     @property
     def is_overdue(self):
         """Check if invoice is overdue."""
+        if '_is_overdue' in self.__dict__:
+            return self._is_overdue
+        if self.status == 'overdue':
+            return True
         return self.status == 'sent' and self.due_date < timezone.now().date()
     
+    @is_overdue.setter
+    def is_overdue(self, value):
+        # Set by InvoiceQuerySet.with_overdue() annotations
+        self._is_overdue = value
+    
     @property
     def days_overdue(self):
         """Calculate days overdue."""
+        if '_days_overdue' in self.__dict__:
+            return self._days_overdue
         if self.is_overdue:
             return (timezone.now().date() - self.due_date).days
         return 0
+    
+    @days_overdue.setter
+    def days_overdue(self, value):
+        self._days_overdue = value
 
 
 class InvoiceItem(BaseModel):
@@ -133,4 +244,115 @@ class InvoiceItem(BaseModel):
         # Calculate total if not provided
         if not self.total:
             self.total = self.quantity * self.unit_price
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        super().save(*args, **kwargs) 
+
+
+class TaxRate(BaseModel):
+    """
+    Model for storing a user's tax rates.
+    
+    A compound tax is charged on the item amount plus the non-compound
+    taxes on the same item. Default rates are applied to invoices created
+    from time entries.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tax_rates')
+    name = models.CharField(max_length=100)
+    rate = models.DecimalField(max_digits=6, decimal_places=3, validators=[MinValueValidator(0)])
+    compound = models.BooleanField(default=False)
+    is_default = models.BooleanField(default=False)
+    
+    class Meta:
+        ordering = ['compound', 'name']
+        unique_together = ['user', 'name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.rate}%)"
+
+
+class InvoiceItemTax(BaseModel):
+    """
+    Model for storing a tax charged on an invoice line item.
+    
+    The name, rate and compound flag are copied from the tax rate, so
+    later changes to the rate only reach invoices they are applied to.
+    """
+    item = models.ForeignKey(InvoiceItem, on_delete=models.CASCADE, related_name='taxes')
+    tax_rate = models.ForeignKey(TaxRate, on_delete=models.SET_NULL, related_name='item_taxes', null=True, blank=True)
+    
+    name = models.CharField(max_length=100)
+    rate = models.DecimalField(max_digits=6, decimal_places=3)
+    compound = models.BooleanField(default=False)
+    
+    class Meta:
+        ordering = ['compound', 'name']
+        unique_together = ['item', 'name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.rate}%) on {self.item_id}"
+
+
+class InvoiceTax(BaseModel):
+    """
+    Model for storing an invoice's tax lines, aggregated from the taxes on
+    its items by InvoiceQuerySet.recalculate_totals().
+    """
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='tax_lines')
+    
+    name = models.CharField(max_length=100)
+    rate = models.DecimalField(max_digits=6, decimal_places=3)
+    compound = models.BooleanField(default=False)
+    taxable_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    class Meta:
+        ordering = ['compound', 'name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.rate}%) - ${self.amount}"
+    
+    @classmethod
+    def from_item_taxes(cls, invoice_ids):
+        """
+        Build unsaved tax lines for the given invoices with one aggregate
+        query over their item taxes, grouped by invoice, name and rate.
+        
+        The taxable amount of a compound tax includes the non-compound
+        taxes charged on the same items.
+        """
+        percent = models.Value(Decimal('0.01'))
+        non_compound_rate = Coalesce(
+            models.Subquery(
+                InvoiceItemTax.objects.filter(item=models.OuterRef('item'), compound=False).order_by().values(
+                    'item'
+                ).annotate(total=models.Sum('rate')).values('total')
+            ),
+            models.Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=8, decimal_places=3)
+        )
+        rows = InvoiceItemTax.objects.filter(item__invoice_id__in=invoice_ids).order_by().values(
+            'item__invoice', 'name', 'rate', 'compound'
+        ).annotate(
+            taxable_amount=models.Sum(
+                models.Case(
+                    models.When(
+                        compound=True,
+                        then=models.F('item__total') * (models.Value(Decimal('1')) + non_compound_rate * percent)
+                    ),
+                    default=models.F('item__total'),
+                    output_field=models.DecimalField(max_digits=14, decimal_places=4)
+                )
+            )
+        )
+        
+        tax_lines = []
+        for row in rows:
+            taxable_amount = Decimal(row['taxable_amount']).quantize(Decimal('0.01'))
+            tax_lines.append(cls(
+                invoice_id=row['item__invoice'],
+                name=row['name'],
+                rate=row['rate'],
+                compound=row['compound'],
+                taxable_amount=taxable_amount,
+                amount=(taxable_amount * row['rate'] / 100).quantize(Decimal('0.01'))
+            ))
+        return tax_lines
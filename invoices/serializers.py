@@ -1,19 +1,66 @@
 from rest_framework import serializers
-from .models import Invoice, InvoiceItem
+from core.fastpath import ValuesSerializer
+from core.fx import convert
+from core.models import ExchangeRate
+from .models import Invoice, InvoiceItem, InvoiceItemTax, InvoiceTax, TaxRate
 from clients.serializers import ClientSerializer
 from projects.serializers import ProjectListSerializer
 
 
+class InvoiceItemTaxSerializer(serializers.ModelSerializer):
+    """
+    Serializer for taxes charged on an invoice item.
+    """
+    class Meta:
+        model = InvoiceItemTax
+        fields = ('id', 'tax_rate', 'name', 'rate', 'compound')
+
+
 class InvoiceItemSerializer(serializers.ModelSerializer):
     """
     Serializer for InvoiceItem model.
     """
+    taxes = InvoiceItemTaxSerializer(many=True, read_only=True)
+    
     class Meta:
         model = InvoiceItem
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
 
+class InvoiceTaxSerializer(serializers.ModelSerializer):
+    """
+    Serializer for invoice tax lines.
+    """
+    class Meta:
+        model = InvoiceTax
+        fields = ('name', 'rate', 'compound', 'taxable_amount', 'amount')
+
+
+class TaxRateSerializer(serializers.ModelSerializer):
+    """
+    Serializer for TaxRate model.
+    """
+    user = serializers.ReadOnlyField(source='user.email')
+    
+    class Meta:
+        model = TaxRate
+        fields = '__all__'
+        read_only_fields = ('user', 'created_at', 'updated_at')
+    
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
+    
+    def validate_name(self, value):
+        tax_rates = TaxRate.objects.filter(user=self.context['request'].user, name=value)
+        if self.instance:
+            tax_rates = tax_rates.exclude(pk=self.instance.pk)
+        if tax_rates.exists():
+            raise serializers.ValidationError("You already have a tax rate with this name.")
+        return value
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     """
     Serializer for Invoice model.
@@ -24,12 +71,23 @@ class InvoiceSerializer(serializers.ModelSerializer):
     items = InvoiceItemSerializer(many=True, read_only=True)
     is_overdue = serializers.ReadOnlyField()
     days_overdue = serializers.ReadOnlyField()
+    base_currency_total = serializers.SerializerMethodField()
     
     class Meta:
         model = Invoice
         fields = '__all__'
         read_only_fields = ('user', 'created_at', 'updated_at', 'invoice_number', 'is_overdue', 'days_overdue')
     
+    def get_base_currency_total(self, obj):
+        """
+        Total in the user's base currency at the issue date rate, or None
+        when no rate is loaded.
+        """
+        try:
+            return convert(obj.total_amount, obj.client.currency, obj.user.base_currency, obj.issue_date)
+        except ExchangeRate.DoesNotExist:
+            return None
+    
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
@@ -61,6 +119,16 @@ class InvoiceListSerializer(serializers.ModelSerializer):
                  'due_date', 'total_amount', 'status', 'is_overdue', 'days_overdue', 'created_at')
 
 
+class InvoiceListValuesSerializer(ValuesSerializer):
+    """
+    Fast path for InvoiceListSerializer rendering rows from values().
+    """
+    serializer_class = InvoiceListSerializer
+    
+    def get_queryset(self, queryset):
+        return super().get_queryset(queryset.with_overdue())
+
+
 class InvoiceDetailSerializer(serializers.ModelSerializer):
     """
     Serializer for detailed invoice view with all related information.
@@ -68,6 +136,7 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
     client = ClientSerializer(read_only=True)
     project = ProjectListSerializer(read_only=True)
     items = InvoiceItemSerializer(many=True, read_only=True)
+    tax_lines = InvoiceTaxSerializer(many=True, read_only=True)
     is_overdue = serializers.ReadOnlyField()
     days_overdue = serializers.ReadOnlyField()
     
@@ -91,6 +160,8 @@ class InvoiceCreateFromTimeEntriesSerializer(serializers.Serializer):
     discount_rate = serializers.DecimalField(max_digits=5, decimal_places=2, default=0.00)
     notes = serializers.CharField(required=False, allow_blank=True)
     terms_conditions = serializers.CharField(required=False, allow_blank=True)
+    line_items = serializers.ChoiceField(choices=['project', 'entry'], required=False)
+    tax_rates = serializers.PrimaryKeyRelatedField(queryset=[], many=True, required=False)
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -101,6 +172,7 @@ class InvoiceCreateFromTimeEntriesSerializer(serializers.Serializer):
             from projects.models import Project
             self.fields['client'].queryset = Client.objects.filter(user=user)
             self.fields['project'].queryset = Project.objects.filter(user=user)
+            self.fields['tax_rates'].child_relation.queryset = TaxRate.objects.filter(user=user)
     
     def validate(self, attrs):
         if attrs['start_date'] > attrs['end_date']:
@@ -108,6 +180,20 @@ class InvoiceCreateFromTimeEntriesSerializer(serializers.Serializer):
         return attrs
 
 
+class InvoiceItemTaxesSerializer(serializers.Serializer):
+    """
+    Serializer for setting the taxes on an invoice's items.
+    """
+    tax_rates = serializers.PrimaryKeyRelatedField(queryset=[], many=True)
+    items = serializers.ListField(child=serializers.IntegerField(), required=False)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'context' in kwargs and 'request' in kwargs['context']:
+            user = kwargs['context']['request'].user
+            self.fields['tax_rates'].child_relation.queryset = TaxRate.objects.filter(user=user)
+
+
 class InvoiceSendSerializer(serializers.Serializer):
     """
     Serializer for sending invoices via email.
@@ -115,4 +201,43 @@ class InvoiceSendSerializer(serializers.Serializer):
     email_subject = serializers.CharField(max_length=255, required=False)
     email_message = serializers.CharField(required=False, allow_blank=True)
     send_to_client = serializers.BooleanField(default=True)
-    send_copy_to_user = serializers.BooleanField(default=False) 
\ No newline at end of file
+    send_copy_to_user = serializers.BooleanField(default=False)
+
+
+class InvoiceBulkStatusOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one group of invoices moved to the same status.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=Invoice.STATUS_CHOICES)
+    payment_method = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    paid_date = serializers.DateField(required=False)
+
+
+class InvoiceBulkStatusSerializer(serializers.Serializer):
+    """
+    Serializer for bulk invoice status changes.
+    """
+    operations = InvoiceBulkStatusOperationSerializer(many=True, allow_empty=False)
+    
+    def validate_operations(self, value):
+        invoice_ids = [pk for operation in value for pk in operation['ids']]
+        if len(invoice_ids) > 5000:
+            raise serializers.ValidationError("At most 5000 invoices can be updated at once.")
+        if len(invoice_ids) != len(set(invoice_ids)):
+            raise serializers.ValidationError("Each invoice can only appear once.")
+        return value
+
+
+class BankStatementImportSerializer(serializers.Serializer):
+    """
+    Serializer for importing bank statements.
+    """
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=[('csv', 'CSV'), ('ofx', 'OFX')], required=False)
+    dry_run = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        if 'format' not in attrs:
+            attrs['format'] = 'ofx' if attrs['file'].name.lower().endswith(('.ofx', '.qfx')) else 'csv'
+        return attrs
@@ -0,0 +1,242 @@
+import codecs
+import csv
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from ..models import Invoice
+from .invoice_service import InvoiceService
+
+# Invoices a bank transfer can pay
+OPEN_STATUSES = ('sent', 'overdue')
+
+# Accepted CSV column names, compared case-insensitively
+CSV_COLUMNS = {
+    'date': ('date', 'booking date', 'transaction date', 'value date', 'posted'),
+    'amount': ('amount', 'credit', 'value'),
+    'reference': ('reference', 'description', 'memo', 'details', 'remittance information'),
+    'payer': ('payer', 'name', 'counterparty', 'from'),
+    'transaction_id': ('id', 'transaction id', 'fitid'),
+}
+
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+REFERENCE_TOKEN = re.compile(r'[A-Za-z0-9][A-Za-z0-9/_-]*')
+
+
+@dataclass
+class StatementLine:
+    """
+    A transaction read from a bank statement.
+    """
+    line: int
+    date: object
+    amount: object
+    reference: str = ''
+    payer: str = ''
+    transaction_id: str = ''
+    error: str = ''
+
+
+def normalize_reference(value):
+    """Uppercase and strip separators, so INV-2025-0001 matches inv20250001."""
+    return re.sub(r'[^A-Z0-9]', '', value.upper())
+
+
+def parse_amount(value):
+    """
+    Parse 1,234.56 and 1.234,56 alike: the last separator is the decimal
+    point, unless only one kind is used and it either repeats or is
+    followed by exactly three digits (1,500 or 1.000.000).
+    """
+    value = re.sub(r'[^\d,.\-]', '', value or '')
+    separators = [char for char in value if char in ',.']
+    if separators:
+        decimal_point = separators[-1]
+        integer, _, fraction = value.rpartition(decimal_point)
+        if len(set(separators)) == 1 and (len(separators) > 1 or len(fraction) == 3):
+            value = integer.replace(decimal_point, '') + fraction
+        else:
+            value = re.sub(r'[,.]', '', integer) + '.' + fraction
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for date_format in ('%Y-%m-%d', '%Y%m%d', '%d/%m/%Y', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value}")
+
+
+def _statement_line(number, date, amount, **fields):
+    try:
+        return StatementLine(number, parse_date(date), parse_amount(amount), **fields)
+    except (ValueError, InvalidOperation) as e:
+        return StatementLine(number, None, None, error=str(e) or 'Invalid amount', **fields)
+
+
+def parse_csv(lines):
+    """
+    Yield StatementLines from CSV text lines with a header row.
+    """
+    reader = csv.reader(lines)
+    header = [column.strip().lower() for column in next(reader, [])]
+    columns = {
+        field: next((header.index(name) for name in names if name in header), None)
+        for field, names in CSV_COLUMNS.items()
+    }
+    if columns['date'] is None or columns['amount'] is None:
+        raise ValueError("CSV statements need date and amount columns.")
+
+    for number, row in enumerate(reader, start=2):
+        if not any(row):
+            continue
+        values = {
+            field: row[index].strip() if index is not None and index < len(row) else ''
+            for field, index in columns.items()
+        }
+        yield _statement_line(
+            number,
+            values['date'],
+            values['amount'],
+            reference=values['reference'],
+            payer=values['payer'],
+            transaction_id=values['transaction_id']
+        )
+
+
+def parse_ofx(lines):
+    """
+    Yield StatementLines from the STMTTRN blocks of an OFX (SGML or XML)
+    statement, one line at a time.
+    """
+    transaction = None
+    number = 0
+    for number, text in enumerate(lines, start=1):
+        upper = text.upper()
+        if '<STMTTRN>' in upper:
+            transaction = {'line': number}
+        if transaction is not None:
+            for tag, value in OFX_FIELD.findall(text):
+                transaction.setdefault(tag.upper(), value.strip())
+        if '</STMTTRN>' in upper and transaction is not None:
+            yield _statement_line(
+                transaction['line'],
+                transaction.get('DTPOSTED', '')[:8],  # YYYYMMDD[HHMMSS[.XXX][TZ]]
+                transaction.get('TRNAMT', ''),
+                reference=' '.join(filter(None, [transaction.get('MEMO', ''), transaction.get('CHECKNUM', '')])),
+                payer=transaction.get('NAME', ''),
+                transaction_id=transaction.get('FITID', '')
+            )
+            transaction = None
+
+
+class BankStatementService:
+    """
+    Service for matching bank statement transactions to open invoices.
+    """
+
+    @staticmethod
+    def import_statement(user, file, file_format, dry_run=False):
+        """
+        Match a CSV or OFX statement against the user's open invoices and
+        mark matched invoices paid.
+
+        The file is read line by line. Open invoices are loaded with one
+        query into in-memory indexes by invoice number and by amount. A
+        credit matches when it references an invoice number and pays its
+        total, or, without a number, when it pays the total of exactly one
+        open invoice whose client name appears in the payer or reference.
+        Each invoice is matched at most once. Matches are marked paid on
+        the statement date through InvoiceService.bulk_update_status,
+        unless dry_run is set.
+
+        Returns the match plan, one entry per statement line, and counts
+        per result.
+        """
+        by_number = {}
+        by_amount = {}
+        for invoice in Invoice.objects.filter(user=user, status__in=OPEN_STATUSES).values(
+            'id', 'invoice_number', 'total_amount', 'client__name', 'client__company_name'
+        ):
+            invoice['client_names'] = [
+                name.lower() for name in (invoice['client__name'], invoice['client__company_name']) if name
+            ]
+            by_number[normalize_reference(invoice['invoice_number'])] = invoice
+            by_amount.setdefault(invoice['total_amount'], []).append(invoice)
+
+        lines = codecs.iterdecode(file, 'utf-8-sig')
+        statement = parse_ofx(lines) if file_format == 'ofx' else parse_csv(lines)
+
+        plan = []
+        matched = {}
+        for statement_line in statement:
+            entry, invoice = BankStatementService._match(statement_line, by_number, by_amount, matched)
+            if invoice:
+                matched[invoice['id']] = statement_line.date
+                entry.update(invoice_id=invoice['id'], invoice_number=invoice['invoice_number'])
+            plan.append(entry)
+
+        if matched and not dry_run:
+            paid_dates = {}
+            for invoice_id, paid_date in matched.items():
+                paid_dates.setdefault(paid_date, []).append(invoice_id)
+            InvoiceService.bulk_update_status(user, [
+                {'ids': invoice_ids, 'status': 'paid', 'payment_method': 'bank_transfer', 'paid_date': paid_date}
+                for paid_date, invoice_ids in paid_dates.items()
+            ])
+
+        summary = {}
+        for entry in plan:
+            summary[entry['result']] = summary.get(entry['result'], 0) + 1
+
+        return {'dry_run': dry_run, 'summary': summary, 'lines': plan}
+
+    @staticmethod
+    def _match(statement_line, by_number, by_amount, matched):
+        """
+        Return the plan entry for one statement line and the invoice it
+        pays, if any.
+        """
+        entry = {
+            'line': statement_line.line,
+            'date': statement_line.date,
+            'amount': statement_line.amount,
+            'reference': statement_line.reference,
+            'payer': statement_line.payer,
+            'transaction_id': statement_line.transaction_id,
+        }
+        if statement_line.error:
+            entry.update(result='invalid', error=statement_line.error)
+            return entry, None
+        if statement_line.amount <= 0:
+            entry['result'] = 'skipped'
+            return entry, None
+
+        for token in REFERENCE_TOKEN.findall(statement_line.reference):
+            invoice = by_number.get(normalize_reference(token))
+            if invoice is None:
+                continue
+            if invoice['id'] in matched:
+                entry['result'] = 'already_matched'
+                return entry, None
+            if invoice['total_amount'] != statement_line.amount:
+                entry.update(result='amount_mismatch', invoice_id=invoice['id'],
+                             invoice_number=invoice['invoice_number'], expected_amount=invoice['total_amount'])
+                return entry, None
+            entry.update(result='matched', matched_by='invoice_number')
+            return entry, invoice
+
+        text = f"{statement_line.payer} {statement_line.reference}".lower()
+        candidates = [
+            invoice for invoice in by_amount.get(statement_line.amount, [])
+            if invoice['id'] not in matched and any(name in text for name in invoice['client_names'])
+        ]
+        if len(candidates) == 1:
+            entry.update(result='matched', matched_by='amount_and_client')
+            return entry, candidates[0]
+
+        entry['result'] = 'ambiguous' if candidates else 'unmatched'
+        return entry, None
@@ -2,9 +2,12 @@ from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .pdf_generator import InvoicePDFGenerator
-from ..models import Invoice, InvoiceItem
+from ..models import Invoice, InvoiceItem, TaxRate
+from ..signals import invoice_status_changed
 from time_entries.models import TimeEntry
 from django.db import models
+from core.fx import convert_expression
+from core.metrics import emails_sent
 
 
 class InvoiceService:
@@ -15,17 +18,27 @@ class InvoiceService:
     @staticmethod
     def create_invoice_from_time_entries(user, data):
         """
-        Create an invoice from time entries within a date range.
+        Create an invoice from the unbilled time entries within a date range.
+        
+        ``line_items`` in ``data`` selects one item per project (the
+        default) or one item per time entry ('entry'); it falls back to the
+        client's invoice_line_items setting. Billed entries are stamped
+        with the invoice and the item that billed them in a single UPDATE,
+        so they are not billed again. Items are taxed at ``tax_rates``, or
+        the user's default tax rates when it is not given.
         """
         with transaction.atomic():
             # Get time entries for the specified date range and client
-            time_entries = TimeEntry.objects.filter(
+            # Locking the unbilled entries keeps concurrent runs from billing them twice
+            time_entries = TimeEntry.objects.unbilled().filter(
                 user=user,
-                client=data['client'],
+                project__client=data['client'],
                 date__gte=data['start_date'],
-                date__lte=data['end_date'],
-                is_billable=True
-            ).select_related('project')
+                date__lte=data['end_date']
+            ).select_related('project').select_for_update(of=('self',))
+            
+            if data.get('project'):
+                time_entries = time_entries.filter(project=data['project'])
             
             if not time_entries.exists():
                 raise ValueError("No billable time entries found for the specified date range.")
@@ -44,47 +57,18 @@ class InvoiceService:
             }
             
             invoice = Invoice.objects.create(**invoice_data)
+            line_items = data.get('line_items') or data['client'].invoice_line_items
             
-            # Group time entries by project and create invoice items
-            project_entries = {}
-            for entry in time_entries:
-                project_key = entry.project.id if entry.project else 'no_project'
-                if project_key not in project_entries:
-                    project_entries[project_key] = {
-                        'project': entry.project,
-                        'entries': [],
-                        'total_hours': 0,
-                        'total_amount': 0
-                    }
-                
-                project_entries[project_key]['entries'].append(entry)
-                project_entries[project_key]['total_hours'] += entry.hours
-                project_entries[project_key]['total_amount'] += entry.total_amount
-            
-            # Create invoice items
-            subtotal = 0
-            for project_data in project_entries.values():
-                project = project_data['project']
-                total_hours = project_data['total_hours']
-                total_amount = project_data['total_amount']
-                
-                # Create description from time entries
-                descriptions = []
-                for entry in project_data['entries']:
-                    descriptions.append(f"{entry.date}: {entry.description}")
-                
-                description = f"Time tracking for {project.name if project else 'General Work'}\n" + "\n".join(descriptions)
-                
-                # Create invoice item
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    description=description,
-                    quantity=total_hours,
-                    unit_price=total_amount / total_hours if total_hours > 0 else 0,
-                    total=total_amount
-                )
-                
-                subtotal += total_amount
+            if line_items == 'entry':
+                subtotal = InvoiceService._create_entry_items(invoice, time_entries)
+            else:
+                subtotal = InvoiceService._create_project_items(invoice, time_entries)
+            
+            # Tax the items at the requested rates, or the user's default rates
+            tax_rates = data['tax_rates'] if 'tax_rates' in data else TaxRate.objects.filter(user=user, is_default=True)
+            if tax_rates:
+                from .tax_service import TaxService
+                TaxService.apply_tax_rates(invoice.items.all(), tax_rates)
             
             # Update invoice subtotal
             invoice.subtotal = subtotal
@@ -92,6 +76,147 @@ class InvoiceService:
             
             return invoice
     
+    @staticmethod
+    def _create_project_items(invoice, time_entries):
+        """
+        Bill time entries as one invoice item per project. Returns the subtotal.
+        """
+        # Group time entries by project and create invoice items
+        project_entries = {}
+        for entry in time_entries:
+            project_key = entry.project.id if entry.project else 'no_project'
+            if project_key not in project_entries:
+                project_entries[project_key] = {
+                    'project': entry.project,
+                    'entries': [],
+                    'total_hours': 0,
+                    'total_amount': 0
+                }
+            
+            project_entries[project_key]['entries'].append(entry)
+            project_entries[project_key]['total_hours'] += entry.hours
+            project_entries[project_key]['total_amount'] += entry.total_amount
+        
+        # Create invoice items
+        subtotal = 0
+        items = {}
+        for project_key, project_data in project_entries.items():
+            project = project_data['project']
+            total_hours = project_data['total_hours']
+            total_amount = project_data['total_amount']
+            
+            # Create description from time entries
+            descriptions = []
+            for entry in project_data['entries']:
+                descriptions.append(f"{entry.date}: {entry.description}")
+            
+            description = f"Time tracking for {project.name if project else 'General Work'}\n" + "\n".join(descriptions)
+            
+            # Create invoice item
+            items[project_key] = InvoiceItem(
+                invoice=invoice,
+                description=description,
+                quantity=total_hours,
+                unit_price=total_amount / total_hours if total_hours > 0 else 0,
+                total=total_amount
+            )
+            
+            subtotal += total_amount
+        
+        InvoiceItem.objects.bulk_create(items.values())
+        
+        # Mark the time entries as billed
+        TimeEntry.objects.filter(
+            pk__in=[entry.pk for project_data in project_entries.values() for entry in project_data['entries']]
+        ).update(
+            invoice=invoice,
+            invoice_item=models.Case(
+                *[models.When(project_id=project_key, then=models.Value(item.pk)) for project_key, item in items.items()]
+            ),
+            updated_at=timezone.now()
+        )
+        
+        return subtotal
+    
+    @staticmethod
+    def _create_entry_items(invoice, time_entries):
+        """
+        Bill time entries as one invoice item each, in date order.
+        
+        Items are inserted with bulk_create in batches and the entries are
+        stamped with one UPDATE that looks up their item by time_entry, so
+        thousands of entries take a handful of queries. Returns the
+        subtotal.
+        """
+        items = [
+            InvoiceItem(
+                invoice=invoice,
+                time_entry_id=entry_id,
+                description=f"{project_name} - {date}: {description}",
+                quantity=hours,
+                unit_price=hourly_rate,
+                total=hours * hourly_rate
+            )
+            for entry_id, project_name, date, description, hours, hourly_rate in time_entries.order_by(
+                'date', 'pk'
+            ).values_list('pk', 'project__name', 'date', 'description', 'hours', 'hourly_rate')
+        ]
+        InvoiceItem.objects.bulk_create(items, batch_size=500)
+        
+        # Mark the time entries as billed
+        invoice_items = InvoiceItem.objects.filter(invoice=invoice)
+        TimeEntry.objects.filter(pk__in=invoice_items.values('time_entry')).update(
+            invoice=invoice,
+            invoice_item=models.Subquery(
+                invoice_items.filter(time_entry=models.OuterRef('pk')).values('pk')[:1]
+            ),
+            updated_at=timezone.now()
+        )
+        
+        return sum((item.total for item in items), 0)
+    
+    @staticmethod
+    def recalculate_totals(queryset=None, batch_size=1000, dry_run=False):
+        """
+        Recompute the stored totals of invoices that have line items.
+        
+        Pages through ``queryset`` (by default every invoice) by primary
+        key, recalculating each page with one aggregate UPDATE. Invoices
+        without items keep their entered subtotal. With dry_run every page
+        is rolled back.
+        
+        Returns the number of invoices checked and the invoice numbers
+        whose totals changed.
+        """
+        if queryset is None:
+            queryset = Invoice.objects.all()
+        queryset = queryset.filter(
+            models.Exists(InvoiceItem.objects.filter(invoice=models.OuterRef('pk')))
+        ).order_by('pk')
+        totals = ('invoice_number', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount')
+        report = {'checked': 0, 'changed': []}
+        
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                page = Invoice.objects.filter(
+                    pk__in=list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+                ).order_by('pk')
+                before = list(page.values_list('pk', *totals))
+                if not before:
+                    break
+                
+                page.recalculate_totals()
+                after = set(page.values_list('pk', *totals))
+                report['checked'] += len(before)
+                report['changed'].extend(row[1] for row in before if row not in after)
+                last_pk = before[-1][0]
+                
+                if dry_run:
+                    transaction.set_rollback(True)
+        
+        return report
+    
     @staticmethod
     def generate_pdf(invoice):
         """
@@ -137,6 +262,7 @@ class InvoiceService:
             )
             email.attach_file(invoice.pdf_file.path)
             email.send()
+            emails_sent.inc(recipient='client')
         
         # Send copy to user
         if data.get('send_copy_to_user', False):
@@ -148,9 +274,11 @@ class InvoiceService:
             )
             email.attach_file(invoice.pdf_file.path)
             email.send()
+            emails_sent.inc(recipient='user')
         
-        # Update invoice status
-        invoice.status = 'sent'
+        # Update invoice status (reminders keep overdue invoices overdue)
+        if invoice.status != 'overdue':
+            invoice.status = 'sent'
         invoice.save()
         
         return True
@@ -168,21 +296,184 @@ class InvoiceService:
         
         return invoice
     
+    @staticmethod
+    def mark_invoices_paid(payments, payment_method=''):
+        """
+        Mark invoices paid in a single UPDATE.
+        
+        ``payments`` maps invoice ids to the Stripe payment intent id that
+        paid them (or ''). Invoices that are already paid are left as they
+        are. Returns the number marked paid.
+        """
+        if not payments:
+            return 0
+        
+        with transaction.atomic():
+            old_statuses = dict(
+                Invoice.objects.select_for_update().filter(pk__in=payments).exclude(
+                    status='paid'
+                ).order_by().values_list('pk', 'status')
+            )
+            if old_statuses:
+                InvoiceService._apply_status(
+                    old_statuses,
+                    'paid',
+                    paid_date=timezone.now().date(),
+                    payment_method=payment_method,
+                    stripe_payment_intent_id=models.Case(
+                        *[models.When(pk=pk, then=models.Value(payments[pk])) for pk in old_statuses],
+                        output_field=models.CharField()
+                    )
+                )
+        
+        return len(old_statuses)
+    
+    @staticmethod
+    def bulk_update_status(user, operations):
+        """
+        Change the status of many invoices.
+        
+        ``operations`` is a list of dicts with ``ids`` and ``status``, plus
+        optional ``payment_method`` and ``paid_date`` when marking paid.
+        Ownership is checked with one query and each operation is a single
+        UPDATE, all in one transaction. Invoices moved away from paid have
+        their paid date, payment method and payment intent cleared.
+        Returns one result per requested id: updated, unchanged (already
+        in that status) or not_found.
+        """
+        invoice_ids = [pk for operation in operations for pk in operation['ids']]
+        results = []
+        
+        with transaction.atomic():
+            current = dict(
+                Invoice.objects.select_for_update().filter(
+                    user=user, pk__in=invoice_ids
+                ).order_by().values_list('pk', 'status')
+            )
+            
+            for operation in operations:
+                new_status = operation['status']
+                changing = {}
+                for pk in operation['ids']:
+                    old_status = current.get(pk)
+                    if old_status is None:
+                        results.append({'id': pk, 'result': 'not_found'})
+                    elif old_status == new_status:
+                        results.append({'id': pk, 'result': 'unchanged', 'status': old_status})
+                    else:
+                        changing[pk] = old_status
+                        results.append({'id': pk, 'result': 'updated', 'old_status': old_status, 'status': new_status})
+                
+                if not changing:
+                    continue
+                fields = {}
+                if new_status == 'paid':
+                    fields['paid_date'] = operation.get('paid_date') or timezone.now().date()
+                    fields['payment_method'] = operation.get('payment_method', '')
+                elif 'paid' in changing.values():
+                    # Invoices leaving paid drop their payment details; which
+                    # ones were paid is known from the locked rows
+                    was_paid = models.Q(pk__in=[pk for pk, old_status in changing.items() if old_status == 'paid'])
+                    fields = {
+                        'paid_date': models.Case(
+                            models.When(was_paid, then=models.Value(None)), default=models.F('paid_date')
+                        ),
+                        'payment_method': models.Case(
+                            models.When(was_paid, then=models.Value('')), default=models.F('payment_method')
+                        ),
+                        'stripe_payment_intent_id': models.Case(
+                            models.When(was_paid, then=models.Value('')), default=models.F('stripe_payment_intent_id')
+                        ),
+                    }
+                InvoiceService._apply_status(changing, new_status, **fields)
+        
+        return results
+    
+    @staticmethod
+    def _apply_status(old_statuses, new_status, **fields):
+        """
+        Move the invoices in ``old_statuses`` (id to current status) to
+        ``new_status`` with one UPDATE, setting any extra ``fields``.
+        invoice_status_changed is sent for each once the transaction commits.
+        """
+        Invoice.objects.filter(pk__in=old_statuses).update(
+            status=new_status,
+            updated_at=timezone.now(),
+            **fields
+        )
+        
+        def send_signals():
+            for invoice_id, old_status in old_statuses.items():
+                invoice_status_changed.send(
+                    sender=Invoice,
+                    invoice_id=invoice_id,
+                    old_status=old_status,
+                    new_status=new_status
+                )
+        transaction.on_commit(send_signals)
+    
+    @staticmethod
+    def release_time_entries(invoice_ids):
+        """
+        Return the time entries billed on the given invoices to the
+        unbilled pool with one UPDATE. Returns the number released.
+        """
+        return TimeEntry.objects.filter(invoice_id__in=invoice_ids).update(
+            invoice=None,
+            invoice_item=None,
+            updated_at=timezone.now()
+        )
+    
+    @staticmethod
+    def mark_overdue_invoices(batch_size=500):
+        """
+        Move sent invoices past their due date to the overdue status.
+        
+        Each batch is a single UPDATE; invoice_status_changed is sent for
+        every transitioned invoice once its batch has committed.
+        """
+        today = timezone.now().date()
+        pending = Invoice.objects.filter(status='sent', due_date__lt=today).order_by('pk')
+        marked = 0
+        
+        while True:
+            with transaction.atomic():
+                invoice_ids = list(
+                    pending.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size]
+                )
+                if invoice_ids:
+                    Invoice.objects.filter(pk__in=invoice_ids).update(
+                        status='overdue',
+                        updated_at=timezone.now()
+                    )
+            
+            if not invoice_ids:
+                break
+            
+            for invoice_id in invoice_ids:
+                invoice_status_changed.send(
+                    sender=Invoice,
+                    invoice_id=invoice_id,
+                    old_status='sent',
+                    new_status='overdue'
+                )
+            marked += len(invoice_ids)
+        
+        return marked
+    
     @staticmethod
     def get_overdue_invoices(user):
         """
         Get all overdue invoices for a user.
         """
-        return Invoice.objects.filter(
-            user=user,
-            status='sent',
-            due_date__lt=timezone.now().date()
-        ).select_related('client', 'project')
+        return Invoice.objects.filter(user=user).overdue().select_related('client', 'project')
     
     @staticmethod
     def get_invoice_summary(user, period='month'):
         """
-        Get invoice summary statistics for a user.
+        Get invoice summary statistics for a user, in the user's base
+        currency. All figures come from one aggregate query that converts
+        each invoice at the rate for its issue date.
         """
         today = timezone.now().date()
         
@@ -195,22 +486,35 @@ class InvoiceService:
         else:
             start_date = today - timedelta(days=30)
         
-        invoices = Invoice.objects.filter(
-            user=user,
-            issue_date__gte=start_date,
-            issue_date__lte=today
-        )
+        base_currency = user.base_currency
+        in_period = models.Q(issue_date__gte=start_date, issue_date__lte=today)
+        overdue = models.Q(status='overdue')
         
-        total_invoices = invoices.count()
-        total_amount = invoices.aggregate(total=models.Sum('total_amount'))['total'] or 0
-        paid_amount = invoices.filter(status='paid').aggregate(total=models.Sum('total_amount'))['total'] or 0
-        overdue_amount = InvoiceService.get_overdue_invoices(user).aggregate(total=models.Sum('total_amount'))['total'] or 0
+        totals = Invoice.objects.filter(user=user).filter(in_period | overdue).annotate(
+            base_total=convert_expression('total_amount', 'client__currency', 'issue_date', base_currency)
+        ).aggregate(
+            total_invoices=models.Count('id', filter=in_period),
+            total_amount=models.Sum('base_total', filter=in_period),
+            paid_amount=models.Sum('base_total', filter=in_period & models.Q(status='paid')),
+            overdue_amount=models.Sum('base_total', filter=overdue),
+            unconverted_invoices=models.Count('id', filter=in_period & models.Q(base_total__isnull=True)),
+            unconverted_overdue_invoices=models.Count('id', filter=overdue & models.Q(base_total__isnull=True))
+        )
+        total_amount = totals['total_amount'] or 0
+        paid_amount = totals['paid_amount'] or 0
+        overdue_amount = totals['overdue_amount'] or 0
         
         return {
             'period': period,
-            'total_invoices': total_invoices,
+            'currency': base_currency,
+            'total_invoices': totals['total_invoices'],
             'total_amount': float(total_amount),
             'paid_amount': float(paid_amount),
             'overdue_amount': float(overdue_amount),
+            # Invoices without an exchange rate for their issue date are
+            # left out of the amounts: those issued in the period, and the
+            # overdue ones whatever their issue date
+            'unconverted_invoices': totals['unconverted_invoices'],
+            'unconverted_overdue_invoices': totals['unconverted_overdue_invoices'],
             'outstanding_amount': float(total_amount - paid_amount)
         } 
\ No newline at end of file
@@ -1,10 +1,12 @@
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.core.files.base import ContentFile
 from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
+from core.metrics import pdf_render_duration, pdf_size
 
 
 class InvoicePDFGenerator:
@@ -12,6 +14,11 @@ class InvoicePDFGenerator:
     Service for generating PDF invoices using WeasyPrint.
     """
     
+    # Items are rendered as a series of tables of at most this many rows.
+    # WeasyPrint lays out a table again for every page it is split across,
+    # so one table with thousands of rows costs quadratic time.
+    ROWS_PER_TABLE = 100
+    
     def __init__(self, invoice):
         self.invoice = invoice
         self.font_config = FontConfiguration()
@@ -24,7 +31,10 @@ class InvoicePDFGenerator:
         html_content = self._generate_html()
         
         # Convert to PDF
+        started_at = time.perf_counter()
         pdf_content = self._convert_to_pdf(html_content)
+        pdf_render_duration.observe(time.perf_counter() - started_at)
+        pdf_size.observe(len(pdf_content))
         
         # Save to invoice model
         filename = f"invoice_{self.invoice.invoice_number}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -40,12 +50,51 @@ class InvoicePDFGenerator:
             'invoice': self.invoice,
             'user': self.invoice.user,
             'client': self.invoice.client,
-            'items': self.invoice.items.all(),
+            'item_groups': self._group_items(),
+            'tax_lines': list(self.invoice.tax_lines.all()),
             'generated_date': datetime.now().strftime('%B %d, %Y'),
         }
         
         return render_to_string('invoices/invoice_template.html', context)
     
+    def _group_items(self):
+        """
+        Split the invoice items into groups of tables for the template.
+        
+        Invoices with more items than fit in one table and one item per
+        time entry are grouped by the week of the entry, with a subtotal
+        per week. Every group is split into tables of ROWS_PER_TABLE rows.
+        """
+        items = list(
+            self.invoice.items.select_related('time_entry').only(
+                'invoice', 'description', 'quantity', 'unit_price', 'total', 'time_entry__date'
+            ).order_by('created_at', 'pk')
+        )
+        
+        if len(items) > self.ROWS_PER_TABLE and all(item.time_entry for item in items):
+            weeks = {}
+            for item in items:
+                entry_date = item.time_entry.date
+                weeks.setdefault(entry_date - timedelta(days=entry_date.weekday()), []).append(item)
+            groups = [
+                {
+                    'label': f"Week of {week:%B %d, %Y}",
+                    'items': week_items,
+                    'quantity': sum(item.quantity for item in week_items),
+                    'total': sum(item.total for item in week_items),
+                }
+                for week, week_items in sorted(weeks.items())
+            ]
+        else:
+            groups = [{'label': '', 'items': items}]
+        
+        for group in groups:
+            group['tables'] = [
+                group['items'][start:start + self.ROWS_PER_TABLE]
+                for start in range(0, len(group['items']), self.ROWS_PER_TABLE)
+            ] or [[]]
+        return groups
+    
     def _convert_to_pdf(self, html_content):
         """
         Convert HTML content to PDF using WeasyPrint.
@@ -160,7 +209,6 @@ class InvoicePDFGenerator:
         .items-table {
             width: 100%;
             border-collapse: collapse;
-            margin-bottom: 2cm;
         }
         
         .items-table th {
@@ -195,6 +243,20 @@ class InvoicePDFGenerator:
             text-align: right;
         }
         
+        .items {
+            margin-bottom: 2cm;
+        }
+        
+        .items-group {
+            font-size: 13pt;
+            margin: 0.8cm 0 0.3cm 0;
+        }
+        
+        .items-table .subtotal-row td {
+            border-top: 1px solid #ddd;
+            font-weight: bold;
+        }
+        
         .totals {
             margin-left: auto;
             width: 300px;
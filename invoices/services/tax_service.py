@@ -0,0 +1,56 @@
+from django.db import transaction
+from ..models import Invoice, InvoiceItemTax
+from .invoice_service import InvoiceService
+
+
+class TaxService:
+    """
+    Service for applying tax rates to invoice items.
+    """
+
+    @staticmethod
+    def apply_tax_rates(items, tax_rates):
+        """
+        Replace the taxes on the ``items`` queryset with ``tax_rates`` and
+        recalculate the affected invoices.
+
+        Existing taxes are removed with one DELETE and the new ones are
+        inserted with bulk_create, so the cost does not depend on the
+        number of items. Returns the number of item taxes created.
+        """
+        item_ids = list(items.values_list('pk', flat=True))
+        with transaction.atomic():
+            InvoiceItemTax.objects.filter(item_id__in=item_ids).delete()
+            item_taxes = InvoiceItemTax.objects.bulk_create([
+                InvoiceItemTax(
+                    item_id=item_id,
+                    tax_rate=tax_rate,
+                    name=tax_rate.name,
+                    rate=tax_rate.rate,
+                    compound=tax_rate.compound
+                )
+                for item_id in item_ids for tax_rate in tax_rates
+            ])
+            Invoice.objects.filter(items__in=item_ids).distinct().recalculate_totals()
+        return len(item_taxes)
+
+    @staticmethod
+    def update_tax_rate(tax_rate, statuses=('draft',)):
+        """
+        Copy the name, rate and compound flag of ``tax_rate`` to the items
+        it taxes on invoices in ``statuses`` and recalculate those invoices.
+
+        Invoices that have been sent keep the rate they were issued with.
+        The item taxes change with one UPDATE and the invoices are
+        recalculated set-based in pages, see InvoiceService.recalculate_totals.
+        Returns its report.
+        """
+        with transaction.atomic():
+            InvoiceItemTax.objects.filter(tax_rate=tax_rate, item__invoice__status__in=statuses).update(
+                name=tax_rate.name,
+                rate=tax_rate.rate,
+                compound=tax_rate.compound
+            )
+            return InvoiceService.recalculate_totals(
+                queryset=Invoice.objects.filter(status__in=statuses, items__taxes__tax_rate=tax_rate).distinct()
+            )
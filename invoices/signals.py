@@ -0,0 +1,32 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from clients.models import Client
+from core.models import User
+from projects.models import Project
+from .models import Invoice, InvoiceItem
+
+# Sent for invoice status transitions applied in bulk, where no save() runs.
+# Arguments: invoice_id, old_status, new_status
+invoice_status_changed = Signal()
+
+
+def _deleted_with(origin, *models):
+    """Check if a cascading delete started from one of ``models``."""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model in models
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def update_invoice_totals(sender, instance, origin=None, **kwargs):
+    """
+    Keep the invoice totals in step with its line items.
+    """
+    # Items deleted along with their invoice need no update; items are
+    # only ever cascade-deleted through their invoice, which in turn
+    # cascades from its user, client and project
+    if _deleted_with(origin, Invoice, Project, Client, User):
+        return
+    Invoice.objects.filter(pk=instance.invoice_id).recalculate_totals()
+
@@ -3,6 +3,7 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import Invoice
 from .services.invoice_service import InvoiceService
+from core.metrics import recurring_invoices
 from clients.models import Client
 from projects.models import Project
 
@@ -58,9 +59,11 @@ def generate_recurring_invoices():
             
             client.save()
             
+            recurring_invoices.inc(source='client', outcome='generated')
             print(f"Generated recurring invoice {invoice.invoice_number} for client {client.name}")
             
         except Exception as e:
+            recurring_invoices.inc(source='client', outcome='error')
             print(f"Error generating recurring invoice for client {client.name}: {str(e)}")
     
     # Process project recurring invoices
@@ -108,9 +111,11 @@ def generate_recurring_invoices():
             
             project.save()
             
+            recurring_invoices.inc(source='project', outcome='generated')
             print(f"Generated recurring invoice {invoice.invoice_number} for project {project.name}")
             
         except Exception as e:
+            recurring_invoices.inc(source='project', outcome='error')
             print(f"Error generating recurring invoice for project {project.name}: {str(e)}")
 
 
@@ -119,10 +124,7 @@ def send_overdue_invoice_reminders():
     """
     Task to send reminders for overdue invoices.
     """
-    overdue_invoices = Invoice.objects.filter(
-        status='sent',
-        due_date__lt=timezone.now().date()
-    ).select_related('user', 'client')
+    overdue_invoices = Invoice.objects.overdue().select_related('user', 'client')
     
     for invoice in overdue_invoices:
         try:
@@ -142,6 +144,15 @@ def send_overdue_invoice_reminders():
             print(f"Error sending overdue reminder for invoice {invoice.invoice_number}: {str(e)}")
 
 
+@shared_task
+def mark_overdue_invoices(batch_size=500):
+    """
+    Task to move past-due sent invoices to the overdue status.
+    """
+    marked = InvoiceService.mark_overdue_invoices(batch_size=batch_size)
+    print(f"Marked {marked} invoices as overdue")
+
+
 @shared_task
 def generate_invoice_pdf(invoice_id):
     """
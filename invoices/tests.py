@@ -0,0 +1,550 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from clients.models import Client
+from projects.models import Project
+from .models import Invoice
+from .serializers import InvoiceListSerializer, InvoiceListValuesSerializer
+
+User = get_user_model()
+
+
+class InvoiceTestCase(TestCase):
+    """Base test case with a user, client, project and two invoices."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(
+            user=self.user,
+            client=self.client_obj,
+            name='Website',
+            hourly_rate=Decimal('100.00')
+        )
+        today = timezone.now().date()
+        Invoice.objects.create(
+            user=self.user,
+            client=self.client_obj,
+            project=self.project,
+            due_date=today - timedelta(days=12),
+            status='sent',
+            subtotal=Decimal('250.00'),
+            tax_rate=Decimal('10.00'),
+            discount_rate=Decimal('0.00')
+        )
+        Invoice.objects.create(
+            user=self.user,
+            client=self.client_obj,
+            due_date=today + timedelta(days=5),
+            status='draft',
+            subtotal=Decimal('99.99'),
+            tax_rate=Decimal('0.00'),
+            discount_rate=Decimal('0.00')
+        )
+
+
+class InvoiceListValuesSerializerTest(InvoiceTestCase):
+    """Test cases for the values() fast path of the invoice list."""
+
+    def test_output_matches_model_serializer(self):
+        """Test the fast path renders exactly what InvoiceListSerializer does."""
+        queryset = Invoice.objects.filter(user=self.user)
+        expected = InvoiceListSerializer(queryset.select_related('client', 'project'), many=True).data
+
+        serializer = InvoiceListValuesSerializer()
+        actual = serializer.to_representation(serializer.get_queryset(queryset))
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_overdue_fields_computed_in_sql(self):
+        """Test is_overdue and days_overdue come from the database."""
+        serializer = InvoiceListValuesSerializer()
+        rows = serializer.to_representation(
+            serializer.get_queryset(Invoice.objects.filter(status='sent'))
+        )
+        self.assertEqual(len(rows), 1)
+        self.assertTrue(rows[0]['is_overdue'])
+        self.assertEqual(rows[0]['days_overdue'], 12)
+
+
+class InvoiceQuerySetTest(InvoiceTestCase):
+    """Test cases for the overdue annotations on InvoiceQuerySet."""
+
+    def test_with_overdue_matches_properties(self):
+        """Test annotated values agree with the Python properties."""
+        for invoice in Invoice.objects.with_overdue():
+            fresh = Invoice.objects.get(pk=invoice.pk)
+            self.assertEqual(invoice.is_overdue, fresh.is_overdue)
+            self.assertEqual(invoice.days_overdue, fresh.days_overdue)
+
+    def test_mark_overdue_invoices(self):
+        """Test past-due sent invoices are moved to the overdue status."""
+        from .services.invoice_service import InvoiceService
+        from .signals import invoice_status_changed
+
+        transitions = []
+
+        def receiver(sender, invoice_id, old_status, new_status, **kwargs):
+            transitions.append((invoice_id, old_status, new_status))
+
+        invoice_status_changed.connect(receiver)
+        try:
+            self.assertEqual(InvoiceService.mark_overdue_invoices(batch_size=1), 1)
+        finally:
+            invoice_status_changed.disconnect(receiver)
+
+        overdue = Invoice.objects.overdue()
+        self.assertEqual(overdue.count(), 1)
+        self.assertEqual(transitions, [(overdue.get().pk, 'sent', 'overdue')])
+        self.assertEqual(overdue.with_overdue().get().days_overdue, 12)
+        self.assertEqual(InvoiceService.mark_overdue_invoices(), 0)
+
+
+class InvoiceBulkStatusTest(InvoiceTestCase):
+    """Test cases for bulk invoice status changes."""
+
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+
+        self.other_user = User.objects.create_user(
+            email='other@example.com',
+            username='otheruser',
+            password='testpass123'
+        )
+        other_client = Client.objects.create(user=self.other_user, name='Other', email='other@example.com')
+        self.other_invoice = Invoice.objects.create(
+            user=self.other_user,
+            client=other_client,
+            invoice_number='OTHER-0001',
+            due_date=timezone.now().date(),
+            subtotal=Decimal('10.00'),
+            tax_rate=Decimal('0.00'),
+            discount_rate=Decimal('0.00')
+        )
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def test_one_update_per_status_group(self):
+        """Test ownership is checked in one query and each group is one UPDATE."""
+        from .services.invoice_service import InvoiceService
+
+        sent = Invoice.objects.get(user=self.user, status='sent').pk
+        draft = Invoice.objects.get(user=self.user, status='draft').pk
+        operations = [
+            {'ids': [sent, self.other_invoice.pk], 'status': 'paid', 'payment_method': 'bank_transfer'},
+            {'ids': [draft], 'status': 'cancelled'},
+        ]
+        # savepoint, ownership check, two UPDATEs, release
+        with self.assertNumQueries(5):
+            results = InvoiceService.bulk_update_status(self.user, operations)
+
+        self.assertEqual(results, [
+            {'id': sent, 'result': 'updated', 'old_status': 'sent', 'status': 'paid'},
+            {'id': self.other_invoice.pk, 'result': 'not_found'},
+            {'id': draft, 'result': 'updated', 'old_status': 'draft', 'status': 'cancelled'},
+        ])
+        invoice = Invoice.objects.get(pk=sent)
+        self.assertEqual(invoice.payment_method, 'bank_transfer')
+        self.assertEqual(invoice.paid_date, timezone.now().date())
+        self.assertEqual(Invoice.objects.get(pk=self.other_invoice.pk).status, 'draft')
+
+    def test_leaving_paid_clears_payment_details(self):
+        """Test invoices moved out of paid no longer carry payment data."""
+        from .services.invoice_service import InvoiceService
+
+        paid = Invoice.objects.get(user=self.user, status='sent')
+        Invoice.objects.filter(pk=paid.pk).update(
+            status='paid', paid_date=timezone.now().date(), payment_method='card', stripe_payment_intent_id='pi_123'
+        )
+        draft = Invoice.objects.get(user=self.user, status='draft')
+        Invoice.objects.filter(pk=draft.pk).update(stripe_payment_intent_id='pi_open')
+
+        with self.assertNumQueries(4):
+            InvoiceService.bulk_update_status(self.user, [{'ids': [paid.pk, draft.pk], 'status': 'sent'}])
+
+        paid.refresh_from_db()
+        self.assertEqual((paid.status, paid.paid_date, paid.payment_method, paid.stripe_payment_intent_id), ('sent', None, '', ''))
+        # Open payment intents of unpaid invoices are kept
+        self.assertEqual(Invoice.objects.get(pk=draft.pk).stripe_payment_intent_id, 'pi_open')
+
+    def test_endpoint(self):
+        """Test the bulk status endpoint validates and applies operations."""
+        from django.urls import reverse
+
+        url = reverse('invoice-bulk-status')
+        ids = list(Invoice.objects.filter(user=self.user).values_list('pk', flat=True))
+        response = self.api_client.post(url, {'operations': [
+            {'ids': ids, 'status': 'cancelled'},
+        ]}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(Invoice.objects.filter(user=self.user, status='cancelled').count(), 2)
+
+        response = self.api_client.post(url, {'operations': [
+            {'ids': ids[:1], 'status': 'cancelled'},
+        ]}, format='json', secure=True)
+        self.assertEqual(response.data['results'], [{'id': ids[0], 'result': 'unchanged', 'status': 'cancelled'}])
+
+        response = self.api_client.post(url, {'operations': [
+            {'ids': ids[:1], 'status': 'paid'},
+            {'ids': ids[:1], 'status': 'sent'},
+        ]}, format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class BankStatementImportTest(InvoiceTestCase):
+    """Test cases for matching bank statements to open invoices."""
+
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.invoice = Invoice.objects.get(user=self.user, status='sent')
+        self.second = Invoice.objects.create(
+            user=self.user,
+            client=Client.objects.create(user=self.user, name='Globex', email='globex@example.com'),
+            invoice_number='INV-EXTRA-0001',
+            due_date=timezone.now().date(),
+            status='sent',
+            subtotal=Decimal('80.00'),
+            tax_rate=Decimal('0.00'),
+            discount_rate=Decimal('0.00')
+        )
+
+    def upload(self, name, content, **data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.urls import reverse
+
+        data['file'] = SimpleUploadedFile(name, content.encode())
+        return self.api_client.post(reverse('invoice-import-statement'), data, format='multipart', secure=True)
+
+    def test_csv_matches_by_number_then_amount_and_client(self):
+        """Test CSV rows match by invoice number, then by amount and client."""
+        content = (
+            'Date,Amount,Reference,Payer\n'
+            f'2026-10-01,275.00,Payment {self.invoice.invoice_number.lower()},Acme\n'
+            '2026-10-02,80.00,October services,GLOBEX LTD\n'
+            '2026-10-03,80.00,Unknown,Someone\n'
+            '2026-10-04,-12.50,Bank fee,\n'
+            'yesterday,10.00,,\n'
+        )
+        response = self.upload('statement.csv', content, dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {'matched': 2, 'unmatched': 1, 'skipped': 1, 'invalid': 1})
+        self.assertEqual(
+            [line.get('matched_by') for line in response.data['lines'][:2]],
+            ['invoice_number', 'amount_and_client']
+        )
+        self.assertFalse(Invoice.objects.filter(status='paid').exists())
+
+        response = self.upload('statement.csv', content)
+        self.invoice.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'paid')
+        self.assertEqual(str(self.invoice.paid_date), '2026-10-01')
+        self.assertEqual(self.invoice.payment_method, 'bank_transfer')
+        self.assertEqual(str(self.second.paid_date), '2026-10-02')
+
+    def test_parse_amount_separators(self):
+        """Test amounts parse with either decimal and thousands separator."""
+        from .services.bank_statement import parse_amount
+
+        for value, amount in (
+            ('1.234,56', '1234.56'),
+            ('1,234.56', '1234.56'),
+            ('1,500', '1500.00'),
+            ('12,50', '12.50'),
+            ('1.000.000', '1000000.00'),
+            ('-275.00', '-275.00'),
+            ('EUR 80', '80.00'),
+        ):
+            self.assertEqual(parse_amount(value), Decimal(amount), value)
+
+    def test_ofx_amount_mismatch(self):
+        """Test an OFX transaction with the wrong amount is reported as a mismatch."""
+        content = (
+            'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20261001120000[-5:EST]\n<TRNAMT>200.00\n'
+            f'<FITID>T1\n<NAME>Acme\n<MEMO>{self.invoice.invoice_number}\n</STMTTRN>\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        )
+        response = self.upload('statement.ofx', content)
+        self.assertEqual(response.status_code, 200)
+        line = response.data['lines'][0]
+        self.assertEqual(line['result'], 'amount_mismatch')
+        self.assertEqual(line['transaction_id'], 'T1')
+        self.assertEqual(line['expected_amount'], Decimal('275.00'))
+
+    def test_csv_without_amount_column(self):
+        """Test a CSV file without an amount column is rejected."""
+        response = self.upload('statement.csv', 'Date,Reference\n2026-10-01,x\n')
+        self.assertEqual(response.status_code, 400)
+
+
+class InvoiceFromTimeEntriesTest(InvoiceTestCase):
+    """Test cases for billing time entries onto invoices."""
+
+    def setUp(self):
+        super().setUp()
+        from time_entries.models import TimeEntry
+
+        today = timezone.now().date()
+        other_project = Project.objects.create(
+            user=self.user, client=self.client_obj, name='Hosting', hourly_rate=Decimal('50.00')
+        )
+        for days, project in ((1, self.project), (2, self.project), (3, other_project)):
+            TimeEntry.objects.create(
+                user=self.user,
+                project=project,
+                date=today - timedelta(days=days),
+                hours=Decimal('2.00'),
+                hourly_rate=project.hourly_rate,
+                description=f'Work {days}'
+            )
+        TimeEntry.objects.create(
+            user=self.user,
+            project=self.project,
+            date=today,
+            hours=Decimal('1.00'),
+            hourly_rate=Decimal('100.00'),
+            description='Internal',
+            is_billable=False
+        )
+        self.data = {
+            'client': self.client_obj,
+            'start_date': today - timedelta(days=7),
+            'end_date': today,
+        }
+
+    def test_entries_are_billed_once(self):
+        from time_entries.models import TimeEntry
+        from .services.invoice_service import InvoiceService
+
+        self.assertEqual(TimeEntry.objects.unbilled().count(), 3)
+        invoice = InvoiceService.create_invoice_from_time_entries(self.user, self.data)
+
+        self.assertEqual(invoice.subtotal, Decimal('500.00'))
+        self.assertEqual(invoice.time_entries.count(), 3)
+        for entry in invoice.time_entries.select_related('invoice_item', 'project'):
+            self.assertIn(entry.project.name, entry.invoice_item.description)
+        self.assertFalse(TimeEntry.objects.unbilled().exists())
+
+        with self.assertRaises(ValueError):
+            InvoiceService.create_invoice_from_time_entries(self.user, self.data)
+
+        self.assertEqual(InvoiceService.release_time_entries([invoice.pk]), 3)
+        self.assertEqual(TimeEntry.objects.unbilled().count(), 3)
+
+    def test_deleting_invoice_unbills_entries(self):
+        from time_entries.models import TimeEntry
+        from .services.invoice_service import InvoiceService
+
+        invoice = InvoiceService.create_invoice_from_time_entries(self.user, self.data)
+        invoice.delete()
+        self.assertEqual(TimeEntry.objects.unbilled().count(), 3)
+
+    def test_detailed_line_items(self):
+        from .services.invoice_service import InvoiceService
+        from .services.pdf_generator import InvoicePDFGenerator
+
+        self.client_obj.invoice_line_items = 'entry'
+        self.client_obj.save()
+        invoice = InvoiceService.create_invoice_from_time_entries(self.user, self.data)
+
+        self.assertEqual(invoice.subtotal, Decimal('500.00'))
+        items = list(invoice.items.order_by('pk'))
+        self.assertEqual(len(items), 3)
+        self.assertEqual([item.time_entry.description for item in items], ['Work 3', 'Work 2', 'Work 1'])
+        for item in items:
+            self.assertEqual(item.time_entry.invoice_item_id, item.pk)
+            self.assertEqual(item.total, item.quantity * item.unit_price)
+
+        generator = InvoicePDFGenerator(invoice)
+        generator.ROWS_PER_TABLE = 2
+        groups = generator._group_items()
+        self.assertTrue(all(group['label'].startswith('Week of ') for group in groups))
+        self.assertEqual(sum(group['total'] for group in groups), invoice.subtotal)
+        tables = [table for group in groups for table in group['tables']]
+        self.assertEqual(sum(len(table) for table in tables), 3)
+        self.assertTrue(all(len(table) <= 2 for table in tables))
+
+
+class InvoiceTotalsTest(InvoiceTestCase):
+    """Test cases for invoice totals maintained from line items."""
+
+    def setUp(self):
+        super().setUp()
+        self.invoice = Invoice.objects.get(user=self.user, status='sent')
+
+    def add_item(self, total):
+        from .models import InvoiceItem
+
+        return InvoiceItem.objects.create(invoice=self.invoice, description='Work', unit_price=total, total=total)
+
+    def test_item_changes_update_totals(self):
+        """Test adding, changing and deleting items keeps totals current."""
+        first = self.add_item(Decimal('100.00'))
+        self.add_item(Decimal('55.50'))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.subtotal, Decimal('155.50'))
+        self.assertEqual(self.invoice.tax_amount, Decimal('15.55'))
+        self.assertEqual(self.invoice.total_amount, Decimal('171.05'))
+
+        first.total = Decimal('200.00')
+        first.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total_amount, Decimal('281.05'))
+
+        first.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.subtotal, Decimal('55.50'))
+
+        # Deleting the invoice does not recalculate it per item
+        with self.assertNumQueries(8):
+            self.invoice.delete()
+
+    def test_cascading_deletes_skip_recalculation(self):
+        """Test deleting a project or client does not recalculate invoices per item."""
+        for total in range(1, 11):
+            self.add_item(Decimal(total))
+
+        # Neither deleting the project nor the client recalculates invoices
+        # that go with it, however many items they have
+        with self.assertNumQueries(11):
+            self.project.delete()
+        with self.assertNumQueries(8):
+            self.client_obj.delete()
+
+    def test_recalculate_command_repairs_drift(self):
+        """Test recalculate_invoice_totals reports drifted totals and repairs them."""
+        from io import StringIO
+        from django.core.management import call_command
+
+        self.add_item(Decimal('100.00'))
+        Invoice.objects.filter(user=self.user).update(subtotal=Decimal('1.00'), total_amount=Decimal('1.00'))
+
+        output = StringIO()
+        call_command('recalculate_invoice_totals', '--dry-run', '-v', '2', stdout=output)
+        self.assertIn(self.invoice.invoice_number, output.getvalue())
+        self.assertEqual(Invoice.objects.get(pk=self.invoice.pk).total_amount, Decimal('1.00'))
+
+        call_command('recalculate_invoice_totals', stdout=StringIO())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.total_amount, Decimal('110.00'))
+        self.assertEqual(Invoice.objects.get(user=self.user, status='draft').subtotal, Decimal('1.00'))
+
+
+class TaxEngineTest(InvoiceTestCase):
+    """Test cases for per-item and compound tax lines."""
+
+    def setUp(self):
+        super().setUp()
+        from rest_framework.test import APIClient
+        from .models import InvoiceItem, TaxRate
+
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.invoice = Invoice.objects.get(user=self.user, status='draft')
+        self.hosting = InvoiceItem.objects.create(
+            invoice=self.invoice, description='Hosting', unit_price=Decimal('100.00'), total=Decimal('100.00')
+        )
+        self.design = InvoiceItem.objects.create(
+            invoice=self.invoice, description='Design', unit_price=Decimal('200.00'), total=Decimal('200.00')
+        )
+        self.gst = TaxRate.objects.create(user=self.user, name='GST', rate=Decimal('5.000'))
+        self.qst = TaxRate.objects.create(user=self.user, name='QST', rate=Decimal('9.975'), compound=True)
+
+    def test_per_item_and_compound_taxes(self):
+        """Test per-item taxes and compound taxes are applied to totals."""
+        from django.urls import reverse
+        from .services.tax_service import TaxService
+
+        TaxService.apply_tax_rates(self.invoice.items.all(), [self.gst])
+        url = reverse('invoice-item-taxes', args=[self.invoice.pk])
+        response = self.api_client.post(url, {
+            'tax_rates': [self.gst.pk, self.qst.pk], 'items': [self.design.pk]
+        }, format='json', secure=True)
+        self.assertEqual(response.status_code, 200)
+
+        # GST on both items; QST on design plus its GST: 200 * 1.05 = 210
+        self.assertEqual(
+            [(line['name'], line['taxable_amount'], line['amount']) for line in response.data['tax_lines']],
+            [('GST', '300.00', '15.00'), ('QST', '210.00', '20.95')]
+        )
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.subtotal, Decimal('300.00'))
+        self.assertEqual(self.invoice.tax_amount, Decimal('35.95'))
+        self.assertEqual(self.invoice.total_amount, Decimal('335.95'))
+
+        # Saving the invoice keeps the tax from its tax lines
+        self.invoice.notes = 'Updated'
+        self.invoice.save()
+        self.assertEqual(self.invoice.tax_amount, Decimal('35.95'))
+
+    def test_item_taxes_of_sent_invoices_are_kept(self):
+        """Test taxes cannot be changed once an invoice has been sent."""
+        from django.urls import reverse
+
+        sent = Invoice.objects.get(user=self.user, status='sent')
+        sent.items.create(description='Support', unit_price=Decimal('250.00'), total=Decimal('250.00'))
+        total_amount = Invoice.objects.get(pk=sent.pk).total_amount
+
+        response = self.api_client.post(
+            reverse('invoice-item-taxes', args=[sent.pk]), {'tax_rates': [self.gst.pk]}, format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(sent.tax_lines.exists())
+        self.assertEqual(Invoice.objects.get(pk=sent.pk).total_amount, total_amount)
+
+    def test_rate_change_reaches_draft_invoices_only(self):
+        """Test changing a tax rate recalculates draft invoices only."""
+        from django.urls import reverse
+        from .services.tax_service import TaxService
+
+        sent = Invoice.objects.get(user=self.user, status='sent')
+        sent_item = sent.items.create(description='Support', unit_price=Decimal('250.00'), total=Decimal('250.00'))
+        TaxService.apply_tax_rates(self.invoice.items.all(), [self.gst])
+        TaxService.apply_tax_rates(sent.items.filter(pk=sent_item.pk), [self.gst])
+
+        response = self.api_client.patch(
+            reverse('tax-rate-detail', args=[self.gst.pk]), {'rate': '6.000'}, format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.invoice.refresh_from_db()
+        sent.refresh_from_db()
+        self.assertEqual(self.invoice.tax_amount, Decimal('18.00'))
+        self.assertEqual(sent.tax_amount, Decimal('12.50'))
+
+    def test_default_rates_apply_to_new_invoices(self):
+        """Test default tax rates apply to invoices created from time entries."""
+        from time_entries.models import TimeEntry
+        from .services.invoice_service import InvoiceService
+
+        self.gst.is_default = True
+        self.gst.save()
+        TimeEntry.objects.create(
+            user=self.user,
+            project=self.project,
+            date=timezone.now().date(),
+            hours=Decimal('2.00'),
+            hourly_rate=Decimal('100.00'),
+            description='Work'
+        )
+        today = timezone.now().date()
+        invoice = InvoiceService.create_invoice_from_time_entries(self.user, {
+            'client': self.client_obj, 'start_date': today, 'end_date': today
+        })
+        self.assertEqual(invoice.tax_amount, Decimal('10.00'))
+        self.assertEqual(invoice.total_amount, Decimal('210.00'))
@@ -6,6 +6,11 @@ from .views import (
     InvoiceSendView,
     invoice_pdf_download,
     invoice_mark_paid,
+    invoice_item_taxes,
+    TaxRateListCreateView,
+    TaxRateDetailView,
+    invoice_bulk_status,
+    import_bank_statement,
     invoice_summary,
     overdue_invoices
 )
@@ -17,6 +22,11 @@ urlpatterns = [
     path('<int:pk>/send/', InvoiceSendView.as_view(), name='invoice-send'),
     path('<int:pk>/pdf/', invoice_pdf_download, name='invoice-pdf-download'),
     path('<int:pk>/mark-paid/', invoice_mark_paid, name='invoice-mark-paid'),
+    path('<int:pk>/taxes/', invoice_item_taxes, name='invoice-item-taxes'),
+    path('tax-rates/', TaxRateListCreateView.as_view(), name='tax-rate-list-create'),
+    path('tax-rates/<int:pk>/', TaxRateDetailView.as_view(), name='tax-rate-detail'),
+    path('bulk-status/', invoice_bulk_status, name='invoice-bulk-status'),
+    path('import-statement/', import_bank_statement, name='invoice-import-statement'),
     path('summary/', invoice_summary, name='invoice-summary'),
     path('overdue/', overdue_invoices, name='overdue-invoices'),
 ] 
\ No newline at end of file
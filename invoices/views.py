@@ -1,36 +1,50 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, parser_classes, action
+from rest_framework.parsers import MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Invoice
+from core.fastpath import ValuesListMixin
+from .filters import InvoiceFilter
+from .models import Invoice, TaxRate
 from .serializers import (
     InvoiceSerializer, 
     InvoiceListSerializer, 
+    InvoiceListValuesSerializer,
     InvoiceDetailSerializer,
     InvoiceCreateFromTimeEntriesSerializer,
-    InvoiceSendSerializer
+    InvoiceSendSerializer,
+    InvoiceBulkStatusSerializer,
+    BankStatementImportSerializer,
+    InvoiceItemTaxesSerializer,
+    TaxRateSerializer
 )
+from .services.bank_statement import BankStatementService
 from .services.invoice_service import InvoiceService
+from .services.tax_service import TaxService
 
 
-class InvoiceListCreateView(generics.ListCreateAPIView):
+class InvoiceListCreateView(ValuesListMixin, generics.ListCreateAPIView):
     """
     View for listing and creating invoices.
     """
     serializer_class = InvoiceSerializer
+    values_serializer_class = InvoiceListValuesSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'client', 'project', 'issue_date']
+    filterset_class = InvoiceFilter
     search_fields = ['invoice_number', 'client__name', 'project__name']
-    ordering_fields = ['invoice_number', 'issue_date', 'due_date', 'total_amount', 'created_at']
+    ordering_fields = ['invoice_number', 'issue_date', 'due_date', 'total_amount', 'days_overdue', 'created_at']
     ordering = ['-issue_date', '-created_at']
     
     def get_queryset(self):
-        return Invoice.objects.filter(user=self.request.user).select_related('client', 'project')
+        queryset = Invoice.objects.filter(user=self.request.user).select_related('client', 'project')
+        if self.request.method == 'GET':
+            queryset = queryset.with_overdue()
+        return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -54,6 +68,33 @@ class InvoiceDetailView(generics.RetrieveUpdateDestroyAPIView):
         return InvoiceDetailSerializer
 
 
+class TaxRateListCreateView(generics.ListCreateAPIView):
+    """
+    View for listing and creating tax rates.
+    """
+    serializer_class = TaxRateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return TaxRate.objects.filter(user=self.request.user)
+
+
+class TaxRateDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    View for retrieving, updating, and deleting a tax rate. Changes are
+    applied to draft invoices that use the rate.
+    """
+    serializer_class = TaxRateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return TaxRate.objects.filter(user=self.request.user)
+    
+    def perform_update(self, serializer):
+        tax_rate = serializer.save()
+        TaxService.update_tax_rate(tax_rate)
+
+
 class InvoiceCreateFromTimeEntriesView(generics.CreateAPIView):
     """
     View for creating invoices from time entries.
@@ -136,6 +177,72 @@ def invoice_mark_paid(request, pk):
     return Response({'message': 'Invoice marked as paid'}, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def invoice_item_taxes(request, pk):
+    """
+    View for setting the taxes on a draft invoice's items (all items
+    unless ``items`` lists some). Invoices that have been sent keep the
+    taxes they were issued with.
+    """
+    invoice = get_object_or_404(Invoice, pk=pk, user=request.user)
+    if invoice.status != 'draft':
+        return Response(
+            {'error': 'Taxes can only be changed on draft invoices.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer = InvoiceItemTaxesSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    
+    items = invoice.items.all()
+    if 'items' in serializer.validated_data:
+        items = items.filter(pk__in=serializer.validated_data['items'])
+    TaxService.apply_tax_rates(items, serializer.validated_data['tax_rates'])
+    
+    invoice.refresh_from_db()
+    return Response(InvoiceDetailSerializer(invoice, context={'request': request}).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def invoice_bulk_status(request):
+    """
+    View for changing the status of many invoices at once.
+    """
+    serializer = InvoiceBulkStatusSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    results = InvoiceService.bulk_update_status(request.user, serializer.validated_data['operations'])
+    
+    return Response({
+        'updated': sum(1 for result in results if result['result'] == 'updated'),
+        'results': results
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def import_bank_statement(request):
+    """
+    View for matching a bank statement against open invoices.
+    """
+    serializer = BankStatementImportSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    try:
+        result = BankStatementService.import_statement(
+            request.user,
+            serializer.validated_data['file'],
+            serializer.validated_data['format'],
+            dry_run=serializer.validated_data['dry_run']
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(result, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def invoice_summary(request):
@@ -153,6 +260,6 @@ def overdue_invoices(request):
     """
     View for getting overdue invoices.
     """
-    overdue = InvoiceService.get_overdue_invoices(request.user)
-    serializer = InvoiceListSerializer(overdue, many=True, context={'request': request})
-    return Response(serializer.data) 
\ No newline at end of file
+    serializer = InvoiceListValuesSerializer()
+    overdue = serializer.get_queryset(InvoiceService.get_overdue_invoices(request.user))
+    return Response(serializer.to_representation(overdue)) 
\ No newline at end of file
@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.contrib import admin
+from time_entries.models import TimeEntry
+from time_entries.services import TimeEntryService
 from .models import Project
 
 
@@ -9,6 +12,7 @@ class ProjectAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description', 'client__name', 'user__email')
     list_editable = ('status',)
     readonly_fields = ('created_at', 'updated_at', 'total_hours', 'total_billed', 'is_over_budget')
+    actions = ['reprice_unbilled_time_entries']
     
     fieldsets = (
         ('Basic Information', {
@@ -31,4 +35,10 @@ class ProjectAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('client', 'user') 
\ No newline at end of file
+        return super().get_queryset(request).select_related('client', 'user')
+    
+    @admin.action(description='Reprice unbilled time entries at the project rate')
+    def reprice_unbilled_time_entries(self, request, queryset):
+        entries = TimeEntry.objects.unbilled().filter(project__in=queryset)
+        updated = TimeEntryService.reprice(entries, batch_size=settings.TIME_ENTRY_REPRICE_BATCH_SIZE)
+        self.message_user(request, f'{updated} time entries repriced.')
@@ -1,5 +1,6 @@
 from django.db import models
 from core.models import BaseModel, User
+from core.rates import get_rate_card
 from clients.models import Client
 
 
@@ -50,10 +51,7 @@ class Project(BaseModel):
     def save(self, *args, **kwargs):
         # If no hourly rate is set, use client's default or user's default
         if not self.hourly_rate:
-            if self.client.default_hourly_rate:
-                self.hourly_rate = self.client.default_hourly_rate
-            else:
-                self.hourly_rate = self.user.default_hourly_rate
+            self.hourly_rate = get_rate_card().for_project(self)
         super().save(*args, **kwargs)
     
     @property
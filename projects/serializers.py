@@ -24,7 +24,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     
     def validate_client(self, value):
         # Ensure the client belongs to the current user
-        if value.user != self.context['request'].user:
+        if value.user_id != self.context['request'].user.pk:
             raise serializers.ValidationError("You can only assign projects to your own clients.")
         return value
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import StripePaymentIntent, StripeWebhookEvent
+from .services import StripeService
 
 
 @admin.register(StripePaymentIntent)
@@ -31,15 +32,19 @@ class StripePaymentIntentAdmin(admin.ModelAdmin):
 
 @admin.register(StripeWebhookEvent)
 class StripeWebhookEventAdmin(admin.ModelAdmin):
-    list_display = ('event_id', 'event_type', 'processed', 'created_at')
-    list_filter = ('event_type', 'processed', 'created_at')
+    list_display = ('event_id', 'event_type', 'processed', 'failed', 'attempts', 'created_at')
+    list_filter = ('event_type', 'processed', 'failed', 'created_at')
     search_fields = ('event_id', 'event_type')
     readonly_fields = ('created_at', 'updated_at')
+    actions = ['replay_events']
     
     fieldsets = (
         ('Event Information', {
             'fields': ('event_id', 'event_type', 'processed')
         }),
+        ('Processing', {
+            'fields': ('ordering_key', 'stripe_created', 'failed', 'attempts', 'next_attempt_at')
+        }),
         ('Event Data', {
             'fields': ('event_data', 'error_message')
         }),
@@ -47,4 +52,9 @@ class StripeWebhookEventAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    ) 
\ No newline at end of file
+    )
+    
+    @admin.action(description='Replay selected failed events')
+    def replay_events(self, request, queryset):
+        queued = StripeService.replay_webhook_events(queryset)
+        self.message_user(request, f'{queued} events queued for replay.')
@@ -0,0 +1,273 @@
+"""
+Payment gateways used by StripeService.
+
+StripeGateway calls the Stripe API. FakeGateway simulates payment
+intents, checkout sessions and signed webhook deliveries in-process so
+the payment flow can be exercised and benchmarked without network
+access. The gateway is selected with settings.PAYMENT_GATEWAY.
+"""
+import hashlib
+import hmac
+from abc import ABC, abstractmethod
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class PaymentGatewayError(Exception):
+    """
+    Raised when the payment provider rejects or fails a request.
+    """
+
+
+def sign_webhook_payload(payload, secret, timestamp=None):
+    """
+    Build a Stripe-Signature header for ``payload``.
+    """
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(
+        secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256
+    ).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+class PaymentGateway(ABC):
+    """
+    Interface for payment providers.
+
+    Objects returned by a gateway support attribute access to the Stripe
+    fields used by StripeService (id, status, amount, currency,
+    client_secret, payment_method_types, metadata, url).
+    """
+
+    @abstractmethod
+    def create_payment_intent(self, amount, currency, metadata, description, payment_method_types,
+                              idempotency_key=None):
+        """Create a payment intent; repeated idempotency keys return the first intent."""
+
+    @abstractmethod
+    def retrieve_payment_intent(self, payment_intent_id):
+        """Fetch a payment intent, raising PaymentGatewayError if it is unknown."""
+
+    @abstractmethod
+    def create_checkout_session(self, line_items, success_url, cancel_url, metadata, payment_method_types):
+        """Create a hosted checkout session."""
+
+
+class StripeGateway(PaymentGateway):
+    """
+    Gateway backed by the Stripe API.
+    """
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or settings.STRIPE_SECRET_KEY
+
+    def create_payment_intent(self, amount, currency, metadata, description, payment_method_types,
+                              idempotency_key=None):
+        try:
+            return stripe.PaymentIntent.create(
+                api_key=self.api_key,
+                idempotency_key=idempotency_key,
+                amount=amount,
+                currency=currency,
+                metadata=metadata,
+                payment_method_types=payment_method_types,
+                description=description
+            )
+        except stripe.error.StripeError as e:
+            raise PaymentGatewayError(f"Stripe error: {str(e)}")
+
+    def retrieve_payment_intent(self, payment_intent_id):
+        try:
+            return stripe.PaymentIntent.retrieve(payment_intent_id, api_key=self.api_key)
+        except stripe.error.StripeError as e:
+            raise PaymentGatewayError(f"Stripe error: {str(e)}")
+
+    def create_checkout_session(self, line_items, success_url, cancel_url, metadata, payment_method_types):
+        try:
+            return stripe.checkout.Session.create(
+                api_key=self.api_key,
+                payment_method_types=payment_method_types,
+                line_items=line_items,
+                mode='payment',
+                success_url=success_url,
+                cancel_url=cancel_url,
+                metadata=metadata
+            )
+        except stripe.error.StripeError as e:
+            raise PaymentGatewayError(f"Stripe error: {str(e)}")
+
+
+class FakeObject(dict):
+    """
+    Dict with attribute access, like stripe.StripeObject.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-process stand-in for Stripe.
+
+    Every API call sleeps for ``latency`` seconds. Intents and sessions
+    live in memory, so the gateway is per process. confirm_payment_intent
+    simulates the customer paying and delivers the matching signed
+    webhook after ``webhook_latency`` seconds, either to ``webhook_url``
+    or straight to the webhook view in this process.
+    """
+
+    def __init__(self, latency=None, webhook_latency=None, webhook_url=None, webhook_secret=None):
+        self.latency = settings.PAYMENT_GATEWAY_LATENCY if latency is None else latency
+        self.webhook_latency = self.latency if webhook_latency is None else webhook_latency
+        self.webhook_url = settings.PAYMENT_GATEWAY_WEBHOOK_URL if webhook_url is None else webhook_url
+        self.webhook_secret = settings.STRIPE_WEBHOOK_SECRET if webhook_secret is None else webhook_secret
+        self.payment_intents = {}
+        self.checkout_sessions = {}
+        self.idempotency_keys = {}
+        self._lock = threading.Lock()
+
+    def _call(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _get_payment_intent(self, payment_intent_id):
+        try:
+            return self.payment_intents[payment_intent_id]
+        except KeyError:
+            raise PaymentGatewayError(f"Stripe error: No such payment_intent: '{payment_intent_id}'")
+
+    def create_payment_intent(self, amount, currency, metadata, description, payment_method_types,
+                              idempotency_key=None):
+        self._call()
+        # Checking the key and storing the intent under one lock keeps
+        # concurrent requests with the same key to a single intent
+        with self._lock:
+            if idempotency_key in self.idempotency_keys:
+                return FakeObject(self.payment_intents[self.idempotency_keys[idempotency_key]])
+
+            payment_intent_id = f'pi_fake_{uuid.uuid4().hex[:24]}'
+            payment_intent = FakeObject(
+                id=payment_intent_id,
+                object='payment_intent',
+                amount=amount,
+                currency=currency,
+                status='requires_payment_method',
+                client_secret=f'{payment_intent_id}_secret_{uuid.uuid4().hex[:24]}',
+                description=description,
+                metadata={key: str(value) for key, value in metadata.items()},
+                payment_method_types=list(payment_method_types),
+                created=int(time.time())
+            )
+            self.payment_intents[payment_intent_id] = payment_intent
+            if idempotency_key:
+                self.idempotency_keys[idempotency_key] = payment_intent_id
+        return FakeObject(payment_intent)
+
+    def retrieve_payment_intent(self, payment_intent_id):
+        self._call()
+        with self._lock:
+            return FakeObject(self._get_payment_intent(payment_intent_id))
+
+    def create_checkout_session(self, line_items, success_url, cancel_url, metadata, payment_method_types):
+        self._call()
+        session_id = f'cs_fake_{uuid.uuid4().hex[:24]}'
+        session = FakeObject(
+            id=session_id,
+            object='checkout.session',
+            url=f'https://checkout.stripe.test/pay/{session_id}',
+            mode='payment',
+            status='open',
+            amount_total=sum(item['price_data']['unit_amount'] * item['quantity'] for item in line_items),
+            currency=line_items[0]['price_data']['currency'] if line_items else None,
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata={key: str(value) for key, value in metadata.items()},
+            payment_method_types=list(payment_method_types),
+            created=int(time.time())
+        )
+        with self._lock:
+            self.checkout_sessions[session_id] = session
+        return FakeObject(session)
+
+    def confirm_payment_intent(self, payment_intent_id, succeed=True):
+        """
+        Simulate the customer completing (or failing) a payment and
+        deliver the resulting webhook. Returns the webhook response status.
+        """
+        with self._lock:
+            payment_intent = self._get_payment_intent(payment_intent_id)
+            payment_intent['status'] = 'succeeded' if succeed else 'requires_payment_method'
+            event_object = dict(payment_intent)
+
+        event_type = 'payment_intent.succeeded' if succeed else 'payment_intent.payment_failed'
+        return self.deliver_webhook(event_type, event_object)
+
+    def deliver_webhook(self, event_type, event_object):
+        """
+        Deliver a signed webhook event; returns the response status.
+        """
+        if self.webhook_latency:
+            time.sleep(self.webhook_latency)
+
+        payload = json.dumps({
+            'id': f'evt_fake_{uuid.uuid4().hex[:24]}',
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': event_object},
+        })
+        signature = sign_webhook_payload(payload, self.webhook_secret)
+
+        if self.webhook_url:
+            request = urllib.request.Request(
+                self.webhook_url, data=payload.encode(), method='POST',
+                headers={'Content-Type': 'application/json', 'Stripe-Signature': signature}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        from django.test import RequestFactory
+        from .views import stripe_webhook
+
+        request = RequestFactory().post(
+            '/api/stripe/webhook/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature
+        )
+        return stripe_webhook(request).status_code
+
+
+_gateway = None
+
+
+def get_gateway():
+    """
+    Return the configured payment gateway, created on first use.
+    """
+    global _gateway
+    if _gateway is None:
+        _gateway = import_string(settings.PAYMENT_GATEWAY)()
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    global _gateway
+    if setting.startswith('PAYMENT_GATEWAY') or setting.startswith('STRIPE_'):
+        _gateway = None
@@ -0,0 +1,40 @@
+import json
+from django.core.management.base import BaseCommand
+from stripe_integration.services import StripeService
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare open payment intents with Stripe, store their current status and '
+        'mark invoices paid whose payment webhooks were missed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=8, help='concurrent Stripe requests')
+        parser.add_argument(
+            '--max-age-days', type=int, default=None,
+            help='only intents created this many days ago or later (default PAYMENT_RECONCILE_MAX_AGE_DAYS)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='report drift without writing')
+        parser.add_argument('--json', action='store_true', help='print the report as JSON')
+
+    def handle(self, *args, **options):
+        report = StripeService.reconcile_payment_intents(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            dry_run=options['dry_run'],
+            max_age_days=options['max_age_days']
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+            return
+
+        self.stdout.write(f"Checked {report['checked']} payment intents, {report['errors']} errors")
+        for transition, count in sorted(report['status_changes'].items()):
+            self.stdout.write(f'  {transition}: {count}')
+        action = 'Would mark' if options['dry_run'] else 'Marked'
+        self.stdout.write(f"{action} {len(report['invoices_marked_paid'])} invoices paid")
+        for invoice_number in report['invoices_marked_paid']:
+            self.stdout.write(f'  {invoice_number}')
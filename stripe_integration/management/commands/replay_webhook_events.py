@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from stripe_integration.models import StripeWebhookEvent
+from stripe_integration.services import StripeService
+from stripe_integration.tasks import process_webhook_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Reprocess failed or retrying Stripe webhook events from their stored event data. '
+        'Events are queued for the process_webhook_events task unless --now is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event-id', nargs='+', dest='event_ids', help='only these events')
+        parser.add_argument('--type', dest='event_type', help='only events of this type')
+        parser.add_argument('--since', help='only events received at or after this ISO datetime')
+        parser.add_argument('--now', action='store_true', help='process in this process instead of queueing')
+        parser.add_argument('--dry-run', action='store_true', help='list the events without replaying them')
+
+    def handle(self, *args, **options):
+        events = StripeWebhookEvent.objects.filter(processed=False).filter(Q(failed=True) | Q(attempts__gt=0))
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        if options['event_type']:
+            events = events.filter(event_type=options['event_type'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            events = events.filter(created_at__gte=since)
+
+        if options['dry_run']:
+            for event_id, event_type, attempts, error_message in events.order_by('stripe_created', 'pk').values_list(
+                'event_id', 'event_type', 'attempts', 'error_message'
+            ):
+                self.stdout.write(f'{event_id}  {event_type}  attempts={attempts}  {error_message}')
+            self.stdout.write(f'{events.count()} events would be replayed')
+            return
+
+        queued = StripeService.replay_webhook_events(events)
+        self.stdout.write(f'Queued {queued} events for replay')
+        if not queued:
+            return
+
+        if options['now']:
+            processed, failed = StripeService.process_pending_webhook_events()
+            self.stdout.write(f'Processed {processed} events, {failed} failed')
+        else:
+            process_webhook_events.delay()
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stripe_integration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripewebhookevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stripewebhookevent',
+            name='failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='stripewebhookevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stripewebhookevent',
+            name='ordering_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='stripewebhookevent',
+            name='stripe_created',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stripewebhookevent',
+            index=models.Index(condition=models.Q(('failed', False), ('processed', False)), fields=['ordering_key', 'stripe_created'], name='webhook_event_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0002_invoice_status_due_idx'),
+        ('stripe_integration', '0002_webhook_event_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripepaymentintent',
+            name='status_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stripepaymentintent',
+            index=models.Index(fields=['status', 'status_synced_at'], name='payment_intent_status_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_stripe_created(apps, schema_editor):
+    # Events stored without a creation time are ordered by when they were received
+    StripeWebhookEvent = apps.get_model('stripe_integration', 'StripeWebhookEvent')
+    StripeWebhookEvent.objects.filter(stripe_created__isnull=True).update(stripe_created=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stripe_integration', '0003_payment_intent_status_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stripe_created, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stripewebhookevent',
+            name='stripe_created',
+            field=models.DateTimeField(),
+        ),
+    ]
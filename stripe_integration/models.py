@@ -1,4 +1,7 @@
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from core.models import BaseModel, User
 from invoices.models import Invoice
 
@@ -15,31 +18,70 @@ class StripePaymentIntent(BaseModel):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     currency = models.CharField(max_length=3, default='usd')
     status = models.CharField(max_length=50)
+    status_synced_at = models.DateTimeField(null=True, blank=True)
     client_secret = models.CharField(max_length=255)
     
     # Additional fields
     payment_method_types = models.JSONField(default=list)
     metadata = models.JSONField(default=dict)
     
+    # Statuses that never change again; other statuses are refreshed from
+    # Stripe once older than PAYMENT_INTENT_STATUS_TTL
+    TERMINAL_STATUSES = ('succeeded', 'canceled')
+    # Statuses in which the customer can still pay the intent
+    REUSABLE_STATUSES = ('requires_payment_method', 'requires_confirmation', 'requires_action', 'failed')
+    # Statuses in which the customer has paid, or a payment is under way
+    PAYING_STATUSES = ('processing', 'succeeded')
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'status_synced_at'], name='payment_intent_status_idx'),
+        ]
     
     def __str__(self):
         return f"Payment Intent {self.payment_intent_id} - {self.invoice.invoice_number}"
+    
+    @property
+    def status_is_fresh(self):
+        """
+        Whether the stored status can be served without asking Stripe.
+        """
+        if self.status in self.TERMINAL_STATUSES:
+            return True
+        if self.status_synced_at is None:
+            return False
+        return timezone.now() - self.status_synced_at < timedelta(seconds=settings.PAYMENT_INTENT_STATUS_TTL)
 
 
 class StripeWebhookEvent(BaseModel):
     """
     Model for storing Stripe webhook events.
+    
+    Events are stored by the webhook view and processed asynchronously;
+    events sharing an ordering key (the invoice they refer to) are
+    processed one at a time in the order Stripe created them.
     """
     event_id = models.CharField(max_length=255, unique=True)
     event_type = models.CharField(max_length=100)
     event_data = models.JSONField()
+    ordering_key = models.CharField(max_length=255, blank=True)
+    stripe_created = models.DateTimeField()
     processed = models.BooleanField(default=False)
+    failed = models.BooleanField(default=False)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['ordering_key', 'stripe_created'],
+                condition=models.Q(processed=False, failed=False),
+                name='webhook_event_pending_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Webhook Event {self.event_id} - {self.event_type}" 
\ No newline at end of file
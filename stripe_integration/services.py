@@ -1,13 +1,24 @@
-import stripe
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from .gateways import PaymentGatewayError, get_gateway
 from .models import StripePaymentIntent, StripeWebhookEvent
 from invoices.services.invoice_service import InvoiceService
+from core.metrics import webhook_duration
 
-# Configure Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+# Webhook processing retries: exponential backoff from WEBHOOK_RETRY_DELAY
+# seconds, capped at WEBHOOK_MAX_RETRY_DELAY; the event is marked failed
+# after WEBHOOK_MAX_ATTEMPTS.
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_RETRY_DELAY = 30
+WEBHOOK_MAX_RETRY_DELAY = 3600
 
 
 class StripeService:
@@ -19,80 +30,315 @@ class StripeService:
     def create_payment_intent(invoice, user):
         """
         Create a Stripe payment intent for an invoice.
+        
+        An intent for the same amount and currency that is being paid or
+        has been paid (before its webhook marks the invoice paid) is
+        returned, so the client is never charged twice; otherwise an open
+        one is reused, so reloading the pay page does not create new
+        intents. A new one is only created when the invoice total changed
+        or earlier intents were canceled. The idempotency key is derived
+        from the invoice, amount and currency, so concurrent requests
+        create a single intent in Stripe.
         """
+        amount = invoice.total_amount
+        currency = invoice.client.currency.lower()
+        intents = StripePaymentIntent.objects.filter(invoice=invoice, amount=amount, currency=currency)
+        
+        usable_statuses = StripePaymentIntent.PAYING_STATUSES + StripePaymentIntent.REUSABLE_STATUSES
+        for statuses in (StripePaymentIntent.PAYING_STATUSES, StripePaymentIntent.REUSABLE_STATUSES):
+            existing = intents.filter(status__in=statuses).order_by('-created_at').first()
+            if existing:
+                existing = StripeService.get_payment_intent_status(existing)
+                if existing.status in usable_statuses:
+                    return existing
+        
+        # Create payment intent
+        amount_cents = int(amount * 100)  # Convert to cents
+        payment_intent = get_gateway().create_payment_intent(
+            amount=amount_cents,
+            currency=currency,
+            metadata={
+                'invoice_id': invoice.id,
+                'invoice_number': invoice.invoice_number,
+                'user_id': user.id,
+                'client_id': invoice.client.id
+            },
+            payment_method_types=['card'],
+            description=f"Payment for invoice {invoice.invoice_number}",
+            idempotency_key=f"invoice-{invoice.id}-{amount_cents}-{currency}-{intents.count()}"
+        )
+        
+        # Save to database; a concurrent request may already have saved it
+        stripe_payment_intent, _ = StripePaymentIntent.objects.get_or_create(
+            payment_intent_id=payment_intent.id,
+            defaults={
+                'user': user,
+                'invoice': invoice,
+                'amount': amount,
+                'currency': currency,
+                'status': payment_intent.status,
+                'status_synced_at': timezone.now(),
+                'client_secret': payment_intent.client_secret,
+                'payment_method_types': payment_intent.payment_method_types,
+                'metadata': payment_intent.metadata,
+            }
+        )
+        
+        return stripe_payment_intent
+    
+    @staticmethod
+    def get_payment_intent(payment_intent_id):
+        """
+        Retrieve a payment intent from the payment gateway.
+        """
+        return get_gateway().retrieve_payment_intent(payment_intent_id)
+    
+    @staticmethod
+    def get_payment_intent_status(stripe_payment_intent):
+        """
+        Return the payment intent with an up-to-date status.
+        
+        The stored status is kept current by webhooks and served as is
+        while fresh; a stale non-terminal status is fetched from the
+        gateway once and stored. If the gateway is unavailable the stored
+        status is served.
+        """
+        if stripe_payment_intent.status_is_fresh:
+            return stripe_payment_intent
+        
         try:
-            # Create payment intent
-            payment_intent = stripe.PaymentIntent.create(
-                amount=int(invoice.total_amount * 100),  # Convert to cents
-                currency=invoice.client.currency.lower(),
-                metadata={
-                    'invoice_id': invoice.id,
-                    'invoice_number': invoice.invoice_number,
-                    'user_id': user.id,
-                    'client_id': invoice.client.id
-                },
-                payment_method_types=['card'],
-                description=f"Payment for invoice {invoice.invoice_number}"
-            )
-            
-            # Save to database
-            stripe_payment_intent = StripePaymentIntent.objects.create(
-                user=user,
-                invoice=invoice,
-                payment_intent_id=payment_intent.id,
-                amount=invoice.total_amount,
-                currency=invoice.client.currency.lower(),
-                status=payment_intent.status,
-                client_secret=payment_intent.client_secret,
-                payment_method_types=payment_intent.payment_method_types,
-                metadata=payment_intent.metadata
-            )
-            
+            payment_intent = get_gateway().retrieve_payment_intent(stripe_payment_intent.payment_intent_id)
+        except PaymentGatewayError:
             return stripe_payment_intent
+        
+        stripe_payment_intent.status = payment_intent.status
+        stripe_payment_intent.status_synced_at = timezone.now()
+        stripe_payment_intent.save(update_fields=['status', 'status_synced_at', 'updated_at'])
+        return stripe_payment_intent
+    
+    @staticmethod
+    def refresh_payment_intent_statuses(batch_size=100, max_age_days=30):
+        """
+        Reconcile non-terminal payment intents created in the last
+        max_age_days whose stored status is older than
+        PAYMENT_INTENT_STATUS_TTL. Returns the number whose status changed.
+        """
+        now = timezone.now()
+        stale = StripePaymentIntent.objects.exclude(
+            status__in=StripePaymentIntent.TERMINAL_STATUSES
+        ).filter(
+            Q(status_synced_at__isnull=True) |
+            Q(status_synced_at__lt=now - timedelta(seconds=settings.PAYMENT_INTENT_STATUS_TTL)),
+            created_at__gte=now - timedelta(days=max_age_days)
+        )
+        
+        report = StripeService.reconcile_payment_intents(stale, batch_size=batch_size)
+        return sum(report['status_changes'].values())
+    
+    @staticmethod
+    def reconcile_payment_intents(queryset=None, batch_size=100, concurrency=8, dry_run=False, max_age_days=None):
+        """
+        Compare stored payment intents with the gateway and repair drift.
+        
+        Pages through ``queryset`` (by default every non-terminal intent
+        created in the last ``max_age_days``, PAYMENT_RECONCILE_MAX_AGE_DAYS
+        unless given, so abandoned intents drop out) by primary key, fetching each page from the gateway with at most
+        ``concurrency`` requests in flight. Per page, statuses are stored
+        with one bulk update and invoices whose intent succeeded without
+        the invoice being marked paid (a missed webhook) are marked paid in
+        one UPDATE. With dry_run nothing is written.
+        
+        Returns a report of intents checked, gateway errors, status
+        changes by transition and the invoice numbers marked paid.
+        """
+        if queryset is None:
+            if max_age_days is None:
+                max_age_days = settings.PAYMENT_RECONCILE_MAX_AGE_DAYS
+            queryset = StripePaymentIntent.objects.exclude(
+                status__in=StripePaymentIntent.TERMINAL_STATUSES
+            ).filter(created_at__gte=timezone.now() - timedelta(days=max_age_days))
+        queryset = queryset.select_related('invoice').only(
+            'pk', 'payment_intent_id', 'status', 'invoice', 'invoice__status', 'invoice__invoice_number'
+        ).order_by('pk')
+        
+        gateway = get_gateway()
+        report = {'checked': 0, 'errors': 0, 'status_changes': {}, 'invoices_marked_paid': []}
+        
+        def fetch_status(payment_intent_id):
+            try:
+                return gateway.retrieve_payment_intent(payment_intent_id).status
+            except PaymentGatewayError as e:
+                return e
+        
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                
+                statuses = executor.map(fetch_status, [intent.payment_intent_id for intent in batch])
+                synced_at = timezone.now()
+                synced = []
+                payments = {}
+                for stripe_payment_intent, status in zip(batch, statuses):
+                    if isinstance(status, PaymentGatewayError):
+                        report['errors'] += 1
+                        print(f"Could not fetch payment intent {stripe_payment_intent.payment_intent_id}: {str(status)}")
+                        continue
+                    
+                    report['checked'] += 1
+                    if status != stripe_payment_intent.status:
+                        transition = f"{stripe_payment_intent.status}->{status}"
+                        report['status_changes'][transition] = report['status_changes'].get(transition, 0) + 1
+                    if status == 'succeeded' and stripe_payment_intent.invoice.status != 'paid':
+                        payments[stripe_payment_intent.invoice_id] = stripe_payment_intent.payment_intent_id
+                        report['invoices_marked_paid'].append(stripe_payment_intent.invoice.invoice_number)
+                    
+                    stripe_payment_intent.status = status
+                    stripe_payment_intent.status_synced_at = synced_at
+                    synced.append(stripe_payment_intent)
+                
+                if not dry_run:
+                    with transaction.atomic():
+                        StripePaymentIntent.objects.bulk_update(synced, ['status', 'status_synced_at'])
+                        InvoiceService.mark_invoices_paid(payments, payment_method='stripe')
+        
+        return report
+    
+    @staticmethod
+    def record_webhook_event(event):
+        """
+        Store a verified webhook event for asynchronous processing.
+        
+        Returns (webhook_event, created); an event Stripe delivers again is
+        found by its unique event_id and not stored twice. Events are keyed
+        by the invoice in the payment object's metadata, falling back to
+        the object id, so that events for one invoice are processed in the
+        order Stripe created them; an event without a creation time is
+        ordered by the time it was received.
+        """
+        event_object = event['data']['object']
+        invoice_id = (event_object.get('metadata') or {}).get('invoice_id')
+        
+        return StripeWebhookEvent.objects.get_or_create(
+            event_id=event['id'],
+            defaults={
+                'event_type': event['type'],
+                'event_data': event,
+                'ordering_key': f"invoice:{invoice_id}" if invoice_id else event_object.get('id', event['id']),
+                'stripe_created': datetime.fromtimestamp(event['created'], tz=dt_timezone.utc) if event.get('created') else timezone.now(),
+            }
+        )
+    
+    @staticmethod
+    def pending_webhook_events(now=None):
+        """
+        Events that are due for processing.
+        
+        Only the oldest unfinished event of each ordering key is returned,
+        so a later event never overtakes one that is waiting for a retry
+        or being processed by another worker.
+        """
+        now = now or timezone.now()
+        unfinished = StripeWebhookEvent.objects.filter(processed=False, failed=False)
+        earlier = unfinished.filter(ordering_key=OuterRef('ordering_key')).filter(
+            Q(stripe_created__lt=OuterRef('stripe_created')) |
+            Q(stripe_created=OuterRef('stripe_created'), pk__lt=OuterRef('pk'))
+        )
+        
+        return unfinished.filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+        ).exclude(Exists(earlier)).order_by('stripe_created', 'pk')
+    
+    @staticmethod
+    def process_pending_webhook_events(batch_size=50):
+        """
+        Process due webhook events in batches until none are left.
+        
+        Each batch is locked with SKIP LOCKED so several workers can drain
+        the queue concurrently; each event runs in its own savepoint and
+        failures are rescheduled with exponential backoff.
+        """
+        processed = failed = 0
+        
+        while True:
+            with transaction.atomic():
+                events = list(
+                    StripeService.pending_webhook_events().select_for_update(skip_locked=True)[:batch_size]
+                )
+                for webhook_event in events:
+                    try:
+                        with transaction.atomic():
+                            StripeService.process_webhook_event(webhook_event)
+                        processed += 1
+                    except Exception as e:
+                        StripeService._schedule_retry(webhook_event, e)
+                        failed += 1
             
-        except stripe.error.StripeError as e:
-            raise Exception(f"Stripe error: {str(e)}")
+            if not events:
+                break
+        
+        return processed, failed
     
     @staticmethod
-    def get_payment_intent(payment_intent_id):
+    def replay_webhook_events(queryset):
         """
-        Retrieve a payment intent from Stripe.
+        Queue failed or retrying webhook events for reprocessing from their
+        stored event data, clearing their retry state in one UPDATE.
+        
+        Returns the number of events queued.
         """
-        try:
-            return stripe.PaymentIntent.retrieve(payment_intent_id)
-        except stripe.error.StripeError as e:
-            raise Exception(f"Stripe error: {str(e)}")
+        return queryset.filter(processed=False).filter(
+            Q(failed=True) | Q(attempts__gt=0)
+        ).update(
+            failed=False,
+            attempts=0,
+            next_attempt_at=None,
+            updated_at=timezone.now()
+        )
     
     @staticmethod
-    def process_webhook_event(event_data, event_type):
+    def process_webhook_event(webhook_event):
         """
-        Process a Stripe webhook event.
+        Process a stored Stripe webhook event.
         """
+        started_at = time.perf_counter()
         try:
-            # Save webhook event
-            webhook_event = StripeWebhookEvent.objects.create(
-                event_id=event_data['id'],
-                event_type=event_type,
-                event_data=event_data
-            )
-            
             # Process based on event type
-            if event_type == 'payment_intent.succeeded':
-                StripeService._handle_payment_success(event_data)
-            elif event_type == 'payment_intent.payment_failed':
-                StripeService._handle_payment_failure(event_data)
+            if webhook_event.event_type == 'payment_intent.succeeded':
+                StripeService._handle_payment_success(webhook_event.event_data)
+            elif webhook_event.event_type == 'payment_intent.payment_failed':
+                StripeService._handle_payment_failure(webhook_event.event_data)
+            elif webhook_event.event_type.startswith('payment_intent.'):
+                StripeService._handle_payment_status_change(webhook_event.event_data)
             
             # Mark as processed
             webhook_event.processed = True
-            webhook_event.save()
+            webhook_event.next_attempt_at = None
+            webhook_event.error_message = ''
+            webhook_event.save(update_fields=['processed', 'next_attempt_at', 'error_message', 'updated_at'])
             
             return webhook_event
-            
-        except Exception as e:
-            if webhook_event:
-                webhook_event.error_message = str(e)
-                webhook_event.save()
-            raise e
+        finally:
+            webhook_duration.observe(time.perf_counter() - started_at, event_type=webhook_event.event_type)
+    
+    @staticmethod
+    def _schedule_retry(webhook_event, error):
+        """
+        Record a processing failure and schedule the next attempt.
+        """
+        webhook_event.attempts += 1
+        webhook_event.error_message = str(error)
+        webhook_event.processed = False
+        if webhook_event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+            webhook_event.failed = True
+            webhook_event.next_attempt_at = None
+        else:
+            delay = min(WEBHOOK_RETRY_DELAY * 2 ** (webhook_event.attempts - 1), WEBHOOK_MAX_RETRY_DELAY)
+            webhook_event.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        webhook_event.save(update_fields=['attempts', 'error_message', 'processed', 'failed', 'next_attempt_at', 'updated_at'])
     
     @staticmethod
     def _handle_payment_success(event_data):
@@ -103,16 +349,23 @@ class StripeService:
         
         try:
             # Find our payment intent record
-            stripe_payment_intent = StripePaymentIntent.objects.get(
+            stripe_payment_intent = StripePaymentIntent.objects.select_related('invoice').get(
                 payment_intent_id=payment_intent_id
             )
             
-            # Mark invoice as paid
-            InvoiceService.mark_as_paid(
-                invoice=stripe_payment_intent.invoice,
-                payment_method='stripe',
-                stripe_payment_intent_id=payment_intent_id
-            )
+            # Update status
+            stripe_payment_intent.status = 'succeeded'
+            stripe_payment_intent.status_synced_at = timezone.now()
+            stripe_payment_intent.save(update_fields=['status', 'status_synced_at', 'updated_at'])
+            
+            # Mark invoice as paid; replayed events leave it untouched
+            invoice = stripe_payment_intent.invoice
+            if invoice.status != 'paid':
+                InvoiceService.mark_as_paid(
+                    invoice=invoice,
+                    payment_method='stripe',
+                    stripe_payment_intent_id=payment_intent_id
+                )
             
         except StripePaymentIntent.DoesNotExist:
             raise Exception(f"Payment intent {payment_intent_id} not found in database")
@@ -132,42 +385,49 @@ class StripeService:
             
             # Update status
             stripe_payment_intent.status = 'failed'
+            stripe_payment_intent.status_synced_at = timezone.now()
             stripe_payment_intent.save()
             
         except StripePaymentIntent.DoesNotExist:
             raise Exception(f"Payment intent {payment_intent_id} not found in database")
     
+    @staticmethod
+    def _handle_payment_status_change(event_data):
+        """
+        Store the status carried by any other payment intent event.
+        """
+        payment_intent = event_data['data']['object']
+        if 'status' in payment_intent:
+            StripePaymentIntent.objects.filter(payment_intent_id=payment_intent['id']).update(
+                status=payment_intent['status'],
+                status_synced_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+    
     @staticmethod
     def create_checkout_session(invoice, user, success_url, cancel_url):
         """
         Create a Stripe checkout session for an invoice.
         """
-        try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                line_items=[{
-                    'price_data': {
-                        'currency': invoice.client.currency.lower(),
-                        'product_data': {
-                            'name': f'Invoice {invoice.invoice_number}',
-                            'description': f'Payment for invoice {invoice.invoice_number}',
-                        },
-                        'unit_amount': int(invoice.total_amount * 100),
+        return get_gateway().create_checkout_session(
+            payment_method_types=['card'],
+            line_items=[{
+                'price_data': {
+                    'currency': invoice.client.currency.lower(),
+                    'product_data': {
+                        'name': f'Invoice {invoice.invoice_number}',
+                        'description': f'Payment for invoice {invoice.invoice_number}',
                     },
-                    'quantity': 1,
-                }],
-                mode='payment',
-                success_url=success_url,
-                cancel_url=cancel_url,
-                metadata={
-                    'invoice_id': invoice.id,
-                    'invoice_number': invoice.invoice_number,
-                    'user_id': user.id,
-                    'client_id': invoice.client.id
-                }
-            )
-            
-            return session
-            
-        except stripe.error.StripeError as e:
-            raise Exception(f"Stripe error: {str(e)}") 
\ No newline at end of file
+                    'unit_amount': int(invoice.total_amount * 100),
+                },
+                'quantity': 1,
+            }],
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata={
+                'invoice_id': invoice.id,
+                'invoice_number': invoice.invoice_number,
+                'user_id': user.id,
+                'client_id': invoice.client.id
+            }
+        )
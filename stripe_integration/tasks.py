@@ -0,0 +1,38 @@
+from celery import shared_task
+from .services import StripeService
+
+
+@shared_task
+def process_webhook_events():
+    """
+    Task to process stored Stripe webhook events.
+    """
+    processed, failed = StripeService.process_pending_webhook_events()
+    if processed or failed:
+        print(f"Processed {processed} webhook events, {failed} failed")
+    return processed
+
+
+@shared_task
+def refresh_payment_intent_statuses():
+    """
+    Task to refresh stale statuses of open payment intents from Stripe.
+    """
+    changed = StripeService.refresh_payment_intent_statuses()
+    print(f"Refreshed payment intent statuses, {changed} changed")
+    return changed
+
+
+@shared_task
+def reconcile_payments():
+    """
+    Task to reconcile open payment intents with Stripe and mark invoices
+    paid whose payment webhooks were missed.
+    """
+    report = StripeService.reconcile_payment_intents()
+    print(
+        f"Reconciled {report['checked']} payment intents ({report['errors']} errors), "
+        f"status changes: {report['status_changes']}, "
+        f"invoices marked paid: {report['invoices_marked_paid']}"
+    )
+    return report
@@ -0,0 +1,327 @@
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from clients.models import Client
+from invoices.models import Invoice
+from .gateways import FakeGateway, reset_gateway, sign_webhook_payload
+from .models import StripePaymentIntent, StripeWebhookEvent
+from .services import StripeService, WEBHOOK_MAX_ATTEMPTS
+
+User = get_user_model()
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+class WebhookTestCase(TestCase):
+    """Base test case with an invoice awaiting a Stripe payment."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.invoice = Invoice.objects.create(
+            user=self.user,
+            client=self.client_obj,
+            due_date=timezone.now().date() + timedelta(days=30),
+            status='sent',
+            subtotal=Decimal('100.00'),
+            tax_rate=Decimal('0.00'),
+            discount_rate=Decimal('0.00')
+        )
+        self.payment_intent = StripePaymentIntent.objects.create(
+            user=self.user,
+            invoice=self.invoice,
+            payment_intent_id='pi_123',
+            amount=self.invoice.total_amount,
+            status='requires_payment_method',
+            client_secret='pi_123_secret'
+        )
+        self.created = int(time.time())
+
+    def event(self, event_id, event_type, payment_intent_id='pi_123', created=None):
+        return {
+            'id': event_id,
+            'object': 'event',
+            'type': event_type,
+            'created': created or self.created,
+            'data': {'object': {
+                'id': payment_intent_id,
+                'object': 'payment_intent',
+                'metadata': {'invoice_id': str(self.invoice.id)},
+            }},
+        }
+
+
+class WebhookQueueTest(WebhookTestCase):
+    """Test cases for asynchronous webhook processing."""
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_view_stores_event_without_processing(self):
+        """Test the webhook view stores the event and defers processing to commit."""
+        payload = json.dumps(self.event('evt_1', 'payment_intent.succeeded'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                reverse('stripe-webhook'), payload, content_type='application/json',
+                HTTP_STRIPE_SIGNATURE=sign_webhook_payload(payload, WEBHOOK_SECRET)
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(callbacks), 1)
+        webhook_event = StripeWebhookEvent.objects.get(event_id='evt_1')
+        self.assertFalse(webhook_event.processed)
+        self.assertEqual(webhook_event.ordering_key, f'invoice:{self.invoice.id}')
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'sent')
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_view_rejects_invalid_signature(self):
+        """Test a payload with a bad signature is rejected and not stored."""
+        payload = json.dumps(self.event('evt_1', 'payment_intent.succeeded'))
+        response = self.client.post(
+            reverse('stripe-webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign_webhook_payload(payload, 'whsec_other')
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeWebhookEvent.objects.exists())
+
+    def test_processes_events_for_an_invoice_in_order(self):
+        """Test events for one invoice are processed in the order Stripe created them."""
+        StripeService.record_webhook_event(self.event('evt_2', 'payment_intent.succeeded', created=self.created + 5))
+        StripeService.record_webhook_event(self.event('evt_1', 'payment_intent.payment_failed'))
+
+        self.assertEqual([e.event_id for e in StripeService.pending_webhook_events()], ['evt_1'])
+        self.assertEqual(StripeService.process_pending_webhook_events(batch_size=1), (2, 0))
+
+        self.payment_intent.refresh_from_db()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.payment_intent.status, 'succeeded')
+        self.assertEqual(self.invoice.status, 'paid')
+
+    def test_failed_event_is_retried_with_backoff_and_blocks_later_events(self):
+        """Test a failing event is retried with backoff and holds back later events."""
+        StripeService.record_webhook_event(self.event('evt_1', 'payment_intent.succeeded', payment_intent_id='pi_missing'))
+        StripeService.record_webhook_event(self.event('evt_2', 'payment_intent.succeeded', created=self.created + 5))
+
+        self.assertEqual(StripeService.process_pending_webhook_events(), (0, 1))
+        webhook_event = StripeWebhookEvent.objects.get(event_id='evt_1')
+        self.assertEqual(webhook_event.attempts, 1)
+        self.assertIn('pi_missing', webhook_event.error_message)
+        self.assertGreater(webhook_event.next_attempt_at, timezone.now())
+        self.assertFalse(StripeService.pending_webhook_events().exists())
+
+        StripeWebhookEvent.objects.filter(event_id='evt_1').update(attempts=WEBHOOK_MAX_ATTEMPTS - 1, next_attempt_at=None)
+        self.assertEqual(StripeService.process_pending_webhook_events(), (1, 1))
+        self.assertTrue(StripeWebhookEvent.objects.get(event_id='evt_1').failed)
+        self.assertTrue(StripeWebhookEvent.objects.get(event_id='evt_2').processed)
+
+    def test_event_without_created_is_ordered_by_receive_time(self):
+        """Test that an event without a creation time still waits for earlier events."""
+        StripeService.record_webhook_event(self.event('evt_1', 'payment_intent.payment_failed', created=self.created - 60))
+        event = self.event('evt_2', 'payment_intent.succeeded')
+        del event['created']
+        webhook_event, _ = StripeService.record_webhook_event(event)
+
+        self.assertIsNotNone(webhook_event.stripe_created)
+        self.assertEqual([e.event_id for e in StripeService.pending_webhook_events()], ['evt_1'])
+        self.assertEqual(StripeService.process_pending_webhook_events(batch_size=1), (2, 0))
+        self.payment_intent.refresh_from_db()
+        self.assertEqual(self.payment_intent.status, 'succeeded')
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_redelivered_event_is_stored_once(self):
+        """Test an event Stripe delivers twice is stored and queued once."""
+        payload = json.dumps(self.event('evt_1', 'payment_intent.succeeded'))
+        for expected_callbacks in (1, 0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(
+                    reverse('stripe-webhook'), payload, content_type='application/json',
+                    HTTP_STRIPE_SIGNATURE=sign_webhook_payload(payload, WEBHOOK_SECRET)
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(callbacks), expected_callbacks)
+
+        self.assertEqual(StripeWebhookEvent.objects.filter(event_id='evt_1').count(), 1)
+
+    def test_replay_reprocesses_failed_events(self):
+        """Test replay_webhook_events requeues and processes failed events."""
+        webhook_event, _ = StripeService.record_webhook_event(self.event('evt_1', 'payment_intent.succeeded'))
+        StripeService.record_webhook_event(self.event('evt_2', 'payment_intent.created'))
+        StripeWebhookEvent.objects.filter(pk=webhook_event.pk).update(
+            failed=True, attempts=WEBHOOK_MAX_ATTEMPTS, error_message='Payment intent pi_123 not found in database'
+        )
+
+        self.assertEqual(StripeService.replay_webhook_events(StripeWebhookEvent.objects.all()), 1)
+        self.assertEqual(StripeService.process_pending_webhook_events(), (2, 0))
+
+        webhook_event.refresh_from_db()
+        self.invoice.refresh_from_db()
+        self.assertTrue(webhook_event.processed)
+        self.assertEqual(webhook_event.error_message, '')
+        self.assertEqual(self.invoice.status, 'paid')
+
+
+@override_settings(
+    PAYMENT_GATEWAY='stripe_integration.gateways.FakeGateway',
+    PAYMENT_GATEWAY_LATENCY=0,
+    PAYMENT_GATEWAY_WEBHOOK_URL='',
+    STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET
+)
+class FakeGatewayTest(WebhookTestCase):
+    """Test cases for the payment flow against the in-process gateway."""
+
+    def setUp(self):
+        super().setUp()
+        self.payment_intent.delete()
+        reset_gateway(setting='PAYMENT_GATEWAY')
+
+    def test_payment_flow(self):
+        """Test creating, confirming and retrieving a payment intent."""
+        from .gateways import get_gateway
+
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        response = api_client.post(
+            reverse('stripe-create-payment-intent'), {'invoice_id': self.invoice.id}, secure=True
+        )
+        self.assertEqual(response.status_code, 201)
+        payment_intent_id = response.json()['payment_intent']['payment_intent_id']
+        self.assertTrue(payment_intent_id.startswith('pi_fake_'))
+
+        gateway = get_gateway()
+        self.assertIsInstance(gateway, FakeGateway)
+        self.assertEqual(gateway.confirm_payment_intent(payment_intent_id), 200)
+        self.assertEqual(StripeService.process_pending_webhook_events(), (1, 0))
+
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'paid')
+        self.assertEqual(self.invoice.stripe_payment_intent_id, payment_intent_id)
+
+    def test_idempotency_key_is_honoured_concurrently(self):
+        """Test concurrent creates with one idempotency key return one intent."""
+        from concurrent.futures import ThreadPoolExecutor
+        from .gateways import PaymentGateway
+
+        with self.assertRaises(TypeError):
+            PaymentGateway()
+
+        gateway = FakeGateway(latency=0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            intents = list(executor.map(lambda _: gateway.create_payment_intent(
+                amount=10000, currency='usd', metadata={}, description='Invoice',
+                payment_method_types=['card'], idempotency_key='invoice-1-10000-usd-0'
+            ), range(16)))
+        self.assertEqual(len({intent.id for intent in intents}), 1)
+        self.assertEqual(len(gateway.payment_intents), 1)
+
+    def test_unknown_payment_intent(self):
+        """Test retrieving an unknown payment intent raises an error."""
+        from .gateways import PaymentGatewayError, get_gateway
+
+        with self.assertRaises(PaymentGatewayError):
+            get_gateway().retrieve_payment_intent('pi_unknown')
+
+    def create_payment_intent(self):
+        from .gateways import get_gateway
+
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        response = api_client.post(
+            reverse('stripe-create-payment-intent'), {'invoice_id': self.invoice.id}, secure=True
+        )
+        return api_client, get_gateway(), StripePaymentIntent.objects.get(
+            payment_intent_id=response.json()['payment_intent']['payment_intent_id']
+        )
+
+    def test_status_is_served_from_database_while_fresh(self):
+        """Test a recently synced status is returned without calling the gateway."""
+        api_client, gateway, stripe_payment_intent = self.create_payment_intent()
+        url = reverse('stripe-payment-intent-status', args=[stripe_payment_intent.payment_intent_id])
+        gateway.payment_intents[stripe_payment_intent.payment_intent_id]['status'] = 'processing'
+
+        self.assertEqual(api_client.get(url, secure=True).json()['status'], 'requires_payment_method')
+
+        StripePaymentIntent.objects.filter(pk=stripe_payment_intent.pk).update(
+            status_synced_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(api_client.get(url, secure=True).json()['status'], 'processing')
+        stripe_payment_intent.refresh_from_db()
+        self.assertEqual(stripe_payment_intent.status, 'processing')
+        self.assertTrue(stripe_payment_intent.status_is_fresh)
+
+    def test_refresh_updates_stale_open_intents(self):
+        """Test refresh_payment_intent_statuses syncs stale open intents only."""
+        _, gateway, stripe_payment_intent = self.create_payment_intent()
+        gateway.payment_intents[stripe_payment_intent.payment_intent_id]['status'] = 'canceled'
+
+        self.assertEqual(StripeService.refresh_payment_intent_statuses(), 0)
+        StripePaymentIntent.objects.update(status_synced_at=None)
+        self.assertEqual(StripeService.refresh_payment_intent_statuses(), 1)
+
+        stripe_payment_intent.refresh_from_db()
+        self.assertEqual(stripe_payment_intent.status, 'canceled')
+
+    def test_open_intent_is_reused_until_total_changes(self):
+        """Test an open intent is reused until the invoice total changes."""
+        _, gateway, first = self.create_payment_intent()
+        _, _, second = self.create_payment_intent()
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(len(gateway.payment_intents), 1)
+
+        Invoice.objects.filter(pk=self.invoice.pk).update(total_amount=Decimal('150.00'))
+        self.invoice.refresh_from_db()
+        _, _, third = self.create_payment_intent()
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(third.amount, Decimal('150.00'))
+        self.assertEqual(gateway.payment_intents[third.payment_intent_id]['amount'], 15000)
+
+    def test_intents_being_paid_are_not_duplicated(self):
+        """Test a processing or succeeded intent is returned instead of a new one."""
+        _, gateway, first = self.create_payment_intent()
+        for payment_status in StripePaymentIntent.PAYING_STATUSES:
+            gateway.payment_intents[first.payment_intent_id]['status'] = payment_status
+            StripePaymentIntent.objects.filter(pk=first.pk).update(status=payment_status)
+            _, _, second = self.create_payment_intent()
+            self.assertEqual(second.pk, first.pk)
+            self.assertEqual(second.status, payment_status)
+        self.assertEqual(len(gateway.payment_intents), 1)
+
+    def test_reconciliation_marks_missed_payments(self):
+        """Test reconciliation marks invoices paid for succeeded intents."""
+        _, gateway, stripe_payment_intent = self.create_payment_intent()
+        gateway.payment_intents[stripe_payment_intent.payment_intent_id]['status'] = 'succeeded'
+
+        report = StripeService.reconcile_payment_intents(dry_run=True)
+        self.assertEqual(report['invoices_marked_paid'], [self.invoice.invoice_number])
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'sent')
+
+        report = StripeService.reconcile_payment_intents(batch_size=1, concurrency=2)
+        self.assertEqual(report['checked'], 1)
+        self.assertEqual(report['status_changes'], {'requires_payment_method->succeeded': 1})
+        self.invoice.refresh_from_db()
+        stripe_payment_intent.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'paid')
+        self.assertEqual(self.invoice.stripe_payment_intent_id, stripe_payment_intent.payment_intent_id)
+        self.assertEqual(stripe_payment_intent.status, 'succeeded')
+        self.assertEqual(StripeService.reconcile_payment_intents()['checked'], 0)
+
+    @override_settings(PAYMENT_RECONCILE_MAX_AGE_DAYS=30)
+    def test_reconciliation_skips_abandoned_intents(self):
+        """Test intents older than PAYMENT_RECONCILE_MAX_AGE_DAYS are not fetched."""
+        _, gateway, stripe_payment_intent = self.create_payment_intent()
+        gateway.payment_intents[stripe_payment_intent.payment_intent_id]['status'] = 'succeeded'
+        StripePaymentIntent.objects.filter(pk=stripe_payment_intent.pk).update(
+            created_at=timezone.now() - timedelta(days=31)
+        )
+
+        self.assertEqual(StripeService.reconcile_payment_intents()['checked'], 0)
+        self.assertEqual(StripeService.reconcile_payment_intents(max_age_days=60)['checked'], 1)
@@ -8,6 +8,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.http import HttpResponse
 from django.conf import settings
+from django.db import transaction
 from .models import StripePaymentIntent, StripeWebhookEvent
 from .serializers import (
     StripePaymentIntentSerializer,
@@ -15,6 +16,7 @@ from .serializers import (
     CreateCheckoutSessionSerializer
 )
 from .services import StripeService
+from .tasks import process_webhook_events
 
 # Configure Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -90,17 +92,21 @@ def get_payment_intent_status(request, payment_intent_id):
     View for getting payment intent status.
     """
     try:
-        payment_intent = StripeService.get_payment_intent(payment_intent_id)
-        
-        return Response({
-            'payment_intent_id': payment_intent.id,
-            'status': payment_intent.status,
-            'amount': payment_intent.amount / 100,  # Convert from cents
-            'currency': payment_intent.currency
-        })
-        
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        stripe_payment_intent = StripePaymentIntent.objects.get(
+            payment_intent_id=payment_intent_id,
+            user=request.user
+        )
+    except StripePaymentIntent.DoesNotExist:
+        return Response({'error': 'Payment intent not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    stripe_payment_intent = StripeService.get_payment_intent_status(stripe_payment_intent)
+    
+    return Response({
+        'payment_intent_id': stripe_payment_intent.payment_intent_id,
+        'status': stripe_payment_intent.status,
+        'amount': float(stripe_payment_intent.amount),
+        'currency': stripe_payment_intent.currency
+    })
 
 
 @csrf_exempt
@@ -113,25 +119,39 @@ def stripe_webhook(request):
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
     try:
-        # Verify webhook signature
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+        # Verify webhook signature; the event is stored as plain JSON
+        stripe.WebhookSignature.verify_header(
+            payload.decode('utf-8'), sig_header or '', settings.STRIPE_WEBHOOK_SECRET,
+            stripe.Webhook.DEFAULT_TOLERANCE
         )
-        
-        # Process the event
-        StripeService.process_webhook_event(event.data, event.type)
-        
-        return HttpResponse(status=200)
-        
+        event = json.loads(payload)
     except ValueError as e:
         # Invalid payload
         return HttpResponse(status=400)
     except stripe.error.SignatureVerificationError as e:
         # Invalid signature
         return HttpResponse(status=400)
+    
+    try:
+        # Store the event; it is processed by the process_webhook_events task
+        webhook_event, created = StripeService.record_webhook_event(event)
     except Exception as e:
         # Other errors
         return HttpResponse(status=500)
+    
+    # Redeliveries of a stored event are acknowledged without queueing it again
+    if created:
+        transaction.on_commit(_enqueue_webhook_processing)
+    
+    return HttpResponse(status=200)
+
+
+def _enqueue_webhook_processing():
+    try:
+        process_webhook_events.delay()
+    except Exception as e:
+        # The periodic run picks the event up if the broker is unavailable
+        print(f"Could not enqueue webhook processing: {str(e)}")
 
 
 @api_view(['GET'])
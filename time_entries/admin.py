@@ -1,14 +1,14 @@
 from django.contrib import admin
-from .models import TimeEntry
+from .models import Tag, TimeEntry
 
 
 @admin.register(TimeEntry)
 class TimeEntryAdmin(admin.ModelAdmin):
     list_display = ('project', 'user', 'date', 'hours', 'hourly_rate', 'total_amount', 'is_billable')
-    list_filter = ('date', 'is_billable', 'project__client', 'user', 'created_at')
+    list_filter = ('date', 'is_billable', ('invoice', admin.EmptyFieldListFilter), 'project__client', 'user', 'created_at')
     search_fields = ('description', 'project__name', 'user__email', 'tags')
     list_editable = ('is_billable',)
-    readonly_fields = ('created_at', 'updated_at', 'total_amount')
+    readonly_fields = ('created_at', 'updated_at', 'total_amount', 'invoice', 'invoice_item')
     date_hierarchy = 'date'
     
     fieldsets = (
@@ -21,6 +21,9 @@ class TimeEntryAdmin(admin.ModelAdmin):
         ('Additional Info', {
             'fields': ('tags',)
         }),
+        ('Billing', {
+            'fields': ('invoice', 'invoice_item')
+        }),
         ('Calculated Fields', {
             'fields': ('total_amount',),
             'classes': ('collapse',)
@@ -32,4 +35,13 @@ class TimeEntryAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('project', 'user', 'project__client') 
\ No newline at end of file
+        return super().get_queryset(request).select_related('project', 'user', 'project__client')
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user')
+    search_fields = ('name', 'user__email')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
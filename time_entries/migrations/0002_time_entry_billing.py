@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0002_invoice_status_due_idx'),
+        ('projects', '0001_initial'),
+        ('time_entries', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeentry',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='time_entries', to='invoices.invoice'),
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='invoice_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='invoices.invoiceitem'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(condition=models.Q(('invoice__isnull', True), ('is_billable', True)), fields=['user', 'date'], name='time_entry_unbilled_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_entries', '0002_time_entry_billing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timeentry',
+            name='tags',
+            field=models.CharField(blank=True, help_text='Comma-separated', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TimeEntryTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_entry_links', to='time_entries.tag')),
+                ('time_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='time_entries.timeentry')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='normalized_tags',
+            field=models.ManyToManyField(blank=True, related_name='time_entries', through='time_entries.TimeEntryTag', to='time_entries.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='tag_user_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeentrytag',
+            constraint=models.UniqueConstraint(fields=('tag', 'time_entry'), name='time_entry_tag_uniq'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+NAME_MAX_LENGTH = 50
+
+
+def parse_tags(value):
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip().lower()[:NAME_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def backfill_tags(apps, schema_editor):
+    """
+    Build Tag and TimeEntryTag rows from the comma-separated tags of
+    existing entries, BATCH_SIZE entries at a time in primary key order.
+    """
+    TimeEntry = apps.get_model('time_entries', 'TimeEntry')
+    Tag = apps.get_model('time_entries', 'Tag')
+    TimeEntryTag = apps.get_model('time_entries', 'TimeEntryTag')
+
+    last_pk = 0
+    while True:
+        batch = list(
+            TimeEntry.objects.filter(pk__gt=last_pk).exclude(tags='')
+            .order_by('pk').values_list('pk', 'user_id', 'tags')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+
+        wanted = [(entry_id, user_id, parse_tags(tags)) for entry_id, user_id, tags in batch]
+        tag_keys = {(user_id, name) for _, user_id, names in wanted for name in names}
+        if not tag_keys:
+            continue
+        Tag.objects.bulk_create(
+            [Tag(user_id=user_id, name=name) for user_id, name in tag_keys], ignore_conflicts=True
+        )
+        tag_ids = {
+            (user_id, name): tag_id for tag_id, user_id, name in Tag.objects.filter(
+                user_id__in={user_id for user_id, _ in tag_keys},
+                name__in={name for _, name in tag_keys}
+            ).values_list('id', 'user_id', 'name')
+        }
+        TimeEntryTag.objects.bulk_create([
+            TimeEntryTag(time_entry_id=entry_id, tag_id=tag_ids[(user_id, name)])
+            for entry_id, user_id, names in wanted for name in names
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    # Commit each batch on its own; re-running skips rows already linked
+    atomic = False
+
+    dependencies = [
+        ('time_entries', '0003_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-19 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_span_index(apps, schema_editor):
+    """
+    On PostgreSQL, index each timed entry's tsrange per user for
+    TimeRangeOverlaps; btree_gist lets the GiST index include user_id.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS time_entry_span_gist ON time_entries_timeentry '
+        'USING gist (user_id, tsrange(date + start_time, date + end_time)) '
+        'WHERE start_time < end_time'
+    )
+
+
+def drop_span_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS time_entry_span_gist')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0003_tax_lines'),
+        ('projects', '0001_initial'),
+        ('time_entries', '0004_backfill_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'date', 'start_time'], name='time_entry_user_day_idx'),
+        ),
+        migrations.RunPython(create_span_index, drop_span_index),
+    ]
@@ -1,10 +1,83 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from core.functions import TimeRangeOverlaps
 from core.models import BaseModel, User
+from core.rates import get_rate_card
 from projects.models import Project
 
 
+def parse_tags(value):
+    """
+    Split a comma-separated tag string into unique, lowercased names.
+    """
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip().lower()[:Tag.NAME_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class Tag(models.Model):
+    """
+    Normalized time entry tag, unique per user.
+    """
+    NAME_MAX_LENGTH = 50
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tags')
+    name = models.CharField(max_length=NAME_MAX_LENGTH)
+    
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='tag_user_name_uniq'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
+class TimeEntryQuerySet(models.QuerySet):
+    """
+    QuerySet for time entries.
+    """
+    
+    def unbilled(self):
+        """
+        Filter to billable entries that are not on an invoice yet, which
+        is the predicate of the time_entry_unbilled_idx partial index.
+        """
+        return self.filter(is_billable=True, invoice__isnull=True)
+    
+    def timed(self):
+        """
+        Filter to entries with a start and end time, which is the
+        predicate of the PostgreSQL time_entry_span_gist index.
+        """
+        return self.filter(start_time__lt=models.F('end_time'))
+    
+    def overlapping(self, date, start_time, end_time):
+        """
+        Filter to timed entries on ``date`` whose [start_time, end_time)
+        overlaps the given range.
+        """
+        return self.timed().filter(date=date).filter(TimeRangeOverlaps(
+            models.F('date'), models.F('start_time'), models.F('end_time'),
+            models.Value(date), models.Value(start_time), models.Value(end_time)
+        ))
+    
+    def tagged(self, user, *names):
+        """
+        Filter to entries carrying every one of the given tags, through
+        the tag indexes rather than a LIKE scan of ``tags``.
+        """
+        queryset = self
+        for name in parse_tags(','.join(names)):
+            queryset = queryset.filter(tag_links__tag__in=Tag.objects.filter(user=user, name=name))
+        return queryset
+
+
 class TimeEntry(BaseModel):
     """
     Model for storing time entries.
@@ -24,20 +97,51 @@ class TimeEntry(BaseModel):
     start_time = models.TimeField(null=True, blank=True)
     end_time = models.TimeField(null=True, blank=True)
     is_billable = models.BooleanField(default=True)
-    tags = models.CharField(max_length=255, blank=True)
+    tags = models.CharField(max_length=255, blank=True, help_text='Comma-separated')
+    # Index of ``tags``, kept in sync on save (see TimeEntryTag.sync)
+    normalized_tags = models.ManyToManyField(Tag, through='TimeEntryTag', related_name='time_entries', blank=True)
+    
+    # Billing, set when the entry is invoiced
+    invoice = models.ForeignKey(
+        'invoices.Invoice', on_delete=models.SET_NULL, related_name='time_entries', null=True, blank=True
+    )
+    invoice_item = models.ForeignKey(
+        'invoices.InvoiceItem', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    
+    objects = TimeEntryQuerySet.as_manager()
     
     class Meta:
         ordering = ['-date', '-created_at']
         unique_together = ['user', 'project', 'date', 'description']
+        indexes = [
+            models.Index(
+                fields=['user', 'date'],
+                name='time_entry_unbilled_idx',
+                condition=models.Q(is_billable=True, invoice__isnull=True)
+            ),
+            # Overlap checks; PostgreSQL also gets a GiST index on the
+            # time range (migration 0005)
+            models.Index(fields=['user', 'date', 'start_time'], name='time_entry_user_day_idx'),
+        ]
     
     def __str__(self):
         return f"{self.project.name} - {self.date} - {self.hours}h"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_tags = instance.__dict__.get('tags')
+        return instance
+    
     def save(self, *args, **kwargs):
-        # If no hourly rate is set, use project's hourly rate
+        # If no hourly rate is set, use the project's, client's or user's default
         if not self.hourly_rate:
-            self.hourly_rate = self.project.hourly_rate
+            self.hourly_rate = get_rate_card().for_entry(self)
         super().save(*args, **kwargs)
+        
+        if self.tags != getattr(self, '_saved_tags', ''):
+            TimeEntryTag.sync([self])
     
     def clean(self):
         from django.core.exceptions import ValidationError
@@ -49,6 +153,20 @@ class TimeEntry(BaseModel):
         # Validate that project belongs to the user
         if self.project and self.project.user != self.user:
             raise ValidationError("You can only log time for your own projects.")
+        
+        if self.start_time and self.end_time:
+            if self.start_time >= self.end_time:
+                raise ValidationError("End time must be after start time.")
+            overlaps = TimeEntry.objects.filter(user_id=self.user_id).overlapping(
+                self.date, self.start_time, self.end_time
+            ).exclude(pk=self.pk).values_list('pk', flat=True)
+            if overlaps:
+                raise ValidationError(f"Overlaps time entries {', '.join(map(str, overlaps))}.")
+    
+    @property
+    def is_billed(self):
+        """Check if this time entry is on an invoice."""
+        return self.invoice_id is not None
     
     @property
     def total_amount(self):
@@ -62,4 +180,64 @@ class TimeEntry(BaseModel):
             start_minutes = self.start_time.hour * 60 + self.start_time.minute
             end_minutes = self.end_time.hour * 60 + self.end_time.minute
             return end_minutes - start_minutes
-        return None 
\ No newline at end of file
+        return None
+
+
+class TimeEntryTag(models.Model):
+    """
+    Link between a time entry and one of its tags.
+    """
+    time_entry = models.ForeignKey(TimeEntry, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='time_entry_links')
+    
+    class Meta:
+        constraints = [
+            # Leading with tag, this also serves ?tag= lookups
+            models.UniqueConstraint(fields=['tag', 'time_entry'], name='time_entry_tag_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.time_entry_id}: {self.tag_id}"
+    
+    @classmethod
+    def sync(cls, time_entries):
+        """
+        Make the tag links of saved time entries match their ``tags``
+        strings, creating missing Tags. Runs a fixed number of queries
+        however many entries are given.
+        """
+        wanted = {entry.pk: (entry.user_id, parse_tags(entry.tags)) for entry in time_entries}
+        if not wanted:
+            return
+        
+        tag_keys = {(user_id, name) for user_id, names in wanted.values() for name in names}
+        tag_ids = {}
+        if tag_keys:
+            Tag.objects.bulk_create(
+                [Tag(user_id=user_id, name=name) for user_id, name in tag_keys], ignore_conflicts=True
+            )
+            tag_ids = {
+                (user_id, name): tag_id for tag_id, user_id, name in Tag.objects.filter(
+                    user_id__in={user_id for user_id, _ in tag_keys},
+                    name__in={name for _, name in tag_keys}
+                ).values_list('id', 'user_id', 'name')
+            }
+        links = {
+            (entry_id, tag_ids[(user_id, name)])
+            for entry_id, (user_id, names) in wanted.items() for name in names
+        }
+        
+        existing = {
+            (entry_id, tag_id): link_id for link_id, entry_id, tag_id in cls.objects.filter(
+                time_entry_id__in=wanted
+            ).values_list('id', 'time_entry_id', 'tag_id')
+        }
+        stale = [link_id for key, link_id in existing.items() if key not in links]
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        cls.objects.bulk_create(
+            [cls(time_entry_id=entry_id, tag_id=tag_id) for entry_id, tag_id in links - existing.keys()],
+            ignore_conflicts=True
+        )
+        for entry in time_entries:
+            entry._saved_tags = entry.tags
@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import TimeEntry
+from django.db.models import DecimalField, ExpressionWrapper, F
+from core.fastpath import ValuesSerializer
+from core.rates import get_rate_card
+from .models import TimeEntry, TimeEntryTag
+from .services import TimeEntryService
 from projects.serializers import ProjectListSerializer
 
 
@@ -11,11 +15,15 @@ class TimeEntrySerializer(serializers.ModelSerializer):
     project_name = serializers.ReadOnlyField(source='project.name')
     client_name = serializers.ReadOnlyField(source='project.client.name')
     total_amount = serializers.ReadOnlyField()
+    allow_overlap = serializers.BooleanField(write_only=True, default=False)
     
     class Meta:
         model = TimeEntry
-        fields = '__all__'
-        read_only_fields = ('user', 'created_at', 'updated_at', 'total_amount')
+        # Tags are written through the comma-separated ``tags`` field
+        exclude = ('normalized_tags',)
+        read_only_fields = ('user', 'created_at', 'updated_at', 'total_amount', 'invoice', 'invoice_item')
+        # Defaults to the project's, client's or user's rate (see core.rates)
+        extra_kwargs = {'hourly_rate': {'required': False}}
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -23,7 +31,7 @@ class TimeEntrySerializer(serializers.ModelSerializer):
     
     def validate_project(self, value):
         # Ensure the project belongs to the current user
-        if value.user != self.context['request'].user:
+        if value.user_id != self.context['request'].user.pk:
             raise serializers.ValidationError("You can only log time for your own projects.")
         return value
     
@@ -32,6 +40,28 @@ class TimeEntrySerializer(serializers.ModelSerializer):
         if value > timezone.now().date():
             raise serializers.ValidationError("Time entries cannot be logged for future dates.")
         return value
+    
+    def validate(self, attrs):
+        allow_overlap = attrs.pop('allow_overlap', False)
+        
+        def current(field):
+            return attrs[field] if field in attrs else getattr(self.instance, field, None)
+        
+        start_time, end_time = current('start_time'), current('end_time')
+        if start_time and end_time:
+            if start_time >= end_time:
+                raise serializers.ValidationError({'end_time': "End time must be after start time."})
+            # Bulk imports check the whole batch at once
+            if not allow_overlap and not isinstance(self.parent, serializers.ListSerializer):
+                overlaps = TimeEntryService.find_overlaps(
+                    self.context['request'].user, current('date'), start_time, end_time,
+                    exclude=getattr(self.instance, 'pk', None)
+                ).values_list('pk', flat=True)
+                if overlaps:
+                    raise serializers.ValidationError({
+                        'start_time': f"Overlaps time entries {', '.join(map(str, overlaps))}."
+                    })
+        return attrs
 
 
 class TimeEntryListSerializer(serializers.ModelSerializer):
@@ -48,6 +78,19 @@ class TimeEntryListSerializer(serializers.ModelSerializer):
                  'total_amount', 'description', 'is_billable', 'created_at')
 
 
+class TimeEntryListValuesSerializer(ValuesSerializer):
+    """
+    Fast path for TimeEntryListSerializer rendering rows from values().
+    """
+    serializer_class = TimeEntryListSerializer
+    annotations = {
+        'total_amount': ExpressionWrapper(
+            F('hours') * F('hourly_rate'),
+            output_field=DecimalField(max_digits=15, decimal_places=4)
+        ),
+    }
+
+
 class TimeEntryDetailSerializer(serializers.ModelSerializer):
     """
     Serializer for detailed time entry view with project information.
@@ -57,8 +100,8 @@ class TimeEntryDetailSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = TimeEntry
-        fields = '__all__'
-        read_only_fields = ('user', 'created_at', 'updated_at', 'total_amount')
+        exclude = ('normalized_tags',)
+        read_only_fields = ('user', 'created_at', 'updated_at', 'total_amount', 'invoice', 'invoice_item')
 
 
 class TimeEntryBulkCreateSerializer(serializers.Serializer):
@@ -66,14 +109,101 @@ class TimeEntryBulkCreateSerializer(serializers.Serializer):
     Serializer for bulk creating time entries.
     """
     time_entries = TimeEntrySerializer(many=True)
+    allow_overlap = serializers.BooleanField(write_only=True, default=False)
     
-    def create(self, validated_data):
-        time_entries_data = validated_data.pop('time_entries')
-        time_entries = []
+    def validate(self, attrs):
+        """
+        Reject entries overlapping each other or saved entries, checked for
+        the whole batch with one query.
+        """
+        if attrs.pop('allow_overlap'):
+            return attrs
         
-        for entry_data in time_entries_data:
-            entry_data['user'] = self.context['request'].user
-            time_entry = TimeEntry.objects.create(**entry_data)
-            time_entries.append(time_entry)
+        conflicts = TimeEntryService.batch_overlaps(self.context['request'].user, [
+            (index, entry['date'], entry['start_time'], entry['end_time'])
+            for index, entry in enumerate(attrs['time_entries'])
+            if entry.get('start_time') and entry.get('end_time')
+        ])
+        if conflicts:
+            errors = []
+            for index in range(len(attrs['time_entries'])):
+                described = [
+                    f"time entry {key}" if kind == 'saved' else f"entry {key + 1} of this request"
+                    for kind, key in conflicts.get(index, [])
+                ]
+                errors.append({'start_time': [f"Overlaps {', '.join(described)}."]} if described else {})
+            raise serializers.ValidationError({'time_entries': errors})
+        return attrs
+    
+    def create(self, validated_data):
+        """
+        Insert all entries with one query, resolving default rates through
+        the request's rate card, then index their tags in bulk.
+        """
+        user = self.context['request'].user
+        rate_card = get_rate_card()
+        time_entries = [TimeEntry(user=user, **entry_data) for entry_data in validated_data.pop('time_entries')]
+        rate_card.prime_projects({entry.project_id for entry in time_entries if not entry.hourly_rate})
+        for time_entry in time_entries:
+            time_entry.hourly_rate = rate_card.for_entry(time_entry)
         
-        return {'time_entries': time_entries} 
\ No newline at end of file
+        time_entries = TimeEntry.objects.bulk_create(time_entries)
+        TimeEntryTag.sync(time_entries)
+        return {'time_entries': time_entries}
+
+
+class TimeEntryRepriceSerializer(serializers.Serializer):
+    """
+    Serializer for repricing unbilled time entries.
+    """
+    project = serializers.PrimaryKeyRelatedField(queryset=[], required=False, allow_null=True)
+    client = serializers.PrimaryKeyRelatedField(queryset=[], required=False, allow_null=True)
+    start_date = serializers.DateField(required=False, allow_null=True)
+    end_date = serializers.DateField(required=False, allow_null=True)
+    hourly_rate = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True,
+        help_text="New rate; defaults to each entry's current project, client or user rate"
+    )
+    dry_run = serializers.BooleanField(default=False)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set querysets based on the current user
+        if 'context' in kwargs and 'request' in kwargs['context']:
+            user = kwargs['context']['request'].user
+            from clients.models import Client
+            from projects.models import Project
+            self.fields['client'].queryset = Client.objects.filter(user=user)
+            self.fields['project'].queryset = Project.objects.filter(user=user)
+    
+    def validate(self, attrs):
+        start_date, end_date = attrs.get('start_date'), attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError("Start date must be before end date.")
+        return attrs
+
+
+class TimerStartSerializer(serializers.Serializer):
+    """
+    Serializer for starting a live timer.
+    """
+    project = serializers.PrimaryKeyRelatedField(queryset=[])
+    description = serializers.CharField()
+    tags = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    is_billable = serializers.BooleanField(default=True)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set querysets based on the current user
+        if 'context' in kwargs and 'request' in kwargs['context']:
+            user = kwargs['context']['request'].user
+            from projects.models import Project
+            self.fields['project'].queryset = Project.objects.filter(user=user)
+
+
+class TimerStopSerializer(serializers.Serializer):
+    """
+    Serializer for stopping a live timer, optionally updating what it was for.
+    """
+    description = serializers.CharField(required=False)
+    tags = serializers.CharField(max_length=255, required=False, allow_blank=True)
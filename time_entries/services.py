@@ -0,0 +1,281 @@
+import heapq
+import itertools
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import models, transaction
+from django.utils import timezone
+from core.rates import get_rate_card
+from projects.models import Project
+from .models import TimeEntry, TimeEntryTag
+
+
+def overlapping_pairs(intervals):
+    """
+    Yield (key, other_key) for every pair of overlapping intervals in
+    ``intervals``, an iterable of (key, date, start_time, end_time).
+
+    Sorted sweep: intervals are visited by start within each date while a
+    heap holds the ones still open, so the cost is O(n log n) plus one
+    step per overlapping pair.
+    """
+    open_intervals = []
+    current_date = None
+    order = itertools.count()
+    for key, date, start_time, end_time in sorted(intervals, key=lambda interval: interval[1:3]):
+        if date != current_date:
+            open_intervals = []
+            current_date = date
+        while open_intervals and open_intervals[0][0] <= start_time:
+            heapq.heappop(open_intervals)
+        for _, _, other_key in open_intervals:
+            yield other_key, key
+        heapq.heappush(open_intervals, (end_time, next(order), key))
+
+
+def timer_segments(started_at, stopped_at):
+    """
+    Split a timer's run into (date, start_time, end_time, hours) per local
+    day. Runs last at least a minute; a day that ends the run at midnight
+    ends at time.max.
+    """
+    start = timezone.localtime(started_at).replace(microsecond=0)
+    end = max(timezone.localtime(stopped_at).replace(microsecond=0), start + timedelta(minutes=1))
+    segments = []
+    while start < end:
+        midnight = timezone.make_aware(
+            datetime.combine(start.date() + timedelta(days=1), time.min), start.tzinfo
+        )
+        segment_end = min(end, midnight)
+        hours = Decimal((segment_end - start).total_seconds()) / 3600
+        segments.append((
+            start.date(),
+            start.time(),
+            segment_end.time() if segment_end < midnight else time.max,
+            max(hours.quantize(Decimal('0.01')), Decimal('0.01'))
+        ))
+        start = segment_end
+    return segments
+
+
+class TimeEntryService:
+    """
+    Service for time entry business logic.
+    """
+
+    @staticmethod
+    def unbilled_entries(user, project=None, client=None, start_date=None, end_date=None):
+        """
+        The user's unbilled time entries, optionally narrowed to a project,
+        a client and a date range.
+        """
+        entries = TimeEntry.objects.filter(user=user).unbilled()
+        if project is not None:
+            entries = entries.filter(project=project)
+        if client is not None:
+            entries = entries.filter(project__client=client)
+        if start_date is not None:
+            entries = entries.filter(date__gte=start_date)
+        if end_date is not None:
+            entries = entries.filter(date__lte=end_date)
+        return entries
+
+    @staticmethod
+    def rate_expression(hourly_rate=None):
+        """
+        The rate to reprice to: ``hourly_rate`` when given, otherwise each
+        entry's current default (project, then client, then user rate, as
+        resolved by core.rates) as a correlated subquery.
+        """
+        decimal_field = models.DecimalField(max_digits=10, decimal_places=2)
+        if hourly_rate is not None:
+            return models.Value(Decimal(hourly_rate), output_field=decimal_field)
+
+        project_rate = Project.objects.filter(pk=models.OuterRef('project_id')).annotate(
+            default_rate=models.Case(
+                models.When(hourly_rate__gt=0, then='hourly_rate'),
+                models.When(client__default_hourly_rate__gt=0, then='client__default_hourly_rate'),
+                default='user__default_hourly_rate',
+                output_field=decimal_field
+            )
+        ).order_by().values('default_rate')[:1]
+        return models.Subquery(project_rate, output_field=decimal_field)
+
+    @staticmethod
+    def preview_repricing(entries, hourly_rate=None):
+        """
+        Count the entries whose rate would change and total their amounts
+        before and after, in one aggregate query.
+        """
+        totals = entries.annotate(
+            new_rate=TimeEntryService.rate_expression(hourly_rate)
+        ).exclude(hourly_rate=models.F('new_rate')).aggregate(
+            entry_count=models.Count('id'),
+            total_hours=models.Sum('hours'),
+            current_amount=models.Sum(models.F('hours') * models.F('hourly_rate')),
+            new_amount=models.Sum(models.F('hours') * models.F('new_rate'))
+        )
+        cents = Decimal('0.01')
+        current_amount = (totals['current_amount'] or Decimal('0')).quantize(cents)
+        new_amount = (totals['new_amount'] or Decimal('0')).quantize(cents)
+        return {
+            'entries': totals['entry_count'],
+            'hours': totals['total_hours'] or Decimal('0'),
+            'current_amount': current_amount,
+            'new_amount': new_amount,
+            'delta': new_amount - current_amount,
+        }
+
+    @staticmethod
+    def reprice(entries, hourly_rate=None, batch_size=None):
+        """
+        Set the rate of ``entries`` (from unbilled_entries()) with a single
+        UPDATE, or one UPDATE per ``batch_size`` matching entries, taken in
+        primary key order, so large ranges never hold many row locks at
+        once. The unbilled filter is part of each UPDATE, so entries billed
+        in the meantime are skipped. Returns the number of entries repriced.
+        """
+        new_rate = TimeEntryService.rate_expression(hourly_rate)
+        entries = entries.exclude(hourly_rate=new_rate)
+
+        if not batch_size:
+            return entries.update(hourly_rate=new_rate, updated_at=timezone.now())
+
+        updated = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination over the matching rows: a user's entries can
+            # be spread thinly across the whole table's primary key range
+            batch = list(entries.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            with transaction.atomic():
+                updated += entries.filter(pk__in=batch).update(hourly_rate=new_rate, updated_at=timezone.now())
+            if len(batch) < batch_size:
+                break
+        return updated
+
+    @staticmethod
+    def tag_summary(user, start_date=None, end_date=None, project=None):
+        """
+        Entries, hours and billable amount per tag in one grouped query,
+        busiest tags first.
+        """
+        links = TimeEntryTag.objects.filter(time_entry__user=user)
+        if start_date is not None:
+            links = links.filter(time_entry__date__gte=start_date)
+        if end_date is not None:
+            links = links.filter(time_entry__date__lte=end_date)
+        if project is not None:
+            links = links.filter(time_entry__project=project)
+        return links.values(name=models.F('tag__name')).annotate(
+            entries=models.Count('id'),
+            hours=models.Sum('time_entry__hours'),
+            amount=models.Sum(
+                models.F('time_entry__hours') * models.F('time_entry__hourly_rate'),
+                filter=models.Q(time_entry__is_billable=True)
+            )
+        ).order_by('-hours', 'name')
+
+    @staticmethod
+    def find_overlaps(user, date, start_time, end_time, exclude=None):
+        """
+        The user's timed entries overlapping [start_time, end_time) on
+        ``date``, served by the GiST index on PostgreSQL and the
+        (user, date, start_time) index elsewhere.
+        """
+        entries = TimeEntry.objects.filter(user=user).overlapping(date, start_time, end_time)
+        if exclude is not None:
+            entries = entries.exclude(pk=exclude)
+        return entries
+
+    @staticmethod
+    def overlap_report(user, start_date, end_date):
+        """
+        Every pair of overlapping entries between two dates, from one
+        indexed query and a sorted sweep.
+        """
+        entries = {
+            entry['id']: entry for entry in TimeEntry.objects.filter(
+                user=user, date__gte=start_date, date__lte=end_date
+            ).timed().order_by('date', 'start_time').values(
+                'id', 'date', 'start_time', 'end_time', 'project__name', 'description'
+            )
+        }
+        return [
+            (entries[key], entries[other_key]) for key, other_key in overlapping_pairs(
+                (entry['id'], entry['date'], entry['start_time'], entry['end_time']) for entry in entries.values()
+            )
+        ]
+
+    @staticmethod
+    def batch_overlaps(user, candidates):
+        """
+        Check new entries for overlaps with each other and with the user's
+        saved entries on the same days, in one query. ``candidates`` are
+        (index, date, start_time, end_time). Returns {index: conflicts},
+        each conflict being ('new', index) or ('saved', pk).
+        """
+        candidates = [('new', index, *times) for index, *times in candidates if times[1] < times[2]]
+        if not candidates:
+            return {}
+        saved = TimeEntry.objects.filter(
+            user=user, date__in={candidate[2] for candidate in candidates}
+        ).timed().values_list('pk', 'date', 'start_time', 'end_time')
+
+        conflicts = {}
+        for key, other_key in overlapping_pairs(
+            [((kind, index), *times) for kind, index, *times in candidates]
+            + [(('saved', pk), *times) for pk, *times in saved]
+        ):
+            for (kind, index), conflict in ((key, other_key), (other_key, key)):
+                if kind == 'new':
+                    conflicts.setdefault(index, []).append(conflict)
+        return conflicts
+
+    @staticmethod
+    def create_from_timers(timers):
+        """
+        Save stopped timers, given as (user_id, timer, stopped_at), as time
+        entries in one transaction with a fixed number of queries. Runs
+        crossing midnight give one entry per day. Timers whose project was
+        deleted or changed hands are skipped. A description already used
+        for the project that day gets the entry's times appended, as time
+        entries are unique per user, project, date and description.
+        """
+        rate_card = get_rate_card()
+        projects = set(Project.objects.filter(
+            pk__in={timer['project'] for _, timer, _ in timers}
+        ).values_list('pk', 'user_id'))
+        rate_card.prime_projects({project_id for project_id, _ in projects})
+
+        time_entries = []
+        for user_id, timer, stopped_at in timers:
+            if (timer['project'], user_id) not in projects:
+                continue
+            for date, start_time, end_time, hours in timer_segments(timer['started_at'], stopped_at):
+                time_entries.append(TimeEntry(
+                    user_id=user_id, project_id=timer['project'], date=date, hours=hours,
+                    start_time=start_time, end_time=end_time, description=timer['description'],
+                    tags=timer.get('tags', ''), is_billable=timer.get('is_billable', True)
+                ))
+        if not time_entries:
+            return []
+
+        taken = set(TimeEntry.objects.filter(
+            user_id__in={entry.user_id for entry in time_entries},
+            date__in={entry.date for entry in time_entries},
+            description__in={entry.description for entry in time_entries}
+        ).values_list('user_id', 'project_id', 'date', 'description'))
+        for entry in time_entries:
+            key = (entry.user_id, entry.project_id, entry.date, entry.description)
+            if key in taken:
+                entry.description = f"{entry.description} ({entry.start_time:%H:%M}-{entry.end_time:%H:%M})"
+                key = key[:3] + (entry.description,)
+            taken.add(key)
+            entry.hourly_rate = rate_card.for_entry(entry)
+
+        with transaction.atomic():
+            time_entries = TimeEntry.objects.bulk_create(time_entries)
+            TimeEntryTag.sync(time_entries)
+        return time_entries
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .services import TimeEntryService
+from .timers import timer_store
+
+
+@shared_task
+def reprice_time_entries(user_id, hourly_rate=None, project_id=None, client_id=None, start_date=None, end_date=None):
+    """
+    Task to reprice a large range of unbilled time entries in batches.
+    """
+    user = get_user_model().objects.get(pk=user_id)
+    entries = TimeEntryService.unbilled_entries(
+        user, project=project_id, client=client_id, start_date=start_date, end_date=end_date
+    )
+    updated = TimeEntryService.reprice(
+        entries, hourly_rate=hourly_rate, batch_size=settings.TIME_ENTRY_REPRICE_BATCH_SIZE
+    )
+    print(f"Repriced {updated} time entries for user {user_id}")
+    return updated
+
+
+@shared_task
+def sweep_abandoned_timers():
+    """
+    Task to close timers without a heartbeat for TIMER_HEARTBEAT_TIMEOUT
+    seconds, saving each as a time entry ending at its last heartbeat.
+    """
+    before = timezone.now() - timedelta(seconds=settings.TIMER_HEARTBEAT_TIMEOUT)
+    closed = 0
+    while True:
+        timers = timer_store.pop_abandoned(before, settings.TIMER_SWEEP_BATCH_SIZE)
+        if not timers:
+            break
+        try:
+            TimeEntryService.create_from_timers(timers)
+        except Exception:
+            timer_store.restore(timers)
+            raise
+        closed += len(timers)
+    print(f"Closed {closed} abandoned timers")
+    return closed
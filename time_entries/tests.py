@@ -0,0 +1,436 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from clients.models import Client
+from invoices.models import Invoice
+from projects.models import Project
+from .models import TimeEntry
+from .services import TimeEntryService, overlapping_pairs, timer_segments
+from .timers import TimerStore, timer_store
+
+User = get_user_model()
+
+
+class TimeEntryRepriceTest(TestCase):
+    """Test cases for repricing unbilled time entries."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            default_hourly_rate=Decimal('50.00')
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(user=self.user, client=self.client_obj, name='Website')
+        self.entries = TimeEntry.objects.bulk_create([
+            TimeEntry(user=self.user, project=self.project, date=date(2025, 1, day), hours=Decimal('2.00'),
+                      hourly_rate=Decimal('50.00'), description='Work')
+            for day in (1, 2, 3)
+        ])
+        invoice = Invoice.objects.create(
+            user=self.user, client=self.client_obj, due_date=date(2025, 2, 1), invoice_number='INV-1'
+        )
+        TimeEntry.objects.filter(pk=self.entries[0].pk).update(invoice=invoice)
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+    
+    def rates(self):
+        return list(TimeEntry.objects.order_by('date').values_list('hourly_rate', flat=True))
+    
+    def test_reprice_to_current_project_rate(self):
+        """Test unbilled entries follow a changed project rate in one UPDATE."""
+        Project.objects.filter(pk=self.project.pk).update(hourly_rate=Decimal('75.00'))
+        entries = TimeEntryService.unbilled_entries(self.user, project=self.project)
+        
+        with self.assertNumQueries(1):
+            preview = TimeEntryService.preview_repricing(entries)
+        self.assertEqual(preview['entries'], 2)
+        self.assertEqual(preview['delta'], Decimal('100.00'))
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(TimeEntryService.reprice(entries), 2)
+        self.assertEqual(self.rates(), [Decimal('50.00'), Decimal('75.00'), Decimal('75.00')])
+        self.assertEqual(TimeEntryService.preview_repricing(entries)['entries'], 0)
+    
+    def test_reprice_endpoint_dry_run_and_batches(self):
+        """Test the endpoint previews, then reprices a date range."""
+        url = reverse('time-entry-reprice')
+        data = {'client': self.client_obj.pk, 'start_date': '2025-01-03', 'hourly_rate': '60.00'}
+        
+        response = self.api_client.post(url, {**data, 'dry_run': True}, format='json', secure=True)
+        self.assertEqual(response.json()['delta'], 20.0)
+        self.assertEqual(self.rates()[2], Decimal('50.00'))
+        
+        response = self.api_client.post(url, data, format='json', secure=True)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(self.rates(), [Decimal('50.00'), Decimal('50.00'), Decimal('60.00')])
+        
+        entries = TimeEntryService.unbilled_entries(self.user)
+        self.assertEqual(TimeEntryService.reprice(entries, Decimal('40.00'), batch_size=1), 2)
+        self.assertEqual(self.rates(), [Decimal('50.00'), Decimal('40.00'), Decimal('40.00')])
+    
+    def test_batches_follow_matching_entries_not_the_pk_range(self):
+        """Test batched repricing costs the same however sparse the primary keys are."""
+        TimeEntry.objects.bulk_create([
+            TimeEntry(pk=pk, user=self.user, project=self.project, date=date(2025, 1, 10), hours=Decimal('1.00'),
+                      hourly_rate=Decimal('50.00'), description=f'Work {pk}')
+            for pk in (10_000, 5_000_000)
+        ])
+        entries = TimeEntryService.unbilled_entries(self.user)
+        
+        # Two batches of the next primary keys, savepoint, UPDATE and
+        # release, then one empty lookup
+        with self.assertNumQueries(9):
+            self.assertEqual(TimeEntryService.reprice(entries, Decimal('70.00'), batch_size=2), 4)
+        self.assertEqual(TimeEntry.objects.filter(hourly_rate=Decimal('70.00')).count(), 4)
+    
+    @override_settings(TIME_ENTRY_REPRICE_SYNC_LIMIT=1)
+    def test_large_ranges_run_in_background(self):
+        """Test ranges above the sync limit are handed to a task."""
+        with mock.patch('time_entries.views.reprice_time_entries_task.delay') as delay:
+            delay.return_value.id = 'task-1'
+            response = self.api_client.post(
+                reverse('time-entry-reprice'), {'project': self.project.pk, 'hourly_rate': '65.00'},
+                format='json', secure=True
+            )
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['task_id'], 'task-1')
+        delay.assert_called_once_with(
+            self.user.id, hourly_rate='65.00', project_id=self.project.pk,
+            client_id=None, start_date=None, end_date=None
+        )
+        self.assertEqual(set(self.rates()), {Decimal('50.00')})
+
+
+class TimeEntryTagTest(TestCase):
+    """Test cases for the normalized tag index."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            default_hourly_rate=Decimal('50.00')
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(user=self.user, client=self.client_obj, name='Website')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+    
+    def create_entry(self, day, tags, hours='1.00'):
+        return TimeEntry.objects.create(
+            user=self.user, project=self.project, date=date.today().replace(day=1) - timedelta(days=day),
+            hours=Decimal(hours), description=f'Work {day}', tags=tags
+        )
+    
+    def test_tags_are_normalized_and_kept_in_sync(self):
+        """Test saving an entry links it to deduplicated, lowercased tags."""
+        from .models import Tag
+        entry = self.create_entry(1, ' Design, design,Meeting ,')
+        self.assertEqual(sorted(entry.normalized_tags.values_list('name', flat=True)), ['design', 'meeting'])
+        
+        entry.tags = 'meeting,review'
+        entry.save()
+        entry = TimeEntry.objects.get(pk=entry.pk)
+        self.assertEqual(sorted(entry.normalized_tags.values_list('name', flat=True)), ['meeting', 'review'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        
+        with self.assertNumQueries(1):
+            entry.description = 'Renamed'
+            entry.save()
+    
+    def test_tag_filter_and_summary(self):
+        """Test ?tag= filtering and the per-tag aggregation."""
+        self.create_entry(1, 'design,meeting', hours='2.00')
+        self.create_entry(2, 'design')
+        self.create_entry(3, 'support')
+        
+        response = self.api_client.get(reverse('time-entry-list-create'), {'tag': 'Design'}, secure=True)
+        self.assertEqual(response.json()['count'], 2)
+        response = self.api_client.get(
+            reverse('time-entry-list-create') + '?tag=design&tag=meeting', secure=True
+        )
+        self.assertEqual(response.json()['count'], 1)
+        
+        with self.assertNumQueries(1):
+            tags = list(TimeEntryService.tag_summary(self.user))
+        self.assertEqual(tags[0], {'name': 'design', 'entries': 2, 'hours': Decimal('3.00'), 'amount': Decimal('150.00')})
+        self.assertEqual([tag['name'] for tag in tags], ['design', 'meeting', 'support'])
+        
+        response = self.api_client.get(reverse('time-entry-tag-summary'), {'period': 'year'}, secure=True)
+        self.assertEqual(response.json()['tags'][0], {'tag': 'design', 'entries': 2, 'hours': 3.0, 'amount': 150.0})
+    
+    def test_tag_index_is_not_exposed_by_the_api(self):
+        """Test the normalized tags can only be set through ``tags``."""
+        from .models import Tag
+        other_user = User.objects.create_user(email='other@example.com', username='other', password='testpass123')
+        foreign_tag = Tag.objects.create(user=other_user, name='secret')
+        
+        response = self.api_client.post(reverse('time-entry-list-create'), {
+            'project': self.project.id, 'date': (date.today() - timedelta(days=1)).isoformat(),
+            'hours': '1.00', 'description': 'Work', 'tags': 'design', 'normalized_tags': [foreign_tag.id]
+        }, format='json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('normalized_tags', response.json())
+        entry = TimeEntry.objects.get(pk=response.json()['id'])
+        self.assertEqual(list(entry.normalized_tags.values_list('name', flat=True)), ['design'])
+        
+        response = self.api_client.get(reverse('time-entry-detail', args=[entry.pk]), secure=True)
+        self.assertNotIn('normalized_tags', response.json())
+
+
+class TimeEntryOverlapTest(TestCase):
+    """Test cases for overlapping time entry detection."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            default_hourly_rate=Decimal('50.00')
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(user=self.user, client=self.client_obj, name='Website')
+        self.day = date.today() - timedelta(days=1)
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+    
+    def create_entry(self, start, end, day=None):
+        return TimeEntry.objects.create(
+            user=self.user, project=self.project, date=day or self.day, hours=Decimal('1.00'),
+            start_time=time(*start), end_time=time(*end), description=f'Work {start}'
+        )
+    
+    def entry_data(self, start, end, **extra):
+        return {
+            'project': self.project.id,
+            'date': self.day.isoformat(),
+            'hours': '1.00',
+            'start_time': start,
+            'end_time': end,
+            'description': f'Work {start}',
+            **extra
+        }
+    
+    def test_overlapping_pairs(self):
+        """Test the sweep pairs overlapping intervals per day only."""
+        other_day = self.day - timedelta(days=1)
+        pairs = set(overlapping_pairs([
+            ('a', self.day, time(9), time(12)),
+            ('b', self.day, time(10), time(11)),
+            ('c', self.day, time(11), time(13)),
+            ('d', self.day, time(13), time(14)),
+            ('e', other_day, time(9), time(12)),
+        ]))
+        self.assertEqual(pairs, {('a', 'b'), ('a', 'c')})
+    
+    def test_create_rejects_overlaps(self):
+        """Test creating or moving an entry onto another is rejected unless allowed."""
+        existing = self.create_entry((9, 0), (11, 0))
+        url = reverse('time-entry-list-create')
+        
+        response = self.api_client.post(url, self.entry_data('10:30', '12:00'), format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(existing.pk), response.json()['start_time'][0])
+        
+        response = self.api_client.post(url, self.entry_data('11:00', '12:00'), format='json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        response = self.api_client.post(
+            url, self.entry_data('10:00', '10:30', allow_overlap=True), format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 201)
+        
+        # An entry never overlaps itself
+        response = self.api_client.patch(
+            reverse('time-entry-detail', args=[existing.pk]), {'end_time': '10:45'}, format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.api_client.patch(
+            reverse('time-entry-detail', args=[existing.pk]), {'start_time': '08:00', 'end_time': '09:30'},
+            format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+    
+    def test_bulk_create_checks_the_whole_batch(self):
+        """Test bulk imports report overlaps within the batch and with saved entries."""
+        existing = self.create_entry((9, 0), (10, 0))
+        url = reverse('time-entry-bulk-create')
+        entries = [
+            self.entry_data('09:30', '10:30'),
+            self.entry_data('11:00', '12:00'),
+            self.entry_data('11:30', '12:30'),
+            self.entry_data('13:00', '14:00'),
+        ]
+        
+        response = self.api_client.post(url, {'time_entries': entries}, format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['time_entries']
+        self.assertEqual(errors[0], {'start_time': [f'Overlaps time entry {existing.pk}.']})
+        self.assertEqual(errors[1], {'start_time': ['Overlaps entry 3 of this request.']})
+        self.assertEqual(errors[3], {})
+        self.assertEqual(TimeEntry.objects.count(), 1)
+        
+        response = self.api_client.post(
+            url, {'time_entries': entries, 'allow_overlap': True}, format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TimeEntry.objects.count(), 5)
+    
+    def test_overlap_endpoint(self):
+        """Test checking a candidate range and reporting overlapping pairs."""
+        first = self.create_entry((9, 0), (11, 0))
+        second = self.create_entry((10, 0), (12, 0))
+        self.create_entry((12, 0), (13, 0))
+        url = reverse('time-entry-overlaps')
+        
+        response = self.api_client.get(url, {
+            'date': self.day.isoformat(), 'start_time': '10:30', 'end_time': '11:30', 'exclude': second.pk
+        }, secure=True)
+        self.assertEqual([entry['id'] for entry in response.json()['overlaps']], [first.pk])
+        
+        with self.assertNumQueries(1):
+            pairs = TimeEntryService.overlap_report(self.user, self.day, self.day)
+        self.assertEqual([(a['id'], b['id']) for a, b in pairs], [(first.pk, second.pk)])
+        
+        response = self.api_client.get(url, secure=True)
+        self.assertEqual([[entry['id'] for entry in pair] for pair in response.json()['overlaps']], [[first.pk, second.pk]])
+        
+        response = self.api_client.get(url, {'start_time': '10:00'}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+def redis_available():
+    try:
+        return timer_store.client.ping()
+    except Exception:
+        return False
+
+
+class TimerEntryTest(TestCase):
+    """Test cases for saving stopped timers as time entries."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            default_hourly_rate=Decimal('50.00')
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(user=self.user, client=self.client_obj, name='Website')
+    
+    def test_timer_segments_split_at_midnight(self):
+        """Test runs are split per day and last at least a minute."""
+        started_at = datetime(2026, 1, 1, 23, 30, 15, 500, tzinfo=dt_timezone.utc)
+        self.assertEqual(timer_segments(started_at, started_at + timedelta(hours=1, minutes=45)), [
+            (date(2026, 1, 1), time(23, 30, 15), time.max, Decimal('0.50')),
+            (date(2026, 1, 2), time(0, 0), time(1, 15, 15), Decimal('1.25')),
+        ])
+        self.assertEqual(timer_segments(started_at, started_at), [
+            (date(2026, 1, 1), time(23, 30, 15), time(23, 31, 15), Decimal('0.02')),
+        ])
+    
+    def test_create_from_timers(self):
+        """Test timers become entries at the default rate with unique descriptions."""
+        started_at = datetime.combine(date.today() - timedelta(days=1), time(9), tzinfo=dt_timezone.utc)
+        TimeEntry.objects.create(
+            user=self.user, project=self.project, date=started_at.date(), hours=Decimal('1.00'), description='Design'
+        )
+        other_user = User.objects.create_user(email='other@example.com', username='other', password='testpass123')
+        timer = {'project': self.project.pk, 'description': 'Design', 'tags': 'ui', 'is_billable': True, 'started_at': started_at}
+        
+        time_entries = TimeEntryService.create_from_timers([
+            (self.user.pk, timer, started_at + timedelta(minutes=90)),
+            # Not the other user's project
+            (other_user.pk, timer, started_at + timedelta(minutes=30)),
+        ])
+        self.assertEqual(len(time_entries), 1)
+        entry = TimeEntry.objects.get(pk=time_entries[0].pk)
+        self.assertEqual(entry.description, 'Design (09:00-10:30)')
+        self.assertEqual((entry.hours, entry.hourly_rate), (Decimal('1.50'), Decimal('50.00')))
+        self.assertEqual(list(entry.normalized_tags.values_list('name', flat=True)), ['ui'])
+
+
+@skipUnless(redis_available(), 'Redis is not available')
+class TimerAPITest(TestCase):
+    """Test cases for the Redis-backed live timer endpoints."""
+    
+    def setUp(self):
+        for name, value in (('KEY_PREFIX', 'test:timers:'), ('HEARTBEATS_KEY', 'test:timers:heartbeats')):
+            patcher = mock.patch.object(TimerStore, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: timer_store.client.delete(
+            *timer_store.client.keys('test:timers:*') or ['test:timers:heartbeats']
+        ))
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            default_hourly_rate=Decimal('50.00')
+        )
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', email='acme@example.com')
+        self.project = Project.objects.create(user=self.user, client=self.client_obj, name='Website')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+    
+    def test_start_heartbeat_and_stop(self):
+        """Test a timer runs in Redis and is saved as a time entry on stop."""
+        response = self.api_client.post(reverse('time-entry-timer-start'), {
+            'project': self.project.pk, 'description': 'Design'
+        }, format='json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        heartbeat = timer_store.get(self.user.pk)['last_heartbeat']
+        response = self.api_client.post(reverse('time-entry-timer-start'), {
+            'project': self.project.pk, 'description': 'Design'
+        }, format='json', secure=True)
+        self.assertEqual(response.status_code, 409)
+        # A rejected start does not count as a heartbeat
+        self.assertEqual(timer_store.get(self.user.pk)['last_heartbeat'], heartbeat)
+        
+        with self.assertNumQueries(0):
+            response = self.api_client.post(reverse('time-entry-timer-heartbeat'), secure=True)
+        self.assertEqual(response.status_code, 204)
+        response = self.api_client.get(reverse('time-entry-timer'), secure=True)
+        self.assertEqual(response.json()['description'], 'Design')
+        self.assertEqual(TimeEntry.objects.count(), 0)
+        
+        response = self.api_client.post(
+            reverse('time-entry-timer-stop'), {'description': 'Homepage design'}, format='json', secure=True
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['time_entries'][0]['description'], 'Homepage design')
+        self.assertEqual(TimeEntry.objects.filter(user=self.user, description='Homepage design').count(), 1)
+        
+        response = self.api_client.post(reverse('time-entry-timer-heartbeat'), secure=True)
+        self.assertEqual(response.status_code, 404)
+        response = self.api_client.post(reverse('time-entry-timer-stop'), secure=True)
+        self.assertEqual(response.status_code, 404)
+    
+    def test_sweeper_closes_abandoned_timers_at_last_heartbeat(self):
+        """Test timers without recent heartbeats end at their last heartbeat."""
+        from django.utils import timezone
+        from .tasks import sweep_abandoned_timers
+        started_at = timezone.now() - timedelta(hours=3)
+        timer_store.start(self.user.pk, {
+            'project': self.project.pk, 'description': 'Support', 'tags': '', 'is_billable': True,
+            'started_at': started_at
+        })
+        timer_store.client.zadd(TimerStore.HEARTBEATS_KEY, {self.user.pk: (started_at + timedelta(hours=1)).timestamp()})
+        other_user = User.objects.create_user(email='other@example.com', username='other', password='testpass123')
+        timer_store.start(other_user.pk, {
+            'project': self.project.pk, 'description': 'Active', 'tags': '', 'is_billable': True,
+            'started_at': timezone.now()
+        })
+        
+        self.assertEqual(sweep_abandoned_timers(), 1)
+        entries = TimeEntry.objects.filter(user=self.user, description='Support')
+        self.assertEqual(sum(entry.hours for entry in entries), Decimal('1.00'))
+        self.assertIsNone(timer_store.get(self.user.pk))
+        self.assertIsNotNone(timer_store.get(other_user.pk))
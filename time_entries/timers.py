@@ -0,0 +1,150 @@
+"""
+Live timers kept in Redis.
+
+A running timer is one JSON value per user under ``timers:<user_id>``
+and its last heartbeat is the user's score in the ``timers:heartbeats``
+sorted set, so a heartbeat is a single ZADD and finding abandoned timers
+is a range query. The database is only written when a timer stops:
+TimeEntryService.create_from_timers() turns stopped timers into time
+entries, ending now for stop() and at the last heartbeat for timers
+closed by the sweep_abandoned_timers task.
+"""
+import json
+import time
+from datetime import datetime, timezone
+import redis
+from django.conf import settings
+
+# Start a timer unless one is running; the heartbeat is only written
+# with the timer, so a rejected start never refreshes a running timer
+START_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX') then
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Atomically take up to ARGV[2] timers whose last heartbeat is at or
+# before ARGV[1], so a heartbeat arriving mid-sweep either keeps its
+# timer running or lands after the timer was closed
+POP_ABANDONED_SCRIPT = """
+local heartbeats = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+local timers = {}
+for i = 1, #heartbeats, 2 do
+    local key = ARGV[3] .. heartbeats[i]
+    local timer = redis.call('GET', key)
+    redis.call('DEL', key)
+    redis.call('ZREM', KEYS[1], heartbeats[i])
+    if timer then
+        table.insert(timers, heartbeats[i])
+        table.insert(timers, heartbeats[i + 1])
+        table.insert(timers, timer)
+    end
+end
+return timers
+"""
+
+
+class TimerStore:
+    """
+    Running timers, at most one per user.
+
+    Timers are dicts with project, description, tags, is_billable and
+    started_at (a UTC datetime). Redis errors propagate as
+    redis.RedisError.
+    """
+    KEY_PREFIX = 'timers:'
+    HEARTBEATS_KEY = 'timers:heartbeats'
+
+    def __init__(self):
+        self._client = None
+        self._start = None
+        self._pop_abandoned = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                socket_timeout=1,
+                socket_connect_timeout=1
+            )
+        return self._client
+
+    def key(self, user_id):
+        return f'{self.KEY_PREFIX}{user_id}'
+
+    @staticmethod
+    def dumps(timer):
+        return json.dumps({**timer, 'started_at': timer['started_at'].timestamp()})
+
+    @staticmethod
+    def loads(value):
+        timer = json.loads(value)
+        timer['started_at'] = datetime.fromtimestamp(timer['started_at'], timezone.utc)
+        return timer
+
+    def get(self, user_id):
+        """The user's running timer with its last_heartbeat, or None."""
+        value, heartbeat = self.client.pipeline(transaction=False).get(
+            self.key(user_id)
+        ).zscore(self.HEARTBEATS_KEY, user_id).execute()
+        if value is None:
+            return None
+        timer = self.loads(value)
+        timer['last_heartbeat'] = datetime.fromtimestamp(heartbeat or time.time(), timezone.utc)
+        return timer
+
+    def start(self, user_id, timer):
+        """Start a timer; returns False if the user already has one running."""
+        if self._start is None:
+            self._start = self.client.register_script(START_SCRIPT)
+        return bool(self._start(
+            keys=[self.key(user_id), self.HEARTBEATS_KEY],
+            args=[self.dumps(timer), timer['started_at'].timestamp(), user_id]
+        ))
+
+    def heartbeat(self, user_id):
+        """Record that the user's timer is still in use; False if none is running."""
+        _, heartbeat = self.client.pipeline(transaction=False).zadd(
+            self.HEARTBEATS_KEY, {user_id: time.time()}, xx=True
+        ).zscore(self.HEARTBEATS_KEY, user_id).execute()
+        return heartbeat is not None
+
+    def stop(self, user_id):
+        """Remove and return the user's running timer, or None."""
+        value, _ = self.client.pipeline().getdel(
+            self.key(user_id)
+        ).zrem(self.HEARTBEATS_KEY, user_id).execute()
+        return self.loads(value) if value is not None else None
+
+    def restore(self, timers):
+        """
+        Put back (user_id, timer, last_heartbeat) timers taken by stop()
+        or pop_abandoned() whose time entries could not be saved. Users
+        who started a new timer in the meantime keep the new one.
+        """
+        pipeline = self.client.pipeline()
+        for user_id, timer, last_heartbeat in timers:
+            pipeline.set(self.key(user_id), self.dumps(timer), nx=True)
+            pipeline.zadd(self.HEARTBEATS_KEY, {user_id: last_heartbeat.timestamp()}, nx=True)
+        pipeline.execute()
+
+    def pop_abandoned(self, before, limit):
+        """
+        Remove and return up to ``limit`` timers without a heartbeat since
+        ``before`` as (user_id, timer, last_heartbeat), in one round trip.
+        """
+        if self._pop_abandoned is None:
+            self._pop_abandoned = self.client.register_script(POP_ABANDONED_SCRIPT)
+        values = self._pop_abandoned(
+            keys=[self.HEARTBEATS_KEY], args=[before.timestamp(), limit, self.KEY_PREFIX]
+        )
+        return [
+            (int(user_id), self.loads(value), datetime.fromtimestamp(float(heartbeat), timezone.utc))
+            for user_id, heartbeat, value in zip(values[::3], values[1::3], values[2::3])
+        ]
+
+
+timer_store = TimerStore()
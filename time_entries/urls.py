@@ -4,7 +4,14 @@ from .views import (
     TimeEntryDetailView, 
     TimeEntryBulkCreateView,
     TimeEntryByProjectView,
-    time_entry_summary
+    time_entry_summary,
+    time_entry_tag_summary,
+    time_entry_overlaps,
+    reprice_time_entries,
+    current_timer,
+    start_timer,
+    timer_heartbeat,
+    stop_timer
 )
 
 urlpatterns = [
@@ -13,4 +20,11 @@ urlpatterns = [
     path('bulk-create/', TimeEntryBulkCreateView.as_view(), name='time-entry-bulk-create'),
     path('by-project/<int:project_id>/', TimeEntryByProjectView.as_view(), name='time-entry-by-project'),
     path('summary/', time_entry_summary, name='time-entry-summary'),
+    path('tags/summary/', time_entry_tag_summary, name='time-entry-tag-summary'),
+    path('overlaps/', time_entry_overlaps, name='time-entry-overlaps'),
+    path('reprice/', reprice_time_entries, name='time-entry-reprice'),
+    path('timer/', current_timer, name='time-entry-timer'),
+    path('timer/start/', start_timer, name='time-entry-timer-start'),
+    path('timer/heartbeat/', timer_heartbeat, name='time-entry-timer-heartbeat'),
+    path('timer/stop/', stop_timer, name='time-entry-timer-stop'),
 ] 
\ No newline at end of file
@@ -1,34 +1,52 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Sum, Q
+from django.db.models import Sum, Q, F
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+import redis
+from core.fastpath import ValuesListMixin
 from .models import TimeEntry
 from .serializers import (
     TimeEntrySerializer, 
     TimeEntryListSerializer, 
+    TimeEntryListValuesSerializer,
     TimeEntryDetailSerializer,
-    TimeEntryBulkCreateSerializer
+    TimeEntryBulkCreateSerializer,
+    TimeEntryRepriceSerializer,
+    TimerStartSerializer,
+    TimerStopSerializer
 )
+from .services import TimeEntryService
+from .timers import timer_store
+from .tasks import reprice_time_entries as reprice_time_entries_task
 
 
-class TimeEntryListCreateView(generics.ListCreateAPIView):
+class TimeEntryListCreateView(ValuesListMixin, generics.ListCreateAPIView):
     """
     View for listing and creating time entries.
     """
     serializer_class = TimeEntrySerializer
+    values_serializer_class = TimeEntryListValuesSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['project', 'date', 'is_billable', 'project__client']
+    filterset_fields = ['project', 'date', 'is_billable', 'project__client', 'invoice']
     search_fields = ['description', 'project__name', 'tags']
     ordering_fields = ['date', 'hours', 'hourly_rate', 'created_at']
     ordering = ['-date', '-created_at']
     
     def get_queryset(self):
-        return TimeEntry.objects.filter(user=self.request.user).select_related('project', 'project__client')
+        queryset = TimeEntry.objects.filter(user=self.request.user).select_related('project', 'project__client')
+        # ?tag=a&tag=b matches entries tagged with both
+        tags = self.request.query_params.getlist('tag')
+        if tags:
+            queryset = queryset.tagged(self.request.user, *tags)
+        return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -60,11 +78,12 @@ class TimeEntryBulkCreateView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class TimeEntryByProjectView(generics.ListAPIView):
+class TimeEntryByProjectView(ValuesListMixin, generics.ListAPIView):
     """
     View for listing time entries by project.
     """
     serializer_class = TimeEntryListSerializer
+    values_serializer_class = TimeEntryListValuesSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
@@ -106,7 +125,7 @@ def time_entry_summary(request):
     total_hours = time_entries.aggregate(total=Sum('hours'))['total'] or 0
     total_billable_hours = time_entries.filter(is_billable=True).aggregate(total=Sum('hours'))['total'] or 0
     total_amount = time_entries.filter(is_billable=True).aggregate(
-        total=Sum('hours' * 'hourly_rate')
+        total=Sum(F('hours') * F('hourly_rate'))
     )['total'] or 0
     
     # Get top projects
@@ -124,4 +143,231 @@ def time_entry_summary(request):
         'top_projects': list(top_projects)
     }
     
-    return Response(summary_data) 
\ No newline at end of file
+    return Response(summary_data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def time_entry_tag_summary(request):
+    """
+    View for getting hours and amounts per tag.
+    """
+    period = request.GET.get('period', 'month')  # week, month, year
+    days = {'week': 7, 'month': 30, 'year': 365}.get(period, 30)
+    today = datetime.now().date()
+    start_date = today - timedelta(days=days)
+    project = request.GET.get('project') or None
+    if project is not None and not project.isdigit():
+        return Response({'error': 'project must be a project id.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    tags = TimeEntryService.tag_summary(request.user, start_date=start_date, end_date=today, project=project)
+    
+    return Response({
+        'period': period,
+        'start_date': start_date,
+        'end_date': today,
+        'tags': [
+            {
+                'tag': tag['name'],
+                'entries': tag['entries'],
+                'hours': float(tag['hours']),
+                'amount': float(tag['amount'] or 0)
+            } for tag in tags
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def time_entry_overlaps(request):
+    """
+    View for finding overlapping time entries. With date, start_time and
+    end_time, returns the entries that range would overlap (optionally
+    excluding the entry being edited); otherwise returns every overlapping
+    pair between start_date and end_date (default the last 30 days).
+    """
+    params = request.GET
+    try:
+        if 'start_time' in params or 'end_time' in params:
+            date = datetime.strptime(params['date'], '%Y-%m-%d').date()
+            start_time = datetime.strptime(params['start_time'], '%H:%M').time()
+            end_time = datetime.strptime(params['end_time'], '%H:%M').time()
+            exclude = int(params['exclude']) if params.get('exclude') else None
+        else:
+            end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date() if params.get('end_date') else datetime.now().date()
+            start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date() if params.get('start_date') else end_date - timedelta(days=30)
+    except (KeyError, ValueError):
+        return Response(
+            {'error': 'Use date, start_time and end_time (YYYY-MM-DD, HH:MM) or start_date and end_date.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if 'start_time' in params:
+        if start_time >= end_time:
+            return Response({'error': 'End time must be after start time.'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = TimeEntryService.find_overlaps(
+            request.user, date, start_time, end_time, exclude=exclude
+        ).order_by('start_time').values('id', 'date', 'start_time', 'end_time', 'project__name', 'description')
+        return Response({
+            'date': date,
+            'start_time': start_time,
+            'end_time': end_time,
+            'overlaps': list(entries)
+        })
+    
+    if start_date > end_date:
+        return Response({'error': 'Start date must be before end date.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'start_date': start_date,
+        'end_date': end_date,
+        'overlaps': [list(pair) for pair in TimeEntryService.overlap_report(request.user, start_date, end_date)]
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def reprice_time_entries(request):
+    """
+    View for repricing the unbilled time entries of a project, client or
+    date range. Returns the amount delta; ranges above
+    TIME_ENTRY_REPRICE_SYNC_LIMIT entries are repriced in the background.
+    """
+    serializer = TimeEntryRepriceSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    
+    entries = TimeEntryService.unbilled_entries(
+        request.user,
+        project=data.get('project'),
+        client=data.get('client'),
+        start_date=data.get('start_date'),
+        end_date=data.get('end_date')
+    )
+    hourly_rate = data.get('hourly_rate')
+    preview = TimeEntryService.preview_repricing(entries, hourly_rate)
+    result = {'dry_run': data['dry_run'], 'background': False, **preview}
+    
+    if data['dry_run'] or not preview['entries']:
+        return Response(result)
+    
+    if preview['entries'] > settings.TIME_ENTRY_REPRICE_SYNC_LIMIT:
+        task = reprice_time_entries_task.delay(
+            request.user.id,
+            hourly_rate=str(hourly_rate) if hourly_rate is not None else None,
+            project_id=data['project'].id if data.get('project') else None,
+            client_id=data['client'].id if data.get('client') else None,
+            start_date=data['start_date'].isoformat() if data.get('start_date') else None,
+            end_date=data['end_date'].isoformat() if data.get('end_date') else None
+        )
+        result.update(background=True, task_id=task.id)
+        return Response(result, status=status.HTTP_202_ACCEPTED)
+    
+    result['updated'] = TimeEntryService.reprice(entries, hourly_rate)
+    return Response(result)
+
+
+def timer_data(timer):
+    return {
+        'project': timer['project'],
+        'description': timer['description'],
+        'tags': timer['tags'],
+        'is_billable': timer['is_billable'],
+        'started_at': timer['started_at'],
+        'last_heartbeat': timer.get('last_heartbeat', timer['started_at']),
+        'elapsed_seconds': int((timezone.now() - timer['started_at']).total_seconds())
+    }
+
+
+TIMERS_UNAVAILABLE = {'error': 'Timers are unavailable, try again shortly.'}
+NO_TIMER = {'error': 'No timer is running.'}
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def current_timer(request):
+    """
+    View for getting the running timer, or discarding it without saving
+    a time entry.
+    """
+    try:
+        if request.method == 'DELETE':
+            timer = timer_store.stop(request.user.pk)
+        else:
+            timer = timer_store.get(request.user.pk)
+    except redis.RedisError:
+        return Response(TIMERS_UNAVAILABLE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    if timer is None:
+        return Response(NO_TIMER, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'DELETE':
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(timer_data(timer))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_timer(request):
+    """
+    View for starting a live timer. Running timers live in Redis; no time
+    entry is written until the timer stops.
+    """
+    serializer = TimerStartSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    timer = {**serializer.validated_data, 'started_at': timezone.now()}
+    timer['project'] = timer['project'].pk
+    
+    try:
+        started = timer_store.start(request.user.pk, timer)
+    except redis.RedisError:
+        return Response(TIMERS_UNAVAILABLE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if not started:
+        return Response({'error': 'A timer is already running.'}, status=status.HTTP_409_CONFLICT)
+    return Response(timer_data(timer), status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+# The token identifies the user; heartbeats never touch the database
+@authentication_classes([JWTStatelessUserAuthentication])
+@permission_classes([IsAuthenticated])
+def timer_heartbeat(request):
+    """
+    View for keeping the running timer alive. Timers without a heartbeat
+    for TIMER_HEARTBEAT_TIMEOUT seconds are closed by the sweeper.
+    """
+    try:
+        running = timer_store.heartbeat(request.user.pk)
+    except redis.RedisError:
+        return Response(TIMERS_UNAVAILABLE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if not running:
+        return Response(NO_TIMER, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stop_timer(request):
+    """
+    View for stopping the running timer and saving it as a time entry, or
+    one per day for timers running past midnight.
+    """
+    serializer = TimerStopSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    try:
+        timer = timer_store.stop(request.user.pk)
+    except redis.RedisError:
+        return Response(TIMERS_UNAVAILABLE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if timer is None:
+        return Response(NO_TIMER, status=status.HTTP_404_NOT_FOUND)
+    
+    timer.update(serializer.validated_data)
+    stopped = [(request.user.pk, timer, timezone.now())]
+    try:
+        time_entries = TimeEntryService.create_from_timers(stopped)
+    except Exception:
+        timer_store.restore(stopped)
+        raise
+    
+    return Response({
+        'time_entries': TimeEntrySerializer(time_entries, many=True).data
+    }, status=status.HTTP_201_CREATED)